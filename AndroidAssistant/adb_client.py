@@ -0,0 +1,597 @@
+import os
+import posixpath
+import socket
+import stat as stat_module
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from PySide6.QtCore import QObject, Signal
+
+from shell_session import shell_quote
+
+ADB_HOST = os.environ.get("ANDROID_ADB_SERVER_ADDRESS", "127.0.0.1")
+ADB_PORT = int(os.environ.get("ANDROID_ADB_SERVER_PORT", "5037"))
+
+SYNC_DATA_MAX = 64 * 1024
+
+SHELL_V2_STDOUT = 1
+SHELL_V2_STDERR = 2
+SHELL_V2_EXIT = 3
+
+
+class AdbError(Exception):
+    pass
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise AdbError("connection closed by adb server")
+        buf += chunk
+    return bytes(buf)
+
+
+class AdbRequest:
+    # sockets one backend job has open, shut down from another thread to interrupt blocking reads
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._socks: set[socket.socket] = set()
+        self.cancelled = False
+        self.finished = False
+
+    def track(self, sock: socket.socket) -> None:
+        with self._lock:
+            if not self.cancelled:
+                self._socks.add(sock)
+                return
+        _shutdown(sock)
+
+    def untrack(self, sock: socket.socket) -> None:
+        with self._lock:
+            self._socks.discard(sock)
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self.cancelled or self.finished:
+                return
+            self.cancelled = True
+            socks, self._socks = self._socks, set()
+        for sock in socks:
+            _shutdown(sock)
+
+    def finish(self) -> None:
+        with self._lock:
+            self.finished = True
+            self._socks.clear()
+
+
+def _shutdown(sock: socket.socket) -> None:
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class AdbConnection:
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+
+    def send_request(self, service: str) -> None:
+        data = service.encode()
+        self.sock.sendall(b"%04x" % len(data) + data)
+        self.read_status()
+
+    def read_status(self) -> None:
+        status = _recv_exact(self.sock, 4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbError(self.read_string())
+        raise AdbError(f"unexpected status {status!r}")
+
+    def read_string(self) -> str:
+        size = int(_recv_exact(self.sock, 4), 16)
+        return _recv_exact(self.sock, size).decode(errors="replace")
+
+    def read_exact(self, size: int) -> bytes:
+        return _recv_exact(self.sock, size)
+
+    def read_stream(self, on_data) -> None:
+        while True:
+            chunk = self.sock.recv(SYNC_DATA_MAX)
+            if not chunk:
+                return
+            on_data(chunk)
+
+    def close(self) -> None:
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class SyncConnection:
+    def __init__(self, conn: AdbConnection):
+        self._conn = conn
+
+    @property
+    def sock(self) -> socket.socket:
+        return self._conn.sock
+
+    def _send(self, request_id: bytes, data: bytes) -> None:
+        self._conn.sock.sendall(request_id + struct.pack("<I", len(data)) + data)
+
+    def _read_fail(self, size: int) -> AdbError:
+        return AdbError(self._conn.read_exact(size).decode(errors="replace"))
+
+    def stat(self, path: str) -> tuple[int, int, int]:
+        self._send(b"STAT", path.encode())
+        response = self._conn.read_exact(16)
+        if response[:4] != b"STAT":
+            raise AdbError(f"unexpected sync response {response[:4]!r}")
+        mode, size, mtime = struct.unpack("<III", response[4:])
+        return mode, size, mtime
+
+    def list(self, path: str) -> list[tuple[str, int, int, int]]:
+        self._send(b"LIST", path.encode())
+        entries = []
+        while True:
+            header = self._conn.read_exact(20)
+            request_id = header[:4]
+            if request_id == b"DONE":
+                return entries
+            if request_id != b"DENT":
+                raise AdbError(f"unexpected sync response {request_id!r}")
+            mode, size, mtime, name_size = struct.unpack("<IIII", header[4:])
+            name = self._conn.read_exact(name_size).decode(errors="replace")
+            if name not in (".", ".."):
+                entries.append((name, mode, size, mtime))
+
+    def push(self, local_path: str, remote_path: str, on_progress=None) -> int:
+        st = os.stat(local_path)
+        mode = stat_module.S_IFREG | stat_module.S_IMODE(st.st_mode)
+        self._send(b"SEND", f"{remote_path},{mode}".encode())
+
+        sent = 0
+        with open(local_path, "rb") as f:
+            while True:
+                chunk = f.read(SYNC_DATA_MAX)
+                if not chunk:
+                    break
+                self._send(b"DATA", chunk)
+                sent += len(chunk)
+                if on_progress:
+                    on_progress(sent, st.st_size)
+        self._conn.sock.sendall(b"DONE" + struct.pack("<I", int(st.st_mtime)))
+
+        response = self._conn.read_exact(8)
+        if response[:4] == b"FAIL":
+            raise self._read_fail(struct.unpack("<I", response[4:])[0])
+        if response[:4] != b"OKAY":
+            raise AdbError(f"unexpected sync response {response[:4]!r}")
+        return sent
+
+    def pull(self, remote_path: str, local_path: str, on_progress=None) -> int:
+        self._send(b"RECV", remote_path.encode())
+        received = 0
+        tmp_path = local_path + ".part"
+        try:
+            with open(tmp_path, "wb") as f:
+                while True:
+                    header = self._conn.read_exact(8)
+                    request_id = header[:4]
+                    size = struct.unpack("<I", header[4:])[0]
+                    if request_id == b"DONE":
+                        break
+                    if request_id == b"FAIL":
+                        raise self._read_fail(size)
+                    if request_id != b"DATA":
+                        raise AdbError(f"unexpected sync response {request_id!r}")
+                    f.write(self._conn.read_exact(size))
+                    received += size
+                    if on_progress:
+                        on_progress(received, None)
+            os.replace(tmp_path, local_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return received
+
+    def quit(self) -> None:
+        try:
+            self._send(b"QUIT", b"")
+        except OSError:
+            pass
+        self._conn.close()
+
+
+class AdbClient:
+    def __init__(
+            self,
+            host: str = ADB_HOST,
+            port: int = ADB_PORT,
+            timeout: float | None = 10,
+            max_idle_sync_per_device: int = 2
+    ):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._max_idle_sync = max_idle_sync_per_device
+        self._sync_pool: dict[str | None, list[SyncConnection]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def request(self, request: AdbRequest):
+        # connections opened by this thread until the block ends belong to request
+        self._local.request = request
+        try:
+            yield request
+        finally:
+            self._local.request = None
+            request.finish()
+
+    def _track(self, sock: socket.socket) -> None:
+        request = getattr(self._local, "request", None)
+        if request is not None:
+            request.track(sock)
+
+    def _untrack(self, sock: socket.socket) -> None:
+        request = getattr(self._local, "request", None)
+        if request is not None:
+            request.untrack(sock)
+
+    def connect(self) -> AdbConnection:
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError as e:
+            raise AdbError(f"cannot connect to adb server at {self.host}:{self.port}: {e}") from e
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._track(sock)
+        return AdbConnection(sock)
+
+    def host_request(self, service: str) -> str:
+        conn = self.connect()
+        try:
+            conn.send_request(f"host:{service}")
+            return conn.read_string()
+        finally:
+            conn.close()
+
+    def version(self) -> int:
+        return int(self.host_request("version"), 16)
+
+    def devices(self, long: bool = False) -> list[list[str]]:
+        text = self.host_request("devices-l" if long else "devices")
+        return [line.split() for line in text.splitlines() if line.strip()]
+
+    def transport(self, serial: str | None) -> AdbConnection:
+        conn = self.connect()
+        try:
+            conn.send_request(f"host:transport:{serial}" if serial else "host:transport-any")
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def service(self, serial: str | None, service: str) -> AdbConnection:
+        conn = self.transport(serial)
+        try:
+            conn.send_request(service)
+        except Exception:
+            conn.close()
+            raise
+        # a service may legitimately stay silent for long, cancelling the request is what interrupts it
+        conn.sock.settimeout(None)
+        return conn
+
+    def shell(self, serial: str | None, command: str, on_stdout=None, on_stderr=None) -> int:
+        try:
+            conn = self.service(serial, f"shell,v2,raw:{command}")
+        except AdbError:
+            return self._shell_v1(serial, command, on_stdout)
+
+        code = -1
+        try:
+            while True:
+                try:
+                    header = conn.read_exact(5)
+                except AdbError:
+                    break
+                packet_id = header[0]
+                size = struct.unpack("<I", header[1:])[0]
+                data = conn.read_exact(size)
+                if packet_id == SHELL_V2_STDOUT and on_stdout:
+                    on_stdout(data)
+                elif packet_id == SHELL_V2_STDERR:
+                    (on_stderr or on_stdout or (lambda _: None))(data)
+                elif packet_id == SHELL_V2_EXIT:
+                    code = data[0]
+                    break
+        finally:
+            conn.close()
+        return code
+
+    def _shell_v1(self, serial: str | None, command: str, on_stdout=None) -> int:
+        marker = b"__AA_EXIT__"
+        conn = self.service(serial, f"shell:{command}; echo {marker.decode()}$?")
+        buf = bytearray()
+        try:
+            conn.read_stream(buf.extend)
+        finally:
+            conn.close()
+        index = buf.rfind(marker)
+        if index < 0:
+            if on_stdout:
+                on_stdout(bytes(buf))
+            return -1
+        if on_stdout:
+            on_stdout(bytes(buf[:index]))
+        try:
+            return int(buf[index + len(marker):].strip())
+        except ValueError:
+            return -1
+
+    def exec_out(self, serial: str | None, command: str, on_data) -> None:
+        conn = self.service(serial, f"exec:{command}")
+        try:
+            conn.read_stream(on_data)
+        finally:
+            conn.close()
+
+    def reboot(self, serial: str | None, target: str = "") -> None:
+        conn = self.service(serial, f"reboot:{target}")
+        try:
+            conn.read_stream(lambda _: None)
+        finally:
+            conn.close()
+
+    @contextmanager
+    def sync(self, serial: str | None):
+        with self._lock:
+            idle = self._sync_pool.get(serial)
+            sync_conn = idle.pop() if idle else None
+        if sync_conn is None:
+            sync_conn = SyncConnection(self.service(serial, "sync:"))
+        else:
+            self._track(sync_conn.sock)
+
+        try:
+            yield sync_conn
+        except BaseException:
+            sync_conn.quit()
+            raise
+        else:
+            with self._lock:
+                idle = self._sync_pool.setdefault(serial, [])
+                if len(idle) < self._max_idle_sync:
+                    # pooled connections outlive the request, cancelling it must not shut them down
+                    self._untrack(sync_conn.sock)
+                    idle.append(sync_conn)
+                    sync_conn = None
+            if sync_conn is not None:
+                sync_conn.quit()
+
+    def push(self, serial: str | None, local_path: str, remote_path: str, on_progress=None) -> int:
+        with self.sync(serial) as sync_conn:
+            if os.path.isdir(local_path):
+                return self._push_dir(serial, sync_conn, local_path, remote_path, on_progress)
+            try:
+                mode = sync_conn.stat(remote_path)[0]
+            except AdbError:
+                mode = 0
+            if stat_module.S_ISDIR(mode):
+                remote_path = posixpath.join(remote_path, os.path.basename(local_path))
+            return sync_conn.push(local_path, remote_path, on_progress)
+
+    def _push_dir(self, serial, sync_conn: SyncConnection, local_dir: str, remote_path: str, on_progress) -> int:
+        mode = sync_conn.stat(remote_path)[0]
+        if stat_module.S_ISDIR(mode):
+            remote_path = posixpath.join(remote_path, os.path.basename(local_dir.rstrip(os.sep)))
+        self.shell(serial, f"mkdir -p {shell_quote(remote_path)}")
+
+        total = 0
+        for root, dirs, files in os.walk(local_dir):
+            rel = os.path.relpath(root, local_dir)
+            remote_root = remote_path if rel == "." else posixpath.join(remote_path, *rel.split(os.sep))
+            for name in dirs:
+                self.shell(serial, f"mkdir -p {shell_quote(posixpath.join(remote_root, name))}")
+            for name in files:
+                total += sync_conn.push(os.path.join(root, name), posixpath.join(remote_root, name), on_progress)
+        return total
+
+    def pull(self, serial: str | None, remote_path: str, local_path: str, on_progress=None) -> int:
+        with self.sync(serial) as sync_conn:
+            mode = sync_conn.stat(remote_path)[0]
+            if mode == 0:
+                raise AdbError(f"remote object '{remote_path}' does not exist")
+            if os.path.isdir(local_path):
+                local_path = os.path.join(local_path, posixpath.basename(remote_path.rstrip("/")))
+            if stat_module.S_ISDIR(mode):
+                return self._pull_dir(sync_conn, remote_path, local_path, on_progress)
+            return sync_conn.pull(remote_path, local_path, on_progress)
+
+    def _pull_dir(self, sync_conn: SyncConnection, remote_dir: str, local_dir: str, on_progress) -> int:
+        os.makedirs(local_dir, exist_ok=True)
+        total = 0
+        for name, mode, _, _ in sync_conn.list(remote_dir):
+            remote_path = posixpath.join(remote_dir, name)
+            local_path = os.path.join(local_dir, name)
+            if stat_module.S_ISDIR(mode):
+                total += self._pull_dir(sync_conn, remote_path, local_path, on_progress)
+            elif stat_module.S_ISREG(mode):
+                total += sync_conn.pull(remote_path, local_path, on_progress)
+        return total
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._sync_pool = self._sync_pool, {}
+        for idle in pool.values():
+            for sync_conn in idle:
+                sync_conn.quit()
+
+
+class AdbBackend(QObject):
+    _dispatch = Signal(object, tuple)
+
+    def __init__(self, client: AdbClient | None = None, max_workers: int = 8):
+        super().__init__()
+        self.client = client or AdbClient()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="adb-client")
+        self._dispatch.connect(self._on_dispatch)
+
+        self._handlers = {
+            "devices": self._devices,
+            "get-state": self._get_state,
+            "get-serialno": self._get_serialno,
+            "shell": self._shell,
+            "exec-out": self._exec_out,
+            "push": self._push,
+            "pull": self._pull,
+            "install": self._install,
+            "uninstall": self._uninstall,
+            "reboot": self._reboot,
+        }
+
+    @staticmethod
+    def _split(program_args: list) -> tuple[str | None, list]:
+        args = list(program_args)
+        if args[:1] == ["-s"] and len(args) >= 2:
+            return args[1], args[2:]
+        return None, args
+
+    def supports(self, program: str, program_args: list) -> bool:
+        if program != "adb":
+            return False
+        _, args = self._split(program_args)
+        return bool(args) and args[0] in self._handlers
+
+    def start(self, program: str, program_args: list, on_output, on_error, on_done) -> AdbRequest:
+        serial, args = self._split(program_args)
+        handler = self._handlers[args[0]]
+        request = AdbRequest()
+
+        def emit_output(data: bytes):
+            self._dispatch.emit(on_output, (data,))
+
+        def emit_error(data: bytes):
+            self._dispatch.emit(on_error, (data,))
+
+        def work():
+            if request.cancelled:
+                return
+            with self.client.request(request):
+                try:
+                    code = handler(serial, args[1:], emit_output, emit_error)
+                except (AdbError, OSError) as e:
+                    emit_error(f"adb: error: {e}\n".encode())
+                    code = 1
+            self._dispatch.emit(on_done, (code,))
+
+        self._executor.submit(work)
+        return request
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.client.close()
+
+    @staticmethod
+    def _on_dispatch(fn, args: tuple) -> None:
+        fn(*args)
+
+    def _devices(self, serial, args, emit, emit_err) -> int:
+        long = "-l" in args
+        lines = ["List of devices attached"]
+        lines += ["\t".join(row[:2]) + ("  " + " ".join(row[2:]) if row[2:] else "")
+                  for row in self.client.devices(long)]
+        emit(("\n".join(lines) + "\n\n").encode())
+        return 0
+
+    def _get_state(self, serial, args, emit, emit_err) -> int:
+        service = f"host-serial:{serial}:get-state" if serial else "host:get-state"
+        conn = self.client.connect()
+        try:
+            conn.send_request(service)
+            emit((conn.read_string() + "\n").encode())
+        finally:
+            conn.close()
+        return 0
+
+    def _get_serialno(self, serial, args, emit, emit_err) -> int:
+        if serial:
+            emit((serial + "\n").encode())
+            return 0
+        devices = self.client.devices()
+        if len(devices) != 1:
+            emit_err(b"adb: more than one device/emulator\n" if devices else b"adb: no devices/emulators found\n")
+            return 1
+        emit((devices[0][0] + "\n").encode())
+        return 0
+
+    def _shell(self, serial, args, emit, emit_err) -> int:
+        return self.client.shell(serial, " ".join(args), emit, emit_err)
+
+    def _exec_out(self, serial, args, emit, emit_err) -> int:
+        self.client.exec_out(serial, " ".join(args), emit)
+        return 0
+
+    def _push(self, serial, args, emit, emit_err) -> int:
+        paths = [arg for arg in args if not arg.startswith("-")]
+        if len(paths) < 2:
+            emit_err(b"adb: push requires an argument\n")
+            return 1
+        *local_paths, remote_path = paths
+        started = time.monotonic()
+        total = 0
+        for local_path in local_paths:
+            total += self.client.push(serial, local_path, remote_path)
+        emit(self._transfer_summary("pushed", len(local_paths), total, time.monotonic() - started))
+        return 0
+
+    def _pull(self, serial, args, emit, emit_err) -> int:
+        paths = [arg for arg in args if not arg.startswith("-")]
+        if not paths:
+            emit_err(b"adb: pull requires an argument\n")
+            return 1
+        if len(paths) == 1:
+            paths.append(".")
+        *remote_paths, local_path = paths
+        started = time.monotonic()
+        total = 0
+        for remote_path in remote_paths:
+            total += self.client.pull(serial, remote_path, local_path)
+        emit(self._transfer_summary("pulled", len(remote_paths), total, time.monotonic() - started))
+        return 0
+
+    @staticmethod
+    def _transfer_summary(action: str, count: int, size: int, elapsed: float) -> bytes:
+        rate = size / elapsed / 1024 / 1024 if elapsed > 0 else 0.0
+        return f"{count} file(s) {action}. {rate:.1f} MB/s ({size} bytes in {elapsed:.3f}s)\n".encode()
+
+    def _install(self, serial, args, emit, emit_err) -> int:
+        options = [arg for arg in args if arg.startswith("-")]
+        apk_paths = [arg for arg in args if not arg.startswith("-")]
+        if len(apk_paths) != 1:
+            emit_err(b"adb: install requires exactly one apk\n")
+            return 1
+        apk_path = apk_paths[0]
+        remote_path = f"/data/local/tmp/{os.path.basename(apk_path)}"
+        self.client.push(serial, apk_path, remote_path)
+        try:
+            options_str = " ".join(options)
+            code = self.client.shell(serial, f"pm install {options_str} {shell_quote(remote_path)}", emit, emit_err)
+        finally:
+            self.client.shell(serial, f"rm -f {shell_quote(remote_path)}")
+        return code
+
+    def _uninstall(self, serial, args, emit, emit_err) -> int:
+        return self.client.shell(serial, "pm uninstall " + " ".join(args), emit, emit_err)
+
+    def _reboot(self, serial, args, emit, emit_err) -> int:
+        self.client.reboot(serial, args[0] if args else "")
+        return 0
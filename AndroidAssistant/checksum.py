@@ -0,0 +1,48 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, Signal
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalHasher(QObject):
+    progress = Signal(int, int)  # files hashed, total
+    finished = Signal(dict)  # path -> md5 hex digest, None when unreadable
+
+    def __init__(self, max_workers: int | None = None, parent=None):
+        super().__init__(parent)
+        # hashlib drops the GIL on large buffers, threads keep several disks and cores busy
+        self._max_workers = max_workers or min(8, (os.cpu_count() or 1) + 2)
+        self._cancelled = threading.Event()
+
+    def start(self, paths: list[str]) -> None:
+        self._cancelled.clear()
+        threading.Thread(target=self._run, args=(list(paths),), name="LocalHasher", daemon=True).start()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def _hash(self, path: str) -> str | None:
+        digest = hashlib.md5()
+        try:
+            with open(path, "rb") as f:
+                while chunk := f.read(HASH_CHUNK_SIZE):
+                    if self._cancelled.is_set():
+                        return None
+                    digest.update(chunk)
+        except OSError:
+            return None
+        return digest.hexdigest()
+
+    def _run(self, paths: list[str]) -> None:
+        results = {}
+        with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="local-hash") as executor:
+            for path, digest in zip(paths, executor.map(self._hash, paths)):
+                if self._cancelled.is_set():
+                    return
+                results[path] = digest
+                self.progress.emit(len(results), len(paths))
+        self.finished.emit(results)
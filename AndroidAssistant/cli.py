@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import sys
+
+from PySide6.QtCore import QCoreApplication, QTimer
+
+import operations
+from cmd import Cmd
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_NO_DEVICE = 3
+
+
+def read_items(values: list[str], apk_only: bool = False) -> list[str]:
+    items = []
+    for value in values:
+        if value == "-":
+            lines = sys.stdin.read().splitlines()
+        elif value.startswith("@"):
+            with open(value[1:], encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        else:
+            lines = [value]
+
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if apk_only and os.path.isdir(line):
+                for dir_path, _, file_names in os.walk(line):
+                    items += sorted(os.path.join(dir_path, i) for i in file_names if i.lower().endswith(".apk"))
+            else:
+                items.append(line)
+    return list(dict.fromkeys(items))
+
+
+class Reporter:
+    def __init__(self, op: str, jsonl: bool = False, stream=None):
+        self.op = op
+        self.jsonl = jsonl
+        self.stream = stream or sys.stdout
+        self.total = 0
+        self.failed = 0
+
+    def item(self, serial, item, code, output) -> None:
+        self.total += 1
+        if code != 0:
+            self.failed += 1
+        text = str(output).strip()
+        if self.jsonl:
+            self.write({"op": self.op, "serial": serial, "item": item, "ok": code == 0, "code": code, "output": text})
+        else:
+            prefix = f"[{serial}] " if serial else ""
+            line = f"{'OK' if code == 0 else 'FAIL'} {prefix}{item}"
+            self.stream.write(line + (f": {text}" if code != 0 and text else "") + "\n")
+            self.stream.flush()
+
+    def write(self, record: dict) -> None:
+        self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+    def summary(self) -> int:
+        code = EXIT_FAILED if self.failed else EXIT_OK
+        if self.jsonl:
+            self.write({
+                "op": self.op, "summary": True, "total": self.total,
+                "succeeded": self.total - self.failed, "failed": self.failed, "exit_code": code
+            })
+        else:
+            sys.stderr.write(f"{self.op}: {self.total - self.failed}/{self.total} succeeded\n")
+        return code
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="AndroidAssistant-cli", description="headless AndroidAssistant operations")
+    parser.add_argument("-s", "--serial", action="append", default=[], help="target device, may be repeated")
+    parser.add_argument("-a", "--all-devices", action="store_true", help="target every online device")
+    parser.add_argument("--jsonl", action="store_true", help="print one JSON object per result")
+    parser.add_argument("--max-running", type=int, default=8)
+    parser.add_argument("--max-running-per-serial", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=None, help="default timeout in seconds for each adb call")
+
+    subparsers = parser.add_subparsers(dest="op", required=True)
+
+    devices_parser = subparsers.add_parser("devices", help="list attached devices")
+    devices_parser.add_argument("-l", "--long", action="store_true")
+
+    packages_parser = subparsers.add_parser("packages", help="list packages of the first target device")
+    packages_parser.add_argument("-3", "--third-party", action="store_true")
+    packages_parser.add_argument("--system", action="store_true")
+
+    install_parser = subparsers.add_parser("install", help="install apk files or directories of apks")
+    install_parser.add_argument("paths", nargs="+", help="apk file, directory, @list file or - for stdin")
+    install_parser.add_argument("--install-args", default="", help="extra adb install arguments, e.g. \"-r -d\"")
+
+    for op, help_text in (("uninstall", "uninstall packages"), ("force-stop", "force stop packages")):
+        package_parser = subparsers.add_parser(op, help=help_text)
+        package_parser.add_argument("packages", nargs="+", help="package name, @list file or - for stdin")
+
+    rename_parser = subparsers.add_parser("rename-apk", help="rename apks to <app name>_<version>.apk")
+    rename_parser.add_argument("paths", nargs="+", help="apk file, directory, @list file or - for stdin")
+
+    return parser
+
+
+def run(args: argparse.Namespace, cmd: Cmd, done) -> None:
+    reporter = Reporter(args.op, args.jsonl)
+
+    if args.op == "rename-apk":
+        for apk_file_path in read_items(args.paths, apk_only=True):
+            try:
+                reporter.item(None, apk_file_path, 0, operations.rename_apk(apk_file_path))
+            except Exception as e:  # noqa
+                reporter.item(None, apk_file_path, 1, e)
+        done(reporter.summary())
+        return
+
+    if args.op == "devices":
+        def on_devices(code, devices, output):
+            if code != 0:
+                reporter.item(None, "devices", code, output)
+                done(reporter.summary())
+                return
+            for fields in devices:
+                if args.jsonl:
+                    reporter.write({
+                        "op": "devices", "serial": fields[0], "state": fields[1] if len(fields) > 1 else "",
+                        "attrs": dict(i.split(":", 1) for i in fields[2:] if ":" in i)
+                    })
+                else:
+                    print("\t".join(fields), flush=True)
+            done(EXIT_OK)
+
+        operations.list_devices(cmd, on_devices, long=args.long)
+        return
+
+    def with_serials(serials):
+        if not serials:
+            sys.stderr.write("no online device\n")
+            done(EXIT_NO_DEVICE)
+            return
+
+        if args.op == "packages":
+            def on_packages(code, package_names, output):
+                if code != 0:
+                    reporter.item(serials[0], "packages", code, output)
+                    done(reporter.summary())
+                    return
+                for package_name in package_names:
+                    if args.jsonl:
+                        reporter.write({"op": "packages", "serial": serials[0], "package": package_name})
+                    else:
+                        print(package_name)
+                sys.stdout.flush()
+                done(EXIT_OK)
+
+            operations.list_packages(
+                cmd, serials[0], on_packages, system=args.system, third_party=args.third_party, use_session=False
+            )
+            return
+
+        def on_finished(results):
+            done(reporter.summary())
+
+        if args.op == "install":
+            apk_file_paths = read_items(args.paths, apk_only=True)
+            operations.install_apks(
+                cmd, serials, apk_file_paths, reporter.item, on_finished,
+                install_args=args.install_args.split(), timeout=args.timeout or 600
+            )
+        elif args.op == "uninstall":
+            operations.uninstall_packages(cmd, serials, read_items(args.packages), reporter.item, on_finished)
+        else:
+            assert args.op == "force-stop"
+            operations.force_stop_packages(cmd, serials, read_items(args.packages), reporter.item, on_finished)
+
+    if args.serial:
+        with_serials(args.serial)
+    elif args.all_devices:
+        operations.list_devices(cmd, lambda code, devices, output: with_serials(operations.online_serials(devices)))
+    else:
+        with_serials([None])
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    cmd = Cmd(
+        max_running=args.max_running,
+        max_running_per_serial=args.max_running_per_serial,
+        default_timeout=args.timeout
+    )
+
+    exit_code = None
+
+    def done(code):
+        nonlocal exit_code
+        exit_code = code
+        exit_when_idle()
+
+    def exit_when_idle(*_):
+        # batch results arrive before their adb shell exits, let it wind down before tearing Cmd down
+        if exit_code is not None and not cmd.running_count() and not cmd.pending_count():
+            app.exit(exit_code)
+
+    cmd.queueChanged.connect(exit_when_idle)
+    QTimer.singleShot(0, lambda: run(args, cmd, done))
+    app.exec()
+    cmd.cancel_all()
+    cmd.close_sessions()
+    return EXIT_FAILED if exit_code is None else exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
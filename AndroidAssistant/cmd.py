@@ -1,65 +1,774 @@
-from PySide6.QtCore import QObject, QProcess, Signal
+import heapq
+import itertools
+import os
+import signal
+import subprocess
+import sys
+import time
+from collections import deque
+from typing import Iterator
 
+from PySide6.QtCore import QCoreApplication, QObject, QProcess, QTimer, Signal, SIGNAL
+
+from cmd_output import CmdOutput, STDERR, STDOUT
 from logger import Logger
+from result_cache import ResultCache, strip_serial
+from shell_batch import ShellBatch
+from shell_session import ShellSession
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_FINISHED = "finished"
+JOB_CANCELLED = "cancelled"
+JOB_TIMEOUT = "timeout"
+
+STDIN_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def _child_pids(pid: int) -> list[int]:
+    if sys.platform.startswith("linux"):
+        children = []
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat", "rb") as f:
+                    fields = f.read().rsplit(b")", 1)[1].split()
+            except OSError:
+                continue
+            if int(fields[1]) == pid:
+                children.append(int(entry))
+        return children
+
+    result = subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True)
+    return [int(line) for line in result.stdout.split()]
+
+
+def kill_process_tree(process: QProcess) -> None:
+    pid = process.processId()
+    if not pid:
+        return
+
+    # The adb client has no children of its own except a freshly forked adb server,
+    # which is shared by every client and must survive.
+    if os.path.splitext(os.path.basename(process.program()))[0] == "adb":
+        process.kill()
+        return
+
+    if sys.platform.startswith("win"):
+        subprocess.run(
+            ["taskkill", "/F", "/T", "/PID", str(pid)],
+            capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW
+        )
+        process.kill()
+        return
+
+    pending = [pid]
+    tree = []
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(_child_pids(current))
+    for child in reversed(tree[1:]):
+        try:
+            os.kill(child, signal.SIGKILL)
+        except OSError:
+            pass
+    process.kill()
+
+
+class CmdJob:
+    def __init__(
+            self,
+            cmd: "Cmd",
+            job_id: int,
+            program: str,
+            program_args: list,
+            serial: str | None,
+            priority: int,
+            callback=None,
+            callback_kwargs=None,
+            use_logger: bool = True,
+            spill_threshold: int | None = None,
+            timeout: float | None = None,
+            stdin: bytes | Iterator[bytes] | None = None,
+            stdout_callback=None,
+            stream: bool = False,
+            keep_stdout: bool = True
+    ):
+        self._cmd = cmd
+        self.id = job_id
+        self.program = program
+        self.program_args = list(program_args)
+        self.serial = serial
+        self.priority = priority
+        self.callback = callback
+        self.callback_kwargs = callback_kwargs
+        self.use_logger = use_logger
+        self.spill_threshold = spill_threshold
+        self.timeout = timeout
+        self.stdin = stdin
+        self.stdout_callback = stdout_callback
+        self.stream = stream
+        # without it stdout only reaches stdout_callback, for output too big to hold like an archive
+        self.keep_stdout = keep_stdout and not stream
+
+        self.cmd_str = f"{program} {' '.join(self.program_args)}"
+        self.tag = f"[{job_id}]"
+        self.state = JOB_PENDING
+        self.code: int | None = None
+        self.queued_at = time.monotonic()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.cache_key: tuple | None = None
+        self.cache_ttl: float = 0.0
+        self.cached = False
+        self.leader: CmdJob | None = None
+        self.followers: list[CmdJob] = []
+        self.coalesce_key: tuple | None = None
+        self.process: QProcess | None = None
+        self.session_marker: bytes | None = None
+        self.backend_request = None
+        self.timer: QTimer | None = None
+
+    @property
+    def device(self) -> tuple:
+        return self.program, self.serial
+
+    @property
+    def wait_time(self) -> float:
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return end - self.queued_at
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    @property
+    def done(self) -> bool:
+        return self.state in (JOB_FINISHED, JOB_CANCELLED, JOB_TIMEOUT)
+
+    def cancel(self) -> bool:
+        return self._cmd.cancel(self)
 
 
 class Cmd(QObject):
     outputReceived = Signal(str)
-    finished = Signal(int, str)  # code, output
+    finished = Signal(int, object)  # code, CmdOutput
+    queueChanged = Signal(int, int)  # running, pending
 
-    def __init__(self, logger: Logger | None = None, use_logger: bool = True):
+    def __init__(
+            self,
+            logger: Logger | None = None,
+            use_logger: bool = True,
+            max_running: int = 8,
+            max_running_per_serial: int = 2,
+            backend=None,
+            default_timeout: float | None = None,
+            cache: ResultCache | None = None
+    ):
         super().__init__()
         self._logger: Logger | None = logger
         self._use_logger = use_logger
 
+        self._max_running = max_running
+        self._max_running_per_serial = max_running_per_serial
+        self._default_timeout = default_timeout
+
         self._times: int = 0
+        self._seq = itertools.count()
+        self._backend = backend
+        self._cache = cache if cache is not None else ResultCache()
         self._processes: list[QProcess] = []
+        self._active: list[CmdJob] = []
+        self._streams: list[CmdJob] = []  # long-lived jobs outside the concurrency limits
+        self._unscheduled_jobs: list[CmdJob] = []
+        self._queues: dict[tuple, list] = {}  # (program, serial) -> heap of (-priority, seq, job)
+        self._running: dict[tuple, int] = {}  # (program, serial) -> running count
+        self._wait_times: deque[float] = deque(maxlen=200)
+        self._sessions: dict[str | None, ShellSession] = {}
+        self._inflight: dict[tuple, CmdJob] = {}  # coalesce key -> leader job
+        self.coalesced_count = 0
+
+        app = QCoreApplication.instance()
+        if app:
+            app.aboutToQuit.connect(self.cancel_all)
+            app.aboutToQuit.connect(self.close_sessions)
+
+    @property
+    def backend(self):
+        return self._backend
+
+    def set_backend(self, backend) -> None:
+        self._backend = backend
+
+    @property
+    def cache(self) -> ResultCache:
+        return self._cache
+
+    @property
+    def logger(self) -> Logger | None:
+        return self._logger if self._use_logger else None
+
+    @staticmethod
+    def parse_serial(program_args: list) -> str | None:
+        for i, arg in enumerate(program_args[:-1]):
+            if arg == "-s":
+                return program_args[i + 1]
+        return None
+
+    @staticmethod
+    def parse_shell_command(program: str, program_args: list) -> str | None:
+        if program != "adb":
+            return None
+        args = list(program_args)
+        if args[:1] == ["-s"]:
+            args = args[2:]
+        if len(args) < 2 or args[0] != "shell":
+            return None
+        return " ".join(args[1:])
+
+    def shell_session(self, serial: str | None = None) -> ShellSession:
+        session = self._sessions.get(serial)
+        if session is None:
+            session = ShellSession(self, serial)
+            self._sessions[serial] = session
+        return session
+
+    def close_sessions(self) -> None:
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+
+    @property
+    def limits(self) -> tuple[int, int]:
+        return self._max_running, self._max_running_per_serial
+
+    def set_limits(self, max_running: int | None = None, max_running_per_serial: int | None = None) -> None:
+        if max_running is not None:
+            self._max_running = max(1, max_running)
+        if max_running_per_serial is not None:
+            self._max_running_per_serial = max(1, max_running_per_serial)
+        self._schedule()
+
+    def pending_count(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def running_count(self) -> int:
+        return len(self._active)
+
+    def jobs(self) -> list[CmdJob]:
+        pending = [entry[2] for queue in self._queues.values() for entry in queue]
+        return sorted(self._active + self._streams + self._unscheduled_jobs + pending, key=lambda job: job.id)
+
+    def stats(self) -> dict:
+        wait_times = list(self._wait_times)
+        return {
+            "running": self.running_count(),
+            "pending": self.pending_count(),
+            "pending_per_device": {
+                device: len(queue) for device, queue in self._queues.items() if queue
+            },
+            "running_per_device": {
+                device: count for device, count in self._running.items() if count
+            },
+            "avg_wait": sum(wait_times) / len(wait_times) if wait_times else 0.0,
+            "max_wait": max(wait_times) if wait_times else 0.0,
+            "cache": self._cache.stats(),
+            "coalesced": self.coalesced_count,
+        }
+
+    def run(
+            self,
+            program: str,
+            program_args: list,
+            callback=None,
+            callback_kwargs=None,
+            use_logger=True,
+            priority: int = 0,
+            serial: str | None = None,
+            use_session: bool = False,
+            spill_threshold: int | None = None,
+            timeout: float | None = None,
+            cache_ttl: float | None = None,
+            coalesce: bool | None = None,
+            stdin: bytes | Iterator[bytes] | None = None,
+            stdout_callback=None,
+            stream: bool = False,
+            keep_stdout: bool = True
+    ) -> CmdJob:
+        if serial is None:
+            serial = self.parse_serial(program_args)
+
+        self._times += 1
+        job = CmdJob(
+            self, self._times, program, program_args, serial, priority,
+            callback, callback_kwargs,
+            use_logger and self._use_logger and self._logger is not None,
+            spill_threshold,
+            timeout if timeout is not None else self._default_timeout,
+            stdin,
+            stdout_callback,
+            stream,
+            keep_stdout
+        )
+
+        if stream:
+            # a stream never ends on its own: stdout only goes to stdout_callback and no slot is taken
+            self._start(job)
+            self.queueChanged.emit(self.running_count(), self.pending_count())
+            return job
+
+        job.cache_ttl = self._cache.ttl_for(program, program_args) if cache_ttl is None else cache_ttl
+        if job.cache_ttl > 0 and job.keep_stdout:
+            job.cache_key = self._cache.make_key(serial, program, program_args)
+            cached = self._cache.get(job.cache_key)
+            if cached is not None:
+                self._run_cached(job, *cached)
+                return job
+
+        if coalesce is None:
+            # a follower gets the leader's output only when it is done, nothing that streams or feeds stdin
+            coalesce = job.cache_key is not None or (
+                stdin is None and stdout_callback is None and job.keep_stdout
+                and self._cache.is_idempotent(program, program_args)
+            )
+        if coalesce:
+            key = job.cache_key or self._cache.make_key(serial, program, program_args)
+            leader = self._inflight.get(key)
+            if leader is not None and not leader.done:
+                self._follow(leader, job)
+                if leader.state == JOB_PENDING and priority > leader.priority:
+                    # a prefetch that someone now waits for should not stay at the back of the queue
+                    self._reprioritize(leader, priority)
+                return job
+            self._inflight[key] = job
+            job.coalesce_key = key
+
+        self._cache.on_command(serial, program, program_args)
+
+        use_session = use_session and stdin is None and keep_stdout
+        shell_command = self.parse_shell_command(program, program_args) if use_session else None
+        if shell_command is not None:
+            self._run_in_session(job, shell_command)
+            return job
+
+        heapq.heappush(self._queues.setdefault(job.device, []), (-priority, next(self._seq), job))
+        self._schedule()
+        return job
+
+    def run_batch(
+            self,
+            items: list[tuple[object, str]],
+            callback=None,
+            item_callback=None,
+            serial: str | None = None,
+            use_logger=True,
+            priority: int = 0,
+            timeout: float | None = None
+    ) -> CmdJob:
+        batch = ShellBatch(items, item_callback)
+        program_args = (["-s", serial] if serial else []) + ["shell", "sh"]
+
+        def on_finished(code, output):
+            results = batch.finish(code, output.stderr if code else "")
+            if callback:
+                callback(code, results)
+
+        if use_logger and self.logger:
+            self._logger.info(f"batching {len(items)} shell commands into one adb shell")
+        return self.run(
+            "adb", program_args, on_finished,
+            use_logger=use_logger, priority=priority, serial=serial, timeout=timeout,
+            stdin=batch.script(), stdout_callback=batch.feed
+        )
+
+    def fan_out(
+            self,
+            serials: list,
+            program: str,
+            program_args: list,
+            callback=None,
+            item_callback=None,
+            **kwargs
+    ) -> list[CmdJob]:
+        serials = list(dict.fromkeys(serials)) or [None]
+        results = {}
+
+        def on_finished(code, output, serial):
+            results[serial] = (code, output)
+            if item_callback:
+                item_callback(serial, code, output)
+            if len(results) == len(serials) and callback:
+                callback({serial: results[serial] for serial in serials})
+
+        return [
+            self.run(
+                program, (["-s", serial] if serial else []) + list(program_args),
+                on_finished, dict(serial=serial), serial=serial, **kwargs
+            )
+            for serial in serials
+        ]
+
+    def cancel(self, job: CmdJob, reason: str = JOB_CANCELLED) -> bool:
+        if job.done:
+            return False
+
+        if job.state == JOB_PENDING:
+            queue = self._queues.get(job.device, [])
+            queue[:] = [entry for entry in queue if entry[2] is not job]
+            heapq.heapify(queue)
+            if not queue:
+                self._queues.pop(job.device, None)
+            job.state = reason
+            self._finish(job, -1, CmdOutput.from_bytes(f"{reason}\n".encode(), STDERR))
+            self._schedule()
+            return True
+
+        job.state = reason
+        if job.process is not None:
+            # on_finished reports the job once the process is gone
+            kill_process_tree(job.process)
+        elif job in self._unscheduled_jobs:
+            self._unscheduled_jobs.remove(job)
+            if job.leader is not None:
+                job.leader.followers.remove(job)
+            if job.session_marker is not None:
+                self.shell_session(job.serial).cancel(job.session_marker)
+            self._finish(job, -1, CmdOutput.from_bytes(f"{reason}\n".encode(), STDERR))
+        else:
+            # shutting the request's sockets down unblocks its worker thread, whatever it still reports is dropped
+            if job.backend_request is not None:
+                job.backend_request.cancel()
+            self._release(job)
+            self._finish(job, -1, CmdOutput.from_bytes(f"{reason}\n".encode(), STDERR))
+            self._schedule()
+        return True
+
+    def cancel_all(self, include_streams: bool = True) -> int:
+        count = 0
+        for job in reversed(self.jobs()):
+            if job.stream and not include_streams:
+                continue
+            if self.cancel(job):
+                count += 1
+        return count
+
+    def _schedule(self) -> None:
+        while len(self._active) < self._max_running:
+            best = None
+            for device, queue in self._queues.items():
+                if not queue or self._running.get(device, 0) >= self._max_running_per_serial:
+                    continue
+                if best is None or queue[0][:2] < self._queues[best][0][:2]:
+                    best = device
+            if best is None:
+                break
+            _, _, job = heapq.heappop(self._queues[best])
+            if not self._queues[best]:
+                del self._queues[best]
+            self._start(job)
+
+        self.queueChanged.emit(self.running_count(), self.pending_count())
+
+    def _reprioritize(self, job: CmdJob, priority: int) -> None:
+        queue = self._queues.get(job.device, [])
+        for i, entry in enumerate(queue):
+            if entry[2] is job:
+                queue[i] = (-priority, entry[1], job)
+                heapq.heapify(queue)
+                break
+        job.priority = priority
+
+    def _arm_timeout(self, job: CmdJob) -> None:
+        if not job.timeout:
+            return
+        job.timer = QTimer(self)
+        job.timer.setSingleShot(True)
+        job.timer.timeout.connect(lambda: self.cancel(job, JOB_TIMEOUT))
+        job.timer.start(int(job.timeout * 1000))
+
+    def _follow(self, leader: CmdJob, job: CmdJob) -> None:
+        job.leader = leader
+        job.state = JOB_RUNNING
+        job.started_at = time.monotonic()
+        leader.followers.append(job)
+        self._unscheduled_jobs.append(job)
+        self.coalesced_count += 1
+        self._log_start(job, f" (joined {leader.tag})")
+
+    def _run_cached(self, job: CmdJob, code: int, output: CmdOutput) -> None:
+        job.cached = True
+        job.state = JOB_RUNNING
+        job.started_at = time.monotonic()
+        self._unscheduled_jobs.append(job)
+
+        def deliver():
+            if job.done:
+                return
+            self._unscheduled_jobs.remove(job)
+            self._finish(job, code, output)
+
+        self._log_start(job, " (cached)")
+        QTimer.singleShot(0, self, deliver)
+
+    def _run_in_session(self, job: CmdJob, shell_command: str) -> None:
+        job.state = JOB_RUNNING
+        job.started_at = time.monotonic()
+        self._unscheduled_jobs.append(job)
+
+        def on_done(code, stdout: bytes, stderr: bytes):
+            if job.done:
+                return
+            self._unscheduled_jobs.remove(job)
+            if job.stdout_callback:
+                job.stdout_callback(stdout)
+            output = CmdOutput.from_bytes(stdout)
+            output.append(STDERR, stderr)
+            self._stream_chunk(job, output.new_decoder(), stdout)
+            self._stream_chunk(job, output.new_decoder(), stderr)
+            self._finish(job, code, output)
+
+        self._log_start(job, " (session)")
+        self._arm_timeout(job)
+        job.session_marker = self.shell_session(job.serial).execute(shell_command, on_done)
+
+    def _log_start(self, job: CmdJob, suffix: str = "") -> None:
+        if not job.use_logger:
+            return
+        if job.wait_time >= 0.05:
+            suffix += f" (queued {job.wait_time:.2f}s)"
+        self._logger.info(job.cmd_str + suffix, tag=job.tag, command=job.cmd_str)
+
+    def _stream_chunk(self, job: CmdJob, decoder, data: bytes) -> None:
+        if job.stream:
+            return
+        if not job.use_logger and not self.receivers(SIGNAL("outputReceived(QString)")):
+            return
+        text = decoder.decode(data)
+        if not text:
+            return
+        self.outputReceived.emit(text)
+        if job.use_logger and job.spill_threshold is None:
+            self._logger.debug(text, tag=job.tag, command=job.cmd_str)
+
+    def _finish(self, job: CmdJob, code: int, output: CmdOutput) -> None:
+        if job.state in (JOB_PENDING, JOB_RUNNING):
+            job.state = JOB_FINISHED
+        job.code = code
+        job.finished_at = time.monotonic()
+        if not job.cached and job.leader is None:
+            if job.program == "adb" and strip_serial(job.program_args)[:1] == ("devices",) and code == 0:
+                self._cache.observe_devices(output.stdout)
+            self._cache.on_command(job.serial, job.program, job.program_args)
+            if job.cache_key is not None and job.state == JOB_FINISHED and code == 0:
+                self._cache.put(job.cache_key, code, output, job.cache_ttl)
+        if job.coalesce_key is not None and self._inflight.get(job.coalesce_key) is job:
+            del self._inflight[job.coalesce_key]
+        if job.timer is not None:
+            job.timer.stop()
+            job.timer.setParent(None)
+            job.timer.deleteLater()
+            job.timer = None
+        if job.stdin is not None and not isinstance(job.stdin, bytes):
+            # a generator left half way still holds whatever it has open
+            close = getattr(job.stdin, "close", None)
+            if close is not None:
+                close()
+            job.stdin = None
+
+        if job.callback:
+            if job.callback_kwargs:
+                job.callback(code, output, **job.callback_kwargs)
+            else:
+                job.callback(code, output)
+        self.finished.emit(code, output)
+        if job.use_logger:
+            if job.spill_threshold is not None:
+                spilled = ", ".join(filter(None, (output.path(STDOUT), output.path(STDERR))))
+                self._logger.debug(
+                    f"captured {len(output)} bytes" + (f", spilled to {spilled}" if spilled else ""),
+                    tag=job.tag, command=job.cmd_str
+                )
+            if job.state != JOB_FINISHED:
+                self._logger.warning(
+                    f"{job.cmd_str} {job.state} after {job.elapsed:.1f}s", tag=job.tag, command=job.cmd_str
+                )
+            elif code == 0:
+                self._logger.success(f"{job.cmd_str} exited with code {code}", tag=job.tag, command=job.cmd_str)
+            else:
+                self._logger.error(f"{job.cmd_str} exited with code {code}", tag=job.tag, command=job.cmd_str)
+
+        followers, job.followers = job.followers, []
+        if followers and job.state != JOB_FINISHED:
+            # one caller giving up must not fail the others, the first of them runs the command itself
+            self._promote(job, followers)
+            return
+        for follower in followers:
+            self._unscheduled_jobs.remove(follower)
+            self._finish(follower, code, output)
+
+    def _promote(self, job: CmdJob, followers: list[CmdJob]) -> None:
+        leader = followers[0]
+        self._unscheduled_jobs.remove(leader)
+        leader.leader = None
+        leader.state = JOB_PENDING
+        leader.started_at = None
+        leader.followers = followers[1:]
+        for follower in leader.followers:
+            follower.leader = leader
+        if job.coalesce_key is not None:
+            leader.coalesce_key = job.coalesce_key
+            self._inflight[job.coalesce_key] = leader
+        if leader.use_logger:
+            self._logger.info(f"{leader.cmd_str} taking over from {job.tag}", tag=leader.tag, command=leader.cmd_str)
+        heapq.heappush(self._queues.setdefault(leader.device, []), (-leader.priority, next(self._seq), leader))
+        self._schedule()
+
+    def _acquire(self, job: CmdJob) -> None:
+        job.state = JOB_RUNNING
+        job.started_at = time.monotonic()
+        if job.stream:
+            self._streams.append(job)
+            self._arm_timeout(job)
+            return
+        self._wait_times.append(job.wait_time)
+        self._running[job.device] = self._running.get(job.device, 0) + 1
+        self._active.append(job)
+        self._arm_timeout(job)
+
+    def _release(self, job: CmdJob) -> None:
+        if job.stream:
+            self._streams.remove(job)
+            return
+        self._active.remove(job)
+        self._running[job.device] -= 1
+        if not self._running[job.device]:
+            del self._running[job.device]
+
+    def _start(self, job: CmdJob) -> None:
+        if job.stdin is None and not job.stream and self._backend is not None \
+                and self._backend.supports(job.program, job.program_args):
+            self._start_backend(job)
+            return
 
-    def run(self, program: str, program_args: list, callback=None, callback_kwargs=None, use_logger=True):
         process = QProcess(self)
-        output = ""
-        cmd_str = f"{program} {' '.join(program_args)}"
+        job.process = process
+        self._acquire(job)
+
+        output = CmdOutput(spill_threshold=job.spill_threshold)
+        decoders = (output.new_decoder(), output.new_decoder())
 
         process.setProcessChannelMode(QProcess.ProcessChannelMode.SeparateChannels)
 
         def on_stdout():
-            nonlocal output
-            data = process.readAllStandardOutput().data().decode()
-            output += data
-            self.outputReceived.emit(data)
-            if use_logger and self._logger:
-                self._logger.debug(data, tag=tag)
+            data = process.readAllStandardOutput().data()
+            if job.stdout_callback:
+                job.stdout_callback(data)
+            if job.keep_stdout:
+                output.append(STDOUT, data)
+                self._stream_chunk(job, decoders[STDOUT], data)
 
         def on_stderr():
-            nonlocal output
-            data = process.readAllStandardError().data().decode()
-            output += data
-            self.outputReceived.emit(data)
-            if use_logger and self._logger:
-                self._logger.debug(data, tag=tag)
+            data = process.readAllStandardError().data()
+            output.append(STDERR, data)
+            self._stream_chunk(job, decoders[STDERR], data)
+
+        def on_error(error):
+            if error == QProcess.ProcessError.FailedToStart:
+                output.append(STDERR, process.errorString().encode())
+                on_finished(-1)
+
+        stop_stdin = None
 
         def on_finished(code):
-            if callback:
-                if callback_kwargs:
-                    callback(code, output, **callback_kwargs)
-                else:
-                    callback(code, output)
-            self.finished.emit(code, output)
+            if process not in self._processes:
+                return
             self._processes.remove(process)
-            if use_logger and self._logger:
-                if code == 0:
-                    self._logger.success(f"{cmd_str} exited with code {code}", tag=tag)
-                else:
-                    self._logger.error(f"{cmd_str} exited with code {code}", tag=tag)
+            self._release(job)
+            job.process = None
+
+            if stop_stdin is not None and stop_stdin():
+                output.append(STDERR, b"\nstdin was abandoned before all input was written\n")
+            if job.state != JOB_RUNNING:
+                code = -1
+                output.append(STDERR, f"\n{job.state}\n".encode())
+            self._finish(job, code, output)
+            # detached first, a Cmd dropped before the deferred delete runs would otherwise delete it twice
+            process.setParent(None)
+            process.deleteLater()
+            self._schedule()
 
         process.readyReadStandardOutput.connect(on_stdout)
         process.readyReadStandardError.connect(on_stderr)
         process.finished.connect(on_finished)
+        process.errorOccurred.connect(on_error)
 
-        if use_logger and self._logger:
-            self._times += 1
-            tag = f"[{self._times}]"
-            self._logger.info(cmd_str, tag=tag)
-
-        process.start(program, program_args)
+        self._log_start(job)
         self._processes.append(process)
+        process.start(job.program, job.program_args)
+        if isinstance(job.stdin, bytes):
+            process.write(job.stdin)
+            process.closeWriteChannel()
+        elif job.stdin is not None and job.process is not None:
+            stop_stdin = self._feed_stdin(process, iter(job.stdin))
+
+    def _feed_stdin(self, process: QProcess, chunks: Iterator[bytes]):
+        # generated input is written as the pipe drains, so it never has to sit in memory as a whole
+        state = {"connected": True, "exhausted": False}
+
+        def feed(*_):
+            while state["connected"] and process.bytesToWrite() < STDIN_BUFFER_SIZE:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    state["exhausted"] = True
+                    stop()
+                    process.closeWriteChannel()
+                    return
+                process.write(chunk)
+
+        def stop() -> bool:
+            # returns whether input was left unwritten
+            if state["connected"]:
+                state["connected"] = False
+                process.bytesWritten.disconnect(feed)
+            return not state["exhausted"]
+
+        process.bytesWritten.connect(feed)
+        feed()
+        return stop
+
+    def _start_backend(self, job: CmdJob) -> None:
+        self._acquire(job)
+        output = CmdOutput(spill_threshold=job.spill_threshold)
+        decoders = (output.new_decoder(), output.new_decoder())
+
+        def on_output(data: bytes):
+            if job.done:
+                return
+            if job.stdout_callback:
+                job.stdout_callback(data)
+            if job.keep_stdout:
+                output.append(STDOUT, data)
+                self._stream_chunk(job, decoders[STDOUT], data)
+
+        def on_error(data: bytes):
+            if job.done:
+                return
+            output.append(STDERR, data)
+            self._stream_chunk(job, decoders[STDERR], data)
+
+        def on_done(code: int):
+            if job.done:
+                return
+            self._release(job)
+            self._finish(job, code, output)
+            self._schedule()
+
+        self._log_start(job, " (native)")
+        job.backend_request = self._backend.start(
+            job.program, job.program_args, on_output, on_error, on_done
+        )
@@ -0,0 +1,146 @@
+import asyncio
+
+from PySide6 import QtAsyncio
+
+from cmd import Cmd, CmdJob
+from cmd_output import CmdOutput
+
+
+class CmdError(Exception):
+    def __init__(self, result: "CmdResult"):
+        super().__init__(f"{result.cmd_str} exited with code {result.code}: {result.text.strip()[-500:]}")
+        self.result = result
+
+
+class CmdResult:
+    def __init__(self, job: CmdJob, code: int, output: CmdOutput | str, key=None):
+        self.job = job
+        self.code = code
+        self.output = output
+        self.key = key
+
+    @property
+    def cmd_str(self) -> str:
+        return self.job.cmd_str if self.key is None else f"{self.job.cmd_str} [{self.key}]"
+
+    @property
+    def serial(self) -> str | None:
+        return self.job.serial
+
+    @property
+    def state(self) -> str:
+        return self.job.state
+
+    @property
+    def elapsed(self) -> float:
+        return self.job.elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.code == 0
+
+    @property
+    def stdout(self) -> str:
+        return self.output.stdout if isinstance(self.output, CmdOutput) else self.output
+
+    @property
+    def stderr(self) -> str:
+        return self.output.stderr if isinstance(self.output, CmdOutput) else ""
+
+    @property
+    def text(self) -> str:
+        return str(self.output)
+
+    def check(self) -> "CmdResult":
+        if not self.ok:
+            raise CmdError(self)
+        return self
+
+    def __repr__(self) -> str:
+        return f"CmdResult({self.cmd_str!r}, code={self.code})"
+
+
+class AsyncCmd:
+    def __init__(self, cmd: Cmd | None = None):
+        self.cmd = cmd if cmd is not None else Cmd()
+
+    async def _wait(self, start):
+        future = asyncio.get_running_loop().create_future()
+
+        def on_finished(code, output):
+            if not future.done():
+                future.set_result((code, output))
+
+        job = start(on_finished)
+        try:
+            code, output = await future
+        except asyncio.CancelledError:
+            job.cancel()
+            raise
+        return job, code, output
+
+    async def run(self, program: str, program_args: list, check: bool = False, **kwargs) -> CmdResult:
+        job, code, output = await self._wait(
+            lambda on_finished: self.cmd.run(program, program_args, on_finished, **kwargs)
+        )
+        result = CmdResult(job, code, output)
+        return result.check() if check else result
+
+    async def adb(self, *program_args: str, serial: str | None = None, check: bool = False, **kwargs) -> CmdResult:
+        program_args = (["-s", serial] if serial else []) + list(program_args)
+        return await self.run("adb", program_args, check, serial=serial, **kwargs)
+
+    async def shell(
+            self,
+            command: str,
+            serial: str | None = None,
+            check: bool = False,
+            use_session: bool = True,
+            **kwargs
+    ) -> CmdResult:
+        return await self.adb("shell", command, serial=serial, check=check, use_session=use_session, **kwargs)
+
+    async def run_batch(
+            self,
+            items: list[tuple[object, str]],
+            serial: str | None = None,
+            check: bool = False,
+            **kwargs
+    ) -> dict:
+        job, _, results = await self._wait(
+            lambda on_finished: self.cmd.run_batch(items, on_finished, serial=serial, **kwargs)
+        )
+        results = {key: CmdResult(job, code, output, key) for key, (code, output) in results.items()}
+        if check:
+            for result in results.values():
+                result.check()
+        return results
+
+    async def fan_out(
+            self,
+            serials: list,
+            program_args: list,
+            check: bool = False,
+            limit: int | None = None,
+            **kwargs
+    ) -> dict:
+        serials = list(dict.fromkeys(serials)) or [None]
+        results = await gather_with_limit(
+            limit or len(serials),
+            *(self.adb(*program_args, serial=serial, check=check, **kwargs) for serial in serials)
+        )
+        return dict(zip(serials, results))
+
+
+async def gather_with_limit(limit: int, *aws, return_exceptions: bool = False) -> list:
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def limited(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(limited(aw) for aw in aws), return_exceptions=return_exceptions)
+
+
+def run_until_complete(coro):
+    return QtAsyncio.run(coro, keep_running=False)
@@ -0,0 +1,217 @@
+import codecs
+import mmap
+import os
+import tempfile
+
+STDOUT = 0
+STDERR = 1
+
+# stdout/stderr alternations remembered for text; past this the order is given up instead of growing without bound
+MAX_RUNS = 4096
+
+
+class _ChannelBuffer:
+    def __init__(self, spill_threshold: int | None = None, keep_bytes: int = 64 * 1024):
+        self._spill_threshold = spill_threshold
+        self._keep_bytes = keep_bytes
+
+        self._memory = bytearray()
+        self._size = 0
+        self._file = None
+        self._head = b""
+        self._tail = bytearray()
+        self._mmap: mmap.mmap | None = None
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    @property
+    def path(self) -> str | None:
+        return self._file.name if self._file is not None else None
+
+    @property
+    def head(self) -> bytes:
+        return self._head if self.spilled else bytes(self._memory[:self._keep_bytes])
+
+    @property
+    def tail(self) -> bytes:
+        return bytes(self._tail[-self._keep_bytes:] if self.spilled else self._memory[-self._keep_bytes:])
+
+    def append(self, data: bytes) -> None:
+        self._size += len(data)
+        if not self.spilled:
+            self._memory += data
+            if self._spill_threshold is not None and len(self._memory) > self._spill_threshold:
+                self._spill()
+            return
+
+        self._file.write(data)
+        self._tail += data
+        if len(self._tail) > 2 * self._keep_bytes:
+            del self._tail[:-self._keep_bytes]
+        self._close_mmap()
+
+    def _spill(self) -> None:
+        self._file = tempfile.NamedTemporaryFile(prefix="aa-cmd-", suffix=".out", delete=False)
+        self._file.write(self._memory)
+        self._head = bytes(self._memory[:self._keep_bytes])
+        self._tail = bytearray(self._memory[-self._keep_bytes:])
+        self._memory = bytearray()
+
+    def view(self):
+        if not self.spilled:
+            return memoryview(self._memory).toreadonly()
+        if self._mmap is None:
+            self._file.flush()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def read(self, start: int = 0, end: int | None = None) -> bytes:
+        if not self.spilled:
+            return bytes(self._memory[start:end])
+        if not self._size:
+            return b""
+        return self.view()[start:end]
+
+    def _close_mmap(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def close(self) -> None:
+        self._close_mmap()
+        if self._file is not None:
+            path = self._file.name
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class CmdOutput:
+    def __init__(self, encoding: str = "utf-8", spill_threshold: int | None = None, keep_bytes: int = 64 * 1024):
+        self.encoding = encoding
+        self._buffers = (_ChannelBuffer(spill_threshold, keep_bytes), _ChannelBuffer(spill_threshold, keep_bytes))
+        self._runs: list[list[int]] | None = []  # [channel, start, end] in arrival order, adjacent runs merged
+        self._cache: dict[str, str] = {}
+
+    @classmethod
+    def from_bytes(cls, data: bytes, channel: int = STDOUT, encoding: str = "utf-8") -> "CmdOutput":
+        output = cls(encoding)
+        output.append(channel, data)
+        return output
+
+    def append(self, channel: int, data: bytes) -> None:
+        if not data:
+            return
+        buf = self._buffers[channel]
+        start = buf.size
+        buf.append(data)
+        if self._runs is None:
+            pass
+        elif self._runs and self._runs[-1][0] == channel:
+            self._runs[-1][2] = buf.size
+        elif len(self._runs) < MAX_RUNS:
+            self._runs.append([channel, start, buf.size])
+        else:
+            self._runs = None
+        self._cache.clear()
+
+    def new_decoder(self):
+        return codecs.getincrementaldecoder(self.encoding)(errors="replace")
+
+    @property
+    def spilled(self) -> bool:
+        return any(buf.spilled for buf in self._buffers)
+
+    def path(self, channel: int = STDOUT) -> str | None:
+        return self._buffers[channel].path
+
+    def size(self, channel: int | None = None) -> int:
+        if channel is None:
+            return len(self)
+        return self._buffers[channel].size
+
+    def view(self, channel: int = STDOUT):
+        return self._buffers[channel].view()
+
+    def head_text(self, channel: int = STDOUT) -> str:
+        return self._buffers[channel].head.decode(self.encoding, errors="replace")
+
+    def tail_text(self, channel: int = STDOUT) -> str:
+        return self._buffers[channel].tail.decode(self.encoding, errors="replace")
+
+    @property
+    def stdout_bytes(self) -> bytes:
+        return self._buffers[STDOUT].read()
+
+    @property
+    def stderr_bytes(self) -> bytes:
+        return self._buffers[STDERR].read()
+
+    @property
+    def stdout(self) -> str:
+        return self._decoded("stdout", lambda: self.stdout_bytes.decode(self.encoding, errors="replace"))
+
+    @property
+    def stderr(self) -> str:
+        return self._decoded("stderr", lambda: self.stderr_bytes.decode(self.encoding, errors="replace"))
+
+    @property
+    def text(self) -> str:
+        return self._decoded("text", self._decode_interleaved)
+
+    def _decoded(self, key: str, decode) -> str:
+        text = self._cache.get(key)
+        if text is None:
+            text = self._cache[key] = decode()
+        return text
+
+    @property
+    def ordered(self) -> bool:
+        return self._runs is not None
+
+    def _decode_interleaved(self) -> str:
+        if self._runs is None:
+            # too many alternations were recorded, fall back to all of stdout followed by all of stderr
+            return self.stdout + self.stderr
+        if len(self._runs) <= 1:
+            return self.stderr if self._runs and self._runs[0][0] == STDERR else self.stdout
+
+        decoders = (self.new_decoder(), self.new_decoder())
+        parts = []
+        for channel, start, end in self._runs:
+            parts.append(decoders[channel].decode(self._buffers[channel].read(start, end)))
+        parts.append(decoders[STDOUT].decode(b"", final=True))
+        parts.append(decoders[STDERR].decode(b"", final=True))
+        return "".join(parts)
+
+    def save(self, path: str, channel: int = STDOUT, chunk_size: int = 1024 * 1024) -> int:
+        buf = self._buffers[channel]
+        with open(path, "wb") as f:
+            for start in range(0, buf.size, chunk_size):
+                f.write(buf.read(start, start + chunk_size))
+        return buf.size
+
+    def close(self) -> None:
+        for buf in self._buffers:
+            buf.close()
+
+    def __del__(self):
+        self.close()
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __len__(self) -> int:
+        return self._buffers[STDOUT].size + self._buffers[STDERR].size
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
@@ -0,0 +1,219 @@
+import bisect
+import re
+import stat
+from array import array
+
+from file_model import FileEntry
+
+# one line per entry: raw mode in hex, size, mtime, path
+STAT_FORMAT = "%f %s %Y %n"
+DIR_STAT_FORMAT = "%Y %n"
+
+_STAT_LINE = re.compile(r"^([0-9a-f]+) (\d+) (\d+) (/.*)$")
+_DIR_STAT_LINE = re.compile(r"^(\d+) (/.*)$")
+
+_REMOVED = -2
+
+
+def _split(path: str) -> tuple[str, str]:
+    parent, _, name = path.rstrip("/").rpartition("/")
+    return parent or "/", name
+
+
+def parse_stat_lines(text: str) -> list[tuple[str, int, int, int]]:
+    entries = []
+    for line in text.split("\n"):
+        match = _STAT_LINE.match(line)
+        if match:
+            mode, size, mtime, path = match.groups()
+            entries.append((path, int(mode, 16), int(size), int(mtime)))
+        elif entries and line:
+            # a newline inside a file name
+            path, mode, size, mtime = entries[-1]
+            entries[-1] = (f"{path}\n{line}", mode, size, mtime)
+    return entries
+
+
+def parse_dir_stat_lines(text: str) -> dict[str, int]:
+    dirs = {}
+    for line in text.split("\n"):
+        match = _DIR_STAT_LINE.match(line)
+        if match:
+            dirs[match.group(2).rstrip("/") or "/"] = int(match.group(1))
+    return dirs
+
+
+class DeviceSnapshot:
+    def __init__(self, root: str):
+        self.root = root.rstrip("/") or "/"
+        self.names: list[str] = []
+        self.parents = array("i")
+        self.modes = array("I")
+        self.sizes = array("q")
+        self.mtimes = array("q")
+        self._children: dict[int, dict[str, int]] = {}  # dir id -> name -> id
+        self._dirs: dict[str, int] = {}  # dir path -> id
+        self._search_text: str | None = None
+        self._search_offsets: list[int] = []
+        self._search_ids: list[int] = []
+
+    def __len__(self) -> int:
+        return sum(1 for parent in self.parents if parent != _REMOVED)
+
+    def covers(self, path: str) -> bool:
+        path = path.rstrip("/") or "/"
+        return path == self.root or path.startswith(self.root.rstrip("/") + "/")
+
+    def is_dir(self, entry_id: int) -> bool:
+        return stat.S_ISDIR(self.modes[entry_id])
+
+    def path(self, entry_id: int) -> str:
+        parts = []
+        while entry_id >= 0:
+            parts.append(self.names[entry_id])
+            entry_id = self.parents[entry_id]
+        return "/".join(reversed(parts)) or "/"
+
+    def entry_ids(self) -> list[int]:
+        return [entry_id for entry_id, parent in enumerate(self.parents) if parent != _REMOVED]
+
+    def dir_paths(self) -> list[str]:
+        return list(self._dirs)
+
+    def load(self, text: str) -> int:
+        count = 0
+        for path, mode, size, mtime in parse_stat_lines(text):
+            if self.covers(path):
+                self._upsert(path, mode, size, mtime)
+                count += 1
+        self._search_text = None
+        return count
+
+    def _upsert(self, path: str, mode: int, size: int, mtime: int) -> int:
+        path = path.rstrip("/") or "/"
+        entry_id = self._dirs.get(path)
+        if entry_id is None and path != self.root:
+            parent, name = _split(path)
+            parent_id = self._dirs.get(parent)
+            if parent_id is None:
+                return -1
+            entry_id = self._children[parent_id].get(name)
+            if entry_id is None:
+                entry_id = len(self.names)
+                self.names.append(name)
+                self.parents.append(parent_id)
+                self.modes.append(mode)
+                self.sizes.append(size)
+                self.mtimes.append(mtime)
+                self._children[parent_id][name] = entry_id
+        elif entry_id is None:
+            # the root keeps its full path as name and has no parent
+            entry_id = len(self.names)
+            self.names.append(path.rstrip("/"))
+            self.parents.append(-1)
+            self.modes.append(mode)
+            self.sizes.append(size)
+            self.mtimes.append(mtime)
+
+        was_dir = self.is_dir(entry_id)
+        self.modes[entry_id] = mode
+        self.sizes[entry_id] = size
+        self.mtimes[entry_id] = mtime
+        if stat.S_ISDIR(mode):
+            self._dirs[path] = entry_id
+            self._children.setdefault(entry_id, {})
+        elif was_dir:
+            self._remove_children(entry_id)
+            self._dirs.pop(path, None)
+            self._children.pop(entry_id, None)
+        return entry_id
+
+    def _remove(self, entry_id: int) -> None:
+        if self.is_dir(entry_id):
+            self._remove_children(entry_id)
+            self._dirs.pop(self.path(entry_id), None)
+            self._children.pop(entry_id, None)
+        parent_id = self.parents[entry_id]
+        if parent_id >= 0:
+            self._children[parent_id].pop(self.names[entry_id], None)
+        self.parents[entry_id] = _REMOVED
+
+    def _remove_children(self, dir_id: int) -> None:
+        for child_id in list(self._children.get(dir_id, {}).values()):
+            self._remove(child_id)
+
+    def entry(self, entry_id: int, full_path: bool = False) -> FileEntry:
+        mode = self.modes[entry_id]
+        is_dir = stat.S_ISDIR(mode)
+        path = self.path(entry_id) if full_path else None
+        return FileEntry(
+            path or self.names[entry_id], is_dir, None if is_dir else self.sizes[entry_id], self.mtimes[entry_id],
+            path=path, mode=mode
+        )
+
+    def listing(self, path: str) -> list[FileEntry]:
+        dir_id = self._dirs.get(path.rstrip("/") or "/")
+        if dir_id is None:
+            return []
+        return [self.entry(entry_id) for entry_id in self._children[dir_id].values()]
+
+    def changed_dirs(self, dir_mtimes: dict[str, int]) -> tuple[list[str], list[str]]:
+        changed = [
+            path for path, entry_id in self._dirs.items()
+            if path in dir_mtimes and dir_mtimes[path] != self.mtimes[entry_id]
+        ]
+        new = [path for path in dir_mtimes if path not in self._dirs]
+        # a new directory below another new one comes with its parent's subtree
+        new_set = set(new)
+        new_roots = [path for path in new if _split(path)[0] not in new_set]
+        return changed, new_roots
+
+    def apply_changes(self, changed: list[str], dir_mtimes: dict[str, int], text: str) -> None:
+        seen: dict[str, set[str]] = {path: set() for path in changed}
+        for path, mode, size, mtime in parse_stat_lines(text):
+            parent, name = _split(path)
+            if parent in seen:
+                seen[parent].add(name)
+            self._upsert(path, mode, size, mtime)
+
+        for path in changed:
+            dir_id = self._dirs.get(path)
+            if dir_id is None:
+                continue
+            self.mtimes[dir_id] = dir_mtimes[path]
+            for name, child_id in list(self._children[dir_id].items()):
+                if name not in seen[path]:
+                    self._remove(child_id)
+        self._search_text = None
+
+    def _build_search(self) -> None:
+        parts, offsets, ids = [], [], []
+        offset = 0
+        for entry_id, name in enumerate(self.names):
+            if self.parents[entry_id] == _REMOVED or self.parents[entry_id] < 0:
+                continue
+            name = name.lower().replace("\0", " ")
+            offsets.append(offset)
+            ids.append(entry_id)
+            parts.append(name)
+            offset += len(name) + 1
+        self._search_text = "\0".join(parts)
+        self._search_offsets = offsets
+        self._search_ids = ids
+
+    def search(self, query: str, limit: int = 2000) -> list[int]:
+        query = query.lower()
+        if not query or "\0" in query:
+            return []
+        if self._search_text is None:
+            self._build_search()
+        text, offsets, ids = self._search_text, self._search_offsets, self._search_ids
+        found = []
+        pos = text.find(query)
+        while pos != -1 and len(found) < limit:
+            i = bisect.bisect_right(offsets, pos) - 1
+            found.append(ids[i])
+            if i + 1 >= len(offsets):
+                break
+            pos = text.find(query, offsets[i + 1])
+        return found
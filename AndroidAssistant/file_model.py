@@ -0,0 +1,341 @@
+import bisect
+import os
+import stat
+import threading
+import time
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QObject, Signal
+from PySide6.QtWidgets import QApplication, QStyle
+
+
+class FileEntry:
+    __slots__ = ("name", "is_dir", "size", "mtime", "path", "is_parent", "mode", "link")
+
+    def __init__(
+            self,
+            name: str,
+            is_dir: bool,
+            size: int | None = None,
+            mtime: float | None = None,
+            path: str | None = None,
+            is_parent: bool = False,
+            mode: int | None = None,
+            link: str | None = None
+    ):
+        self.name = name
+        self.is_dir = is_dir
+        self.size = size
+        self.mtime = mtime
+        self.path = path
+        self.is_parent = is_parent
+        self.mode = mode
+        self.link = link
+
+    def key(self) -> tuple:
+        return self.name, self.is_dir, self.size, self.mtime, self.path, self.mode, self.link
+
+    def at(self, path: str) -> "FileEntry":
+        return FileEntry(self.name, self.is_dir, self.size, self.mtime, path, self.is_parent, self.mode, self.link)
+
+    def __eq__(self, other):
+        return isinstance(other, FileEntry) and self.key() == other.key()
+
+    def __repr__(self) -> str:
+        return f"FileEntry({self.name!r}, is_dir={self.is_dir})"
+
+
+def format_mode(mode: int | None) -> str:
+    return stat.filemode(mode) if mode is not None else ""
+
+
+def format_size(size: int | None) -> str:
+    if size is None:
+        return ""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return ""
+
+
+def _insert_position(entries: list, value, key, reverse: bool, low: int = 0) -> int:
+    # bisect_right for a list sorted in either direction, equal entries keep their loading order
+    if not reverse:
+        return bisect.bisect_right(entries, value, low, key=key)
+    high = len(entries)
+    while low < high:
+        middle = (low + high) // 2
+        if key(entries[middle]) < value:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+class FileListModel(QAbstractTableModel):
+    COLUMNS = ["名称", "大小", "修改时间", "权限", "链接到"]
+    NAME, SIZE, MTIME, MODE, LINK = range(5)
+    PAGE_SIZE = 1000
+
+    SORT_KEYS = {
+        NAME: lambda entry: entry.name,
+        SIZE: lambda entry: entry.size or 0,
+        MTIME: lambda entry: entry.mtime or 0,
+        MODE: lambda entry: format_mode(entry.mode),
+        LINK: lambda entry: entry.link or "",
+    }
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._entries: list[FileEntry] = []  # every loaded entry, kept sorted
+        self._fetched = 0  # rows handed to the view so far
+        self._parent_entry: FileEntry | None = None
+        self._dirs_only = False
+        self._sort_column = self.NAME
+        self._sort_order = Qt.SortOrder.AscendingOrder
+        self._icons = {}
+
+    @property
+    def total(self) -> int:
+        return len(self._entries)
+
+    def _icon(self, kind):
+        icon = self._icons.get(kind)
+        if icon is None:
+            icon = self._icons[kind] = QApplication.style().standardIcon(kind)
+        return icon
+
+    def _offset(self) -> int:
+        return 1 if self._parent_entry is not None else 0
+
+    def entry(self, row: int) -> FileEntry:
+        offset = self._offset()
+        if row < offset:
+            return self._parent_entry
+        return self._entries[row - offset]
+
+    def entries(self) -> list[FileEntry]:
+        return list(self._entries)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._offset() + self._fetched
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.entry(index.row())
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == self.NAME:
+                return entry.name + "/" if entry.is_dir and not entry.is_parent else entry.name
+            if column == self.SIZE:
+                return "" if entry.is_dir else format_size(entry.size)
+            if column == self.MTIME:
+                return time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.mtime)) if entry.mtime else ""
+            if column == self.MODE:
+                return format_mode(entry.mode)
+            if column == self.LINK:
+                return entry.link or ""
+        if role == Qt.ItemDataRole.DecorationRole and column == self.NAME:
+            if entry.is_parent:
+                return self._icon(QStyle.StandardPixmap.SP_ArrowUp)
+            return self._icon(QStyle.StandardPixmap.SP_DirIcon if entry.is_dir else QStyle.StandardPixmap.SP_FileIcon)
+        if role == Qt.ItemDataRole.ToolTipRole and column == self.NAME and (entry.path or entry.link):
+            return f"{entry.path or entry.name} -> {entry.link}" if entry.link else entry.path
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and self._fetched < len(self._entries)
+
+    def fetchMore(self, parent=QModelIndex()) -> None:
+        count = min(self.PAGE_SIZE, len(self._entries) - self._fetched)
+        if count <= 0:
+            return
+        start = self._offset() + self._fetched
+        self.beginInsertRows(QModelIndex(), start, start + count - 1)
+        self._fetched += count
+        self.endInsertRows()
+
+    def _sort_key(self):
+        column_key = self.SORT_KEYS[self._sort_column]
+        # directories stay on top in either order
+        if self._sort_order == Qt.SortOrder.DescendingOrder:
+            return lambda entry: (entry.is_dir, column_key(entry)), True
+        return lambda entry: (not entry.is_dir, column_key(entry)), False
+
+    def _sort_entries(self) -> None:
+        key, reverse = self._sort_key()
+        self._entries.sort(key=key, reverse=reverse)
+
+    def _relayout(self, change) -> None:
+        self.layoutAboutToBeChanged.emit()
+        offset = self._offset()
+        persistent = [index for index in self.persistentIndexList() if index.row() >= offset]
+        tracked = [self.entry(index.row()) for index in persistent]
+
+        change()
+
+        if persistent:
+            rows = {id(entry): row for row, entry in enumerate(self._entries[:self._fetched])}
+            moved = []
+            for index, entry in zip(persistent, tracked):
+                row = rows.get(id(entry))
+                moved.append(QModelIndex() if row is None else self.index(row + offset, index.column()))
+            self.changePersistentIndexList(persistent, moved)
+        self.layoutChanged.emit()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder) -> None:
+        if column not in self.SORT_KEYS:
+            return
+        self._sort_column, self._sort_order = column, order
+        self._relayout(self._sort_entries)
+
+    def set_entries(self, entries: list[FileEntry], parent_entry: FileEntry | None = None, dirs_only: bool = False):
+        self.beginResetModel()
+        self._parent_entry = parent_entry
+        self._dirs_only = dirs_only
+        self._entries = [entry for entry in entries if entry.is_dir or not dirs_only]
+        self._sort_entries()
+        self._fetched = min(self.PAGE_SIZE, len(self._entries))
+        self.endResetModel()
+
+    def add_entries(self, entries: list[FileEntry]) -> None:
+        entries = [entry for entry in entries if entry.is_dir or not self._dirs_only]
+        if not entries:
+            return
+
+        def merge():
+            key, reverse = self._sort_key()
+            entries.sort(key=key, reverse=reverse)
+            loaded = self._entries
+            if len(entries) * len(loaded).bit_length() >= len(loaded):
+                # binary searches would cost more key calls than one pass, timsort merges the two sorted runs
+                self._entries = loaded + entries
+                self._sort_entries()
+                return
+            # each entry of a small chunk is placed with a binary search, what lies in between is copied in slices
+            merged, start = [], 0
+            for entry in entries:
+                position = _insert_position(loaded, key(entry), key, reverse, start)
+                merged += loaded[start:position]
+                merged.append(entry)
+                start = position
+            merged += loaded[start:]
+            self._entries = merged
+
+        self._relayout(merge)
+        if self._fetched < self.PAGE_SIZE:
+            self.fetchMore()
+
+    def update_entries(self, entries: list[FileEntry]) -> None:
+        details = {entry.name: entry for entry in entries}
+
+        def update():
+            # loaded entries are updated in place, so persistent indexes and selections keep pointing at them
+            for entry in self._entries:
+                detail = details.get(entry.name)
+                if detail is not None:
+                    entry.size, entry.mtime = detail.size, detail.mtime
+                    entry.mode, entry.link = detail.mode, detail.link
+
+        if self._sort_column == self.NAME:
+            update()
+            if self._fetched:
+                offset = self._offset()
+                self.dataChanged.emit(
+                    self.index(offset, self.SIZE), self.index(offset + self._fetched - 1, self.LINK)
+                )
+            return
+        self._relayout(lambda: (update(), self._sort_entries()))
+
+
+class DirScanner(QObject):
+    # scan id, entries, done, error message
+    chunkReady = Signal(int, object, bool, str)
+    # scan id, entries of the same scan with size, mtime, mode and link filled in
+    detailsReady = Signal(int, object)
+
+    CHUNK_SIZE = 2000
+    MAX_CHUNK_SIZE = 50000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._scan_id = 0
+        self._lock = threading.Lock()
+
+    def scan(self, path: str) -> int:
+        with self._lock:
+            self._scan_id += 1
+            scan_id = self._scan_id
+        threading.Thread(target=self._run, args=(scan_id, path), name="DirScanner", daemon=True).start()
+        return scan_id
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._scan_id += 1
+
+    def _cancelled(self, scan_id: int) -> bool:
+        return scan_id != self._scan_id
+
+    def _run(self, scan_id: int, path: str) -> None:
+        scanned = []
+        chunk = []
+        # the first chunk goes out small so something shows up right away
+        chunk_size = 200
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if self._cancelled(scan_id):
+                        return
+                    # names and types come with the directory listing, only links need a stat here
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    scanned.append((entry, is_dir))
+                    chunk.append(FileEntry(entry.name, is_dir))
+                    if len(chunk) >= chunk_size:
+                        self.chunkReady.emit(scan_id, chunk, False, "")
+                        chunk = []
+                        # every merge is a pass over what is loaded, growing chunks keep the number of merges small
+                        chunk_size = min(max(chunk_size * 2, self.CHUNK_SIZE), self.MAX_CHUNK_SIZE)
+        except OSError as e:
+            if not self._cancelled(scan_id):
+                self.chunkReady.emit(scan_id, chunk, True, str(e))
+            return
+        if self._cancelled(scan_id):
+            return
+        self.chunkReady.emit(scan_id, chunk, True, "")
+        self._stat(scan_id, scanned)
+
+    def _stat(self, scan_id: int, scanned: list) -> None:
+        chunk = []
+        chunk_size = self.CHUNK_SIZE
+        for entry, is_dir in scanned:
+            if self._cancelled(scan_id):
+                return
+            try:
+                info = entry.stat()
+                mode, link = info.st_mode, None
+                if entry.is_symlink():
+                    mode = entry.stat(follow_symlinks=False).st_mode
+                    link = os.readlink(entry.path)
+            except OSError:
+                continue
+            chunk.append(FileEntry(
+                entry.name, is_dir, None if is_dir else info.st_size, info.st_mtime, mode=mode, link=link
+            ))
+            if len(chunk) >= chunk_size:
+                self.detailsReady.emit(scan_id, chunk)
+                chunk = []
+                chunk_size = min(chunk_size * 2, self.MAX_CHUNK_SIZE)
+        if chunk and not self._cancelled(scan_id):
+            self.detailsReady.emit(scan_id, chunk)
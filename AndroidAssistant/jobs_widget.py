@@ -0,0 +1,117 @@
+import bisect
+
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, \
+    QAbstractItemView, QHeaderView, QLabel
+
+from cmd import Cmd, JOB_PENDING, JOB_RUNNING
+
+
+class JobsWidget(QWidget):
+    REFRESH_MSEC = 200
+
+    STATE_TEXTS = {
+        JOB_PENDING: "排队中",
+        JOB_RUNNING: "运行中",
+    }
+
+    def __init__(self, cmd: Cmd, parent=None):
+        super().__init__(parent)
+        self._cmd = cmd
+
+        main_layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["ID", "状态", "设备", "命令", "耗时"])
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch)
+        main_layout.addWidget(self.table)
+
+        bottom_layout = QHBoxLayout()
+        self.summary_label = QLabel()
+        self.cancel_selected_btn = QPushButton("取消所选")
+        self.cancel_all_btn = QPushButton("全部取消")
+        bottom_layout.addWidget(self.summary_label)
+        bottom_layout.addStretch()
+        bottom_layout.addWidget(self.cancel_selected_btn)
+        bottom_layout.addWidget(self.cancel_all_btn)
+        main_layout.addLayout(bottom_layout)
+
+        self.cancel_selected_btn.clicked.connect(self.cancel_selected)
+        self.cancel_all_btn.clicked.connect(self.cancel_all)
+
+        self._jobs = {}
+        self._rows: list[int] = []  # job id per table row, in id order like Cmd.jobs()
+        # a batch changes the queue once per command, the table follows at most every REFRESH_MSEC
+        self._pending_refresh = QTimer(self)
+        self._pending_refresh.setSingleShot(True)
+        self._pending_refresh.setInterval(self.REFRESH_MSEC)
+        self._pending_refresh.timeout.connect(self.refresh)
+        self._cmd.queueChanged.connect(self.schedule_refresh)
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.refresh)
+        self._timer.start(500)
+
+    def schedule_refresh(self, *_):
+        if not self._pending_refresh.isActive():
+            self._pending_refresh.start()
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        self._pending_refresh.stop()
+
+        jobs = self._cmd.jobs()
+        self._jobs = {job.id: job for job in jobs}
+
+        # rows of finished jobs go, new ones are inserted and the rest is updated in place,
+        # so the selection stays where it is
+        for row in reversed(range(len(self._rows))):
+            if self._rows[row] not in self._jobs:
+                self.table.removeRow(row)
+                del self._rows[row]
+        known = set(self._rows)
+        for job in jobs:
+            if job.id not in known:
+                # new jobs mostly land at the end, a follower taking over an older leader's place does not
+                row = bisect.bisect(self._rows, job.id)
+                self.table.insertRow(row)
+                for col in range(self.table.columnCount()):
+                    item = QTableWidgetItem()
+                    item.setData(Qt.ItemDataRole.UserRole, job.id)
+                    self.table.setItem(row, col, item)
+                self._rows.insert(row, job.id)
+
+        for row, job_id in enumerate(self._rows):
+            job = self._jobs[job_id]
+            seconds = job.elapsed if job.state == JOB_RUNNING else job.wait_time
+            values = [
+                str(job.id),
+                self.STATE_TEXTS.get(job.state, job.state),
+                job.serial or "",
+                job.cmd_str,
+                f"{seconds:.1f}s",
+            ]
+            for col, value in enumerate(values):
+                item = self.table.item(row, col)
+                if item.text() != value:
+                    item.setText(value)
+
+        running = sum(1 for job in jobs if job.state == JOB_RUNNING)
+        self.summary_label.setText(f"运行中 {running} 个，排队 {len(jobs) - running} 个")
+
+    def cancel_all(self):
+        # long-lived streams such as logcat have their own stop buttons
+        self._cmd.cancel_all(include_streams=False)
+        self.refresh()
+
+    def cancel_selected(self):
+        for index in self.table.selectionModel().selectedRows():
+            job = self._jobs.get(self.table.item(index.row(), 0).data(Qt.ItemDataRole.UserRole))
+            if job:
+                job.cancel()
+        self.refresh()
@@ -0,0 +1,79 @@
+import datetime
+import html
+import time
+
+from PySide6.QtGui import QTextDocumentFragment
+
+LEVELS = ["DEBUG", "INFO", "SUCCESS", "WARNING", "ERROR"]
+
+LEVEL_COLORS = {
+    "DEBUG": "gray",
+    "INFO": "black",
+    "SUCCESS": "green",
+    "WARNING": "orange",
+    "ERROR": "red",
+}
+
+
+class LogRecord:
+    __slots__ = ("seq", "timestamp", "level", "tag", "command", "text", "is_html", "_plain")
+
+    def __init__(
+            self,
+            level: str,
+            text: str,
+            tag: str = "[*]",
+            command: str | None = None,
+            is_html: bool = False,
+            timestamp: float | None = None
+    ):
+        self.seq = -1
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.level = level
+        self.tag = tag
+        self.command = command
+        self.text = text
+        self.is_html = is_html
+        self._plain = None
+
+    @property
+    def color(self) -> str:
+        return LEVEL_COLORS.get(self.level, "black")
+
+    @property
+    def plain_text(self) -> str:
+        if not self.is_html:
+            return self.text
+        if self._plain is None:
+            self._plain = QTextDocumentFragment.fromHtml(self.text).toPlainText()
+        return self._plain
+
+    @property
+    def time_str(self) -> str:
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.timestamp))
+
+    @property
+    def prefix(self) -> str:
+        return f"{self.time_str} {self.level:<9} {self.tag} "
+
+    @property
+    def line(self) -> str:
+        return self.prefix + self.plain_text
+
+    @property
+    def html(self) -> str:
+        text = self.text if self.is_html else html.escape(self.text)
+        return f'<span style="color:{self.color};">{html.escape(self.prefix)}{text}</span>'
+
+    def to_dict(self) -> dict:
+        record = {
+            "seq": self.seq,
+            "ts": datetime.datetime.fromtimestamp(self.timestamp).isoformat(timespec="milliseconds"),
+            "level": self.level,
+            "tag": self.tag,
+            "command": self.command,
+            "text": self.plain_text,
+        }
+        if self.is_html:
+            record["html"] = self.text
+        return record
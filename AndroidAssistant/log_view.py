@@ -0,0 +1,525 @@
+import bisect
+import json
+from collections import deque
+
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QUrl, Signal, QTimer
+from PySide6.QtGui import QColor, QTextDocument
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QStyle, QAbstractItemView, QWidget, QHBoxLayout, \
+    QComboBox, QLineEdit, QLabel, QPushButton, QFileDialog
+
+from log_record import LogRecord, LEVELS
+
+HTML_ROLE = Qt.ItemDataRole.UserRole + 1
+
+
+class RingBuffer:
+    def __init__(self, capacity: int):
+        self._capacity = max(1, capacity)
+        self._items: list = [None] * self._capacity
+        self._start = 0
+        self._size = 0
+        self.dropped = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: int):
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        return self._items[(self._start + index) % self._capacity]
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self[i]
+
+    def overflow(self, count: int) -> int:
+        return max(0, self._size + count - self._capacity)
+
+    def drop_front(self, count: int) -> None:
+        count = min(count, self._size)
+        for i in range(count):
+            self._items[(self._start + i) % self._capacity] = None
+        self._start = (self._start + count) % self._capacity
+        self._size -= count
+        self.dropped += count
+
+    def extend(self, items: list) -> None:
+        items = items[-self._capacity:]
+        self.drop_front(self.overflow(len(items)))
+        for item in items:
+            self._items[(self._start + self._size) % self._capacity] = item
+            self._size += 1
+
+    def set_capacity(self, capacity: int) -> None:
+        items = list(self)[-max(1, capacity):]
+        self.dropped += self._size - len(items)
+        self._capacity = max(1, capacity)
+        self._items = items + [None] * (self._capacity - len(items))
+        self._start = 0
+        self._size = len(items)
+
+    def clear(self) -> None:
+        self._items = [None] * self._capacity
+        self._start = 0
+        self._size = 0
+
+
+class _SearchChunk:
+    def __init__(self, first_seq: int, records: list[LogRecord]):
+        self.first_seq = first_seq
+        self.count = len(records)
+        self.offsets = []
+        parts = []
+        offset = 0
+        for record in records:
+            text = f"{record.tag} {record.command or ''} {record.plain_text}".replace("\0", " ")
+            self.offsets.append(offset)
+            parts.append(text)
+            offset += len(text) + 1
+        self.text = "\0".join(parts)
+        self._lower = None
+
+    @property
+    def size(self) -> int:
+        return len(self.text) + (len(self._lower) if self._lower is not None else 0)
+
+    @property
+    def lower(self) -> str:
+        if self._lower is None:
+            self._lower = self.text.lower()
+        return self._lower
+
+    def find(self, query: str, ignore_case: bool) -> list[int]:
+        text = self.lower if ignore_case else self.text
+        seqs = []
+        pos = text.find(query)
+        while pos != -1:
+            i = bisect.bisect_right(self.offsets, pos) - 1
+            seqs.append(self.first_seq + i)
+            if i + 1 >= self.count:
+                break
+            pos = text.find(query, self.offsets[i + 1])
+        return seqs
+
+
+class LogModel(QAbstractListModel):
+    SEARCH_CHUNK_SIZE = 8192
+
+    filterChanged = Signal()
+
+    def __init__(self, capacity: int = 100000, parent=None):
+        super().__init__(parent)
+        self._records = RingBuffer(capacity)
+        self._next_seq = 0
+        self._by_tag: dict[str, deque[int]] = {}
+        self._by_level: dict[str, deque[int]] = {}
+        self._colors: dict[str, QColor] = {}
+
+        self._level: str | None = None
+        self._tag: str | None = None
+        self._query = ""
+        self._rows: list[int] | None = None  # seqs shown while a filter is active
+        # chunk number -> concatenated text of whole chunks still fully inside the ring
+        self._search_chunks: dict[int, _SearchChunk] = {}
+
+    @property
+    def capacity(self) -> int:
+        return self._records.capacity
+
+    @property
+    def dropped(self) -> int:
+        return self._records.dropped
+
+    @property
+    def total(self) -> int:
+        return len(self._records)
+
+    @property
+    def search_cache_size(self) -> int:
+        return sum(chunk.size for chunk in self._search_chunks.values())
+
+    @property
+    def filtered(self) -> bool:
+        return self._rows is not None
+
+    @property
+    def _first_seq(self) -> int:
+        return self._next_seq - len(self._records)
+
+    def tags(self) -> list[str]:
+        return list(self._by_tag)
+
+    def record(self, row: int) -> LogRecord:
+        if self._rows is not None:
+            return self._records[self._rows[row] - self._first_seq]
+        return self._records[row]
+
+    def records(self):
+        for row in range(self.rowCount()):
+            yield self.record(row)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._rows) if self._rows is not None else len(self._records)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.record(index.row())
+        if role == Qt.ItemDataRole.DisplayRole:
+            return record.line.replace("\n", " ")
+        if role == Qt.ItemDataRole.ForegroundRole:
+            color = record.color
+            brush = self._colors.get(color)
+            if brush is None:
+                brush = self._colors[color] = QColor(color)
+            return brush
+        if role == Qt.ItemDataRole.ToolTipRole:
+            text = record.plain_text
+            tip = text[:4000] if "\n" in text or len(text) > 200 else ""
+            if record.command:
+                tip = f"{record.command}\n{tip}" if tip else record.command
+            return tip or None
+        if role == HTML_ROLE:
+            return record.html if record.is_html else None
+        return None
+
+    def text(self, row: int) -> str:
+        return self.record(row).line
+
+    def append_records(self, records: list[LogRecord]) -> None:
+        if not records:
+            return
+        records = records[-self.capacity:]
+        self._drop(self._records.overflow(len(records)))
+
+        matched = []
+        for record in records:
+            record.seq = self._next_seq
+            self._next_seq += 1
+            self._by_tag.setdefault(record.tag, deque()).append(record.seq)
+            self._by_level.setdefault(record.level, deque()).append(record.seq)
+            if self._rows is not None and self._match(record):
+                matched.append(record.seq)
+
+        if self._rows is None:
+            start = len(self._records)
+            self.beginInsertRows(QModelIndex(), start, start + len(records) - 1)
+            self._records.extend(records)
+            self.endInsertRows()
+            self._build_search_chunks()
+            return
+
+        self._records.extend(records)
+        self._build_search_chunks()
+        if matched:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(matched) - 1)
+            self._rows += matched
+            self.endInsertRows()
+
+    def _drop(self, count: int) -> None:
+        if not count:
+            return
+        first_seq = self._first_seq
+        for i in range(count):
+            record = self._records[i]
+            for index, key in ((self._by_tag, record.tag), (self._by_level, record.level)):
+                seqs = index[key]
+                seqs.popleft()
+                if not seqs:
+                    del index[key]
+
+        if self._rows is None:
+            self.beginRemoveRows(QModelIndex(), 0, count - 1)
+            self._records.drop_front(count)
+            self.endRemoveRows()
+            self._drop_search_chunks()
+            return
+
+        self._records.drop_front(count)
+        self._drop_search_chunks()
+        hidden = bisect.bisect_left(self._rows, first_seq + count)
+        if hidden:
+            self.beginRemoveRows(QModelIndex(), 0, hidden - 1)
+            del self._rows[:hidden]
+            self.endRemoveRows()
+
+    def _drop_search_chunks(self) -> None:
+        # a chunk that lost its head would keep the dropped text alive, _search rebuilds the partial one on demand
+        first_chunk = -(-self._first_seq // self.SEARCH_CHUNK_SIZE)
+        for number in [number for number in self._search_chunks if number < first_chunk]:
+            del self._search_chunks[number]
+
+    def _build_search_chunks(self) -> None:
+        size = self.SEARCH_CHUNK_SIZE
+        first_seq = self._first_seq
+        for number in range(first_seq // size, self._next_seq // size):
+            start = number * size
+            if number in self._search_chunks or start < first_seq:
+                continue
+            self._search_chunks[number] = _SearchChunk(start, [
+                self._records[seq - first_seq] for seq in range(start, start + size)
+            ])
+
+    def _search(self, query: str) -> list[int]:
+        ignore_case = query.islower()
+        size = self.SEARCH_CHUNK_SIZE
+        first_seq, next_seq = self._first_seq, self._next_seq
+        seqs = []
+        for number in range(first_seq // size, (next_seq - 1) // size + 1):
+            start = number * size
+            chunk = self._search_chunks.get(number)
+            if chunk is None:
+                chunk_first = max(start, first_seq)
+                chunk_last = min(start + size, next_seq)
+                chunk = _SearchChunk(chunk_first, [
+                    self._records[seq - first_seq] for seq in range(chunk_first, chunk_last)
+                ])
+                # the tail chunk is still filling up and the head one may lose records, cache whole chunks only
+                if chunk_first == start and chunk_last == start + size:
+                    self._search_chunks[number] = chunk
+            found = chunk.find(query, ignore_case)
+            if found and found[0] < first_seq:
+                found = found[bisect.bisect_left(found, first_seq):]
+            seqs += found
+        return seqs
+
+    def _match(self, record: LogRecord, level=None, tag=None, query=None) -> bool:
+        level = self._level if level is None else level
+        tag = self._tag if tag is None else tag
+        query = self._query if query is None else query
+        if level and record.level != level:
+            return False
+        if tag and record.tag != tag:
+            return False
+        if query:
+            haystack = f"{record.tag} {record.command or ''} {record.plain_text}"
+            # smart case: an all lower case query matches case-insensitively
+            if query.islower():
+                haystack = haystack.lower()
+            if query not in haystack:
+                return False
+        return True
+
+    def set_filter(self, level: str | None = None, tag: str | None = None, query: str = "") -> None:
+        level = level or None
+        tag = tag.strip() if tag else None
+        if tag and not tag.startswith("["):
+            tag = f"[{tag}]"
+        query = query or ""
+
+        if not level and not tag and not query:
+            candidates = None
+        elif self._rows is not None and level == self._level and tag == self._tag and self._query in query:
+            # typing more of the same query only ever narrows the current result
+            candidates = self._rows
+        else:
+            indexes = []
+            if level:
+                indexes.append(self._by_level.get(level, deque()))
+            if tag:
+                indexes.append(self._by_tag.get(tag, deque()))
+            candidates = min(indexes, key=len) if indexes else range(self._first_seq, self._next_seq)
+
+        searched = False
+        if candidates is not None and query and "\0" not in query and len(candidates) > self.SEARCH_CHUNK_SIZE:
+            candidates = self._search(query)
+            searched = True
+
+        self.beginResetModel()
+        self._level, self._tag, self._query = level, tag, query
+        first_seq = self._first_seq
+        records = self._records
+        if candidates is None:
+            self._rows = None
+        elif not query and not (level and tag):
+            self._rows = list(candidates)
+        elif searched:
+            self._rows = [
+                seq for seq in candidates
+                if (not level or records[seq - first_seq].level == level)
+                and (not tag or records[seq - first_seq].tag == tag)
+            ]
+        else:
+            self._rows = [
+                seq for seq in candidates
+                if self._match(records[seq - first_seq], level or "", tag or "", query)
+            ]
+        self.endResetModel()
+        self.filterChanged.emit()
+
+    def export_jsonl(self, path: str) -> int:
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for record in self.records():
+                f.write(json.dumps(record.to_dict(), ensure_ascii=False) + "\n")
+                count += 1
+        return count
+
+    def set_capacity(self, capacity: int) -> None:
+        self.beginResetModel()
+        drop = max(0, len(self._records) - capacity)
+        self._records.set_capacity(capacity)
+        if drop:
+            self._drop_search_chunks()
+            first_seq = self._first_seq
+            self._by_tag = {}
+            self._by_level = {}
+            for record in self._records:
+                self._by_tag.setdefault(record.tag, deque()).append(record.seq)
+                self._by_level.setdefault(record.level, deque()).append(record.seq)
+            if self._rows is not None:
+                self._rows = self._rows[bisect.bisect_left(self._rows, first_seq):]
+        self.endResetModel()
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self._records.clear()
+        self._search_chunks.clear()
+        self._by_tag.clear()
+        self._by_level.clear()
+        if self._rows is not None:
+            self._rows = []
+        self.endResetModel()
+
+
+class LogDelegate(QStyledItemDelegate):
+    @staticmethod
+    def make_document(html_text: str, font) -> QTextDocument:
+        document = QTextDocument()
+        document.setDefaultFont(font)
+        document.setDocumentMargin(0)
+        document.setHtml(html_text)
+        return document
+
+    def paint(self, painter, option, index):
+        html_text = index.data(HTML_ROLE)
+        if not html_text:
+            super().paint(painter, option, index)
+            return
+
+        self.initStyleOption(option, index)
+        option.text = ""
+        style = option.widget.style() if option.widget else None
+        if style:
+            style.drawControl(QStyle.ControlElement.CE_ItemViewItem, option, painter, option.widget)
+
+        document = self.make_document(html_text, option.font)
+        painter.save()
+        painter.translate(option.rect.topLeft())
+        painter.setClipRect(0, 0, option.rect.width(), option.rect.height())
+        document.drawContents(painter)
+        painter.restore()
+
+
+class LogView(QListView):
+    anchorClicked = Signal(QUrl)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setUniformItemSizes(True)
+        # with a python model every relayout calls back into python per row, batched layout keeps appends O(batch)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setBatchSize(2000)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        self.setItemDelegate(LogDelegate(self))
+        self.setMouseTracking(True)
+
+    def is_at_bottom(self) -> bool:
+        scroll_bar = self.verticalScrollBar()
+        return scroll_bar.value() >= scroll_bar.maximum() - 1
+
+    def anchor_at(self, pos) -> str | None:
+        index = self.indexAt(pos)
+        html_text = index.data(HTML_ROLE) if index.isValid() else None
+        if not html_text:
+            return None
+        rect = self.visualRect(index)
+        document = LogDelegate.make_document(html_text, self.font())
+        return document.documentLayout().anchorAt(pos - rect.topLeft()) or None
+
+    def mouseMoveEvent(self, event):
+        if self.anchor_at(event.position().toPoint()):
+            self.viewport().setCursor(Qt.CursorShape.PointingHandCursor)
+        else:
+            self.viewport().unsetCursor()
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        anchor = self.anchor_at(event.position().toPoint())
+        super().mouseReleaseEvent(event)
+        if anchor and event.button() == Qt.MouseButton.LeftButton:
+            self.anchorClicked.emit(QUrl(anchor))
+
+    def selected_text(self) -> str:
+        model = self.model()
+        rows = sorted(index.row() for index in self.selectionModel().selectedRows())
+        return "\n".join(model.text(row) for row in rows)
+
+
+class LogFilterBar(QWidget):
+    def __init__(self, model: LogModel, parent=None):
+        super().__init__(parent)
+        self._model = model
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.level_comboBox = QComboBox()
+        self.level_comboBox.addItem("全部级别", None)
+        for level in LEVELS:
+            self.level_comboBox.addItem(level, level)
+        self.tag_lineEdit = QLineEdit()
+        self.tag_lineEdit.setPlaceholderText("标签，如 137")
+        self.tag_lineEdit.setMaximumWidth(120)
+        self.query_lineEdit = QLineEdit()
+        self.query_lineEdit.setPlaceholderText("搜索（全小写时忽略大小写）")
+        self.query_lineEdit.setClearButtonEnabled(True)
+        self.count_label = QLabel()
+        self.export_btn = QPushButton("导出 JSONL")
+
+        layout.addWidget(self.level_comboBox)
+        layout.addWidget(self.tag_lineEdit)
+        layout.addWidget(self.query_lineEdit, stretch=1)
+        layout.addWidget(self.count_label)
+        layout.addWidget(self.export_btn)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(200)
+        self._timer.timeout.connect(self.apply)
+
+        self.level_comboBox.currentIndexChanged.connect(self.apply)
+        self.tag_lineEdit.textChanged.connect(self._timer.start)
+        self.query_lineEdit.textChanged.connect(self._timer.start)
+        self.export_btn.clicked.connect(self.export)
+        self._model.rowsInserted.connect(self.update_count)
+        self._model.rowsRemoved.connect(self.update_count)
+        self._model.modelReset.connect(self.update_count)
+
+        self.update_count()
+
+    def apply(self):
+        self._timer.stop()
+        self._model.set_filter(
+            self.level_comboBox.currentData(), self.tag_lineEdit.text(), self.query_lineEdit.text()
+        )
+
+    def update_count(self, *_):
+        if self._model.filtered:
+            self.count_label.setText(f"{self._model.rowCount()} / {self._model.total} 行")
+        else:
+            self.count_label.setText(f"{self._model.total} 行")
+
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出日志", "log.jsonl", "JSON Lines (*.jsonl)")
+        if path:
+            self._model.export_jsonl(path)
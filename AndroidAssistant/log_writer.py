@@ -0,0 +1,188 @@
+import gzip
+import os
+import queue
+import shutil
+import threading
+import time
+
+_STOP = object()
+
+
+class LogFileWriter:
+    def __init__(
+            self,
+            path: str,
+            max_bytes: int = 10 * 1024 * 1024,
+            max_age: float | None = None,
+            backup_count: int = 5,
+            compress: bool = False,
+            queue_size: int = 10000,
+            flush_interval: float = 1.0,
+            flush_bytes: int = 64 * 1024,
+            encoding: str = "utf-8",
+            on_error=None
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backup_count = backup_count
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.encoding = encoding
+        # called from the writer thread with the error text when writing starts failing
+        self.on_error = on_error
+
+        self.dropped = 0
+        self.written = 0
+        self.rotations = 0
+        self.failed = 0  # lines lost to write errors
+        self.last_error = ""
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._size = 0
+        self._started_at = 0.0
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="LogFileWriter", daemon=True)
+        self._thread.start()
+
+    def write(self, line: str) -> bool:
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(line)
+            return True
+        except queue.Full:
+            # never block the GUI thread on disk, count what we could not keep instead
+            self.dropped += 1
+            return False
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        buffer: list[str] = []
+        buffered = 0
+        last_flush = time.monotonic()
+        reported_dropped = 0
+        reported_failed = 0
+        stop = False
+
+        while not stop:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            while item is not None:
+                if item is _STOP:
+                    stop = True
+                    break
+                buffer.append(item)
+                buffered += len(item) + 1
+                if buffered >= self.flush_bytes:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+
+            if self.dropped != reported_dropped:
+                buffer.append(f"[log writer] {self.dropped - reported_dropped} lines dropped, queue was full")
+                reported_dropped = self.dropped
+
+            due = time.monotonic() - last_flush >= self.flush_interval
+            if buffer and (stop or buffered >= self.flush_bytes or due):
+                failing = self.failed != reported_failed
+                if failing:
+                    buffer.insert(0, f"[log writer] {self.failed - reported_failed} lines lost to write errors")
+                try:
+                    self._write_lines(buffer)
+                    reported_failed = self.failed
+                except OSError as e:
+                    self.last_error = str(e)
+                    if not failing and self.on_error:
+                        # once per run of failures, the report is logged and may well end up here too
+                        self.on_error(self.last_error)
+                    self.failed += len(buffer) - 1 if failing else len(buffer)
+                    self._close_file()
+                buffer = []
+                buffered = 0
+                last_flush = time.monotonic()
+            elif not buffer:
+                last_flush = time.monotonic()
+
+        self._close_file()
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _write_lines(self, lines: list[str]) -> None:
+        data = ("\n".join(lines) + "\n").encode(self.encoding, errors="replace")
+        if self._file is None:
+            self._open()
+        if self._should_rotate(len(data)):
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+        self.written += len(lines)
+
+    def _open(self) -> None:
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        # an existing file keeps its age across restarts
+        self._started_at = self._first_record_time() if self._size else time.time()
+
+    def _first_record_time(self) -> float:
+        try:
+            with open(self.path, "rb") as f:
+                head = f.read(19).decode("ascii")
+            return time.mktime(time.strptime(head, "%Y-%m-%d %H:%M:%S"))
+        except (OSError, ValueError):
+            pass
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return time.time()
+
+    def _should_rotate(self, incoming: int) -> bool:
+        if self.max_bytes and self._size and self._size + incoming > self.max_bytes:
+            return True
+        return bool(self.max_age and time.time() - self._started_at >= self.max_age)
+
+    def _backup_path(self, index: int) -> str:
+        return f"{self.path}.{index}" + (".gz" if self.compress else "")
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._file = None
+
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = self._backup_path(i)
+                if os.path.exists(src):
+                    os.replace(src, self._backup_path(i + 1))
+            if self.compress:
+                with open(self.path, "rb") as src, gzip.open(self._backup_path(1), "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self._backup_path(1))
+        else:
+            os.remove(self.path)
+
+        self.rotations += 1
+        self._open()
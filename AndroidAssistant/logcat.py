@@ -0,0 +1,529 @@
+import codecs
+import re
+import struct
+import time
+from array import array
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QTimer
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTableView, QComboBox, QLineEdit, QLabel, \
+    QPushButton, QAbstractItemView, QHeaderView
+
+from cmd import Cmd, CmdJob
+
+# android_LogPriority
+LEVEL_CHARS = "??VDIWEFS"
+LEVEL_COLORS = {2: "gray", 3: "gray", 4: "black", 5: "orange", 6: "red", 7: "red", 8: "red"}
+
+# struct logger_entry: len, hdr_size (0 in v1), pid, tid, sec, nsec, then lid/uid in newer versions
+_ENTRY_HEADER = struct.Struct("<HHiIII")
+_LONG_HEADER = re.compile(
+    r"^\[ (\d\d-\d\d \d\d:\d\d:\d\d)\.(\d+)\s+(?:\S+:\s+)?(\d+):\s*(\d+) ([VDIWEFS])/(.*?)\s*\]$"
+)
+
+
+class LogcatColumns:
+    def __init__(self):
+        self.times: list[float] = []
+        self.pids: list[int] = []
+        self.tids: list[int] = []
+        self.levels: list[int] = []
+        self.tags: list[str] = []
+        self.messages: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, timestamp: float, pid: int, tid: int, level: int, tag: str, message: str) -> None:
+        self.times.append(timestamp)
+        self.pids.append(pid)
+        self.tids.append(tid)
+        self.levels.append(level)
+        self.tags.append(tag)
+        self.messages.append(message)
+
+
+class LogcatBinaryParser:
+    ARGS = ["exec-out", "logcat", "-B"]
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._tags: dict[bytes, str] = {}
+        self.errors = 0
+
+    def feed(self, data: bytes, columns: LogcatColumns) -> None:
+        buf = self._buffer
+        buf += data
+        size = len(buf)
+        offset = 0
+        unpack = _ENTRY_HEADER.unpack_from
+        tags = self._tags
+        append = columns.append
+
+        while size - offset >= _ENTRY_HEADER.size:
+            length, hdr_size, pid, tid, sec, nsec = unpack(buf, offset)
+            if hdr_size == 0:
+                hdr_size = _ENTRY_HEADER.size
+            elif not _ENTRY_HEADER.size <= hdr_size <= 128:
+                # lost framing, nothing after this point can be trusted
+                self.errors += 1
+                offset = size
+                break
+            start = offset + hdr_size
+            end = start + length
+            if end > size:
+                break
+            offset = end
+            if length < 2:
+                continue
+
+            tag_end = buf.find(b"\0", start + 1, end)
+            if tag_end < 0:
+                tag_end = end
+            raw_tag = bytes(buf[start + 1:tag_end])
+            tag = tags.get(raw_tag)
+            if tag is None:
+                tag = tags[raw_tag] = raw_tag.decode("utf-8", "replace")
+            message_end = end
+            while message_end > tag_end + 1 and buf[message_end - 1] in (0, 10):
+                message_end -= 1
+            message = buf[tag_end + 1:message_end].decode("utf-8", "replace") if message_end > tag_end else ""
+            append(sec + nsec / 1e9, pid, tid, buf[start], tag, message)
+
+        del buf[:offset]
+
+
+class LogcatLongParser:
+    ARGS = ["logcat", "-v", "long"]
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        self._partial = ""
+        self._header: tuple | None = None
+        self._lines: list[str] = []
+        self._year = time.localtime().tm_year
+        self._second_key = ""
+        self._second = 0.0
+        self.errors = 0
+
+    def _timestamp(self, second: str, fraction: str) -> float:
+        if second != self._second_key:
+            try:
+                self._second = time.mktime(time.strptime(f"{self._year}-{second}", "%Y-%m-%d %H:%M:%S"))
+            except ValueError:
+                self.errors += 1
+                self._second = time.time()
+            self._second_key = second
+        return self._second + int(fraction) / 10 ** len(fraction)
+
+    def _emit(self, columns: LogcatColumns) -> None:
+        if self._header is not None and self._lines:
+            columns.append(*self._header, "\n".join(self._lines))
+        self._lines = []
+
+    def feed(self, data: bytes, columns: LogcatColumns) -> None:
+        text = self._partial + self._decoder.decode(data).replace("\r\n", "\n")
+        lines = text.split("\n")
+        self._partial = lines.pop()
+
+        for line in lines:
+            if not line:
+                self._emit(columns)
+                continue
+            if line.startswith("[ "):
+                match = _LONG_HEADER.match(line)
+                if match:
+                    self._emit(columns)
+                    second, fraction, pid, tid, level, tag = match.groups()
+                    self._header = (
+                        self._timestamp(second, fraction), int(pid), int(tid), LEVEL_CHARS.index(level), tag
+                    )
+                    continue
+            if line.startswith("--------- "):
+                continue
+            self._lines.append(line)
+
+
+PARSERS = {
+    "binary": LogcatBinaryParser,
+    "long": LogcatLongParser,
+}
+
+
+class LogcatBuffer:
+    def __init__(self, capacity: int):
+        self._capacity = max(1, capacity)
+        self.times = array("d", bytes(8 * self._capacity))
+        self.pids = array("i", bytes(4 * self._capacity))
+        self.tids = array("i", bytes(4 * self._capacity))
+        self.levels = bytearray(self._capacity)
+        self.tag_ids = array("i", bytes(4 * self._capacity))
+        self.messages: list[str | None] = [None] * self._capacity
+        self.tags: list[str] = []
+        self._tag_ids: dict[str, int] = {}
+        self._start = 0
+        self._size = 0
+        self.dropped = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def __len__(self) -> int:
+        return self._size
+
+    def index(self, row: int) -> int:
+        return (self._start + row) % self._capacity
+
+    def tag_id(self, tag: str) -> int:
+        tag_id = self._tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = self._tag_ids[tag] = len(self.tags)
+            self.tags.append(tag)
+        return tag_id
+
+    def find_tag(self, tag: str) -> int | None:
+        return self._tag_ids.get(tag)
+
+    def overflow(self, count: int) -> int:
+        return max(0, self._size + min(count, self._capacity) - self._capacity)
+
+    def drop_front(self, count: int) -> None:
+        count = min(count, self._size)
+        for start, end in self._segments(self._start, count):
+            self.messages[start:end] = [None] * (end - start)
+        self._start = (self._start + count) % self._capacity
+        self._size -= count
+        self.dropped += count
+
+    def _segments(self, start: int, count: int) -> list[tuple[int, int]]:
+        first = min(count, self._capacity - start)
+        segments = [(start, start + first)]
+        if count > first:
+            segments.append((0, count - first))
+        return segments
+
+    def extend(self, columns: LogcatColumns) -> None:
+        count = len(columns)
+        skip = max(0, count - self._capacity)
+        count -= skip
+        self.drop_front(self.overflow(count))
+
+        tag_id = self.tag_id
+        values = (
+            (self.times, array("d", columns.times[skip:])),
+            (self.pids, array("i", columns.pids[skip:])),
+            (self.tids, array("i", columns.tids[skip:])),
+            (self.levels, bytearray(columns.levels[skip:])),
+            (self.tag_ids, array("i", [tag_id(tag) for tag in columns.tags[skip:]])),
+            (self.messages, columns.messages[skip:]),
+        )
+        done = 0
+        for start, end in self._segments((self._start + self._size) % self._capacity, count):
+            for column, new in values:
+                column[start:end] = new[done:done + end - start]
+            done += end - start
+        self._size += count
+
+    def clear(self) -> None:
+        self.drop_front(self._size)
+        self._start = 0
+
+
+class LogcatModel(QAbstractTableModel):
+    COLUMNS = ["时间", "PID", "TID", "级别", "标签", "消息"]
+    TIME, PID, TID, LEVEL, TAG, MESSAGE = range(6)
+
+    def __init__(self, capacity: int = 200000, parent=None):
+        super().__init__(parent)
+        self.buffer = LogcatBuffer(capacity)
+        self._colors = {level: QColor(color) for level, color in LEVEL_COLORS.items()}
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.buffer)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        buffer = self.buffer
+        i = buffer.index(index.row())
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == self.TIME:
+                seconds, millis = divmod(round(buffer.times[i] * 1000), 1000)
+                return time.strftime("%m-%d %H:%M:%S", time.localtime(seconds)) + f".{millis:03d}"
+            if column == self.PID:
+                return buffer.pids[i]
+            if column == self.TID:
+                return buffer.tids[i]
+            if column == self.LEVEL:
+                level = buffer.levels[i]
+                return LEVEL_CHARS[level] if level < len(LEVEL_CHARS) else "?"
+            if column == self.TAG:
+                return buffer.tags[buffer.tag_ids[i]]
+            return buffer.messages[i].replace("\n", " ⏎ ")
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return self._colors.get(buffer.levels[i])
+        if role == Qt.ItemDataRole.ToolTipRole and column == self.MESSAGE:
+            message = buffer.messages[i]
+            return message[:4000] if "\n" in message or len(message) > 200 else None
+        return None
+
+    def line(self, row: int) -> str:
+        return "\t".join(str(self.data(self.index(row, column))) for column in range(len(self.COLUMNS)))
+
+    def append_columns(self, columns: LogcatColumns) -> None:
+        count = min(len(columns), self.buffer.capacity)
+        if not count:
+            return
+        overflow = self.buffer.overflow(count)
+        if overflow:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            self.buffer.drop_front(overflow)
+            self.endRemoveRows()
+        start = len(self.buffer)
+        self.beginInsertRows(QModelIndex(), start, start + count - 1)
+        self.buffer.extend(columns)
+        self.endInsertRows()
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self.buffer.clear()
+        self.endResetModel()
+
+
+class LogcatFilterProxy(QSortFilterProxyModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._min_level = 0
+        self._pids: set[int] | None = None
+        self._tags: set[str] | None = None
+        self._excluded_tags: set[str] = set()
+        self._tag_ids: set[int] | None = None
+        self._excluded_tag_ids: set[int] = set()
+        self._tag_count = -1
+        self._regex: re.Pattern | None = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self._min_level or self._pids is not None or self._tags is not None
+                    or self._excluded_tags or self._regex)
+
+    def set_filter(self, min_level: int = 0, pids: str = "", tags: str = "", regex: str = "") -> None:
+        # an invalid pattern raises re.error before anything changes
+        compiled = re.compile(regex, 0 if regex.lower() != regex else re.IGNORECASE) if regex else None
+        pid_set = {int(pid) for pid in re.split(r"[,\s]+", pids) if pid.isdigit()}
+        names = [name for name in re.split(r"[,\s]+", tags) if name]
+
+        self._min_level = min_level
+        self._pids = pid_set or None
+        self._tags = {name for name in names if not name.startswith("-")} or None
+        self._excluded_tags = {name[1:] for name in names if name.startswith("-") and len(name) > 1}
+        self._tag_count = -1
+        self._regex = compiled
+        self.invalidateFilter()
+
+    def _resolve_tags(self, buffer: LogcatBuffer) -> None:
+        # tags are interned as they arrive, resolve names to ids again whenever new ones show up
+        if self._tag_count == len(buffer.tags):
+            return
+        self._tag_count = len(buffer.tags)
+        if self._tags is not None:
+            self._tag_ids = {tag_id for tag_id in map(buffer.find_tag, self._tags) if tag_id is not None}
+        else:
+            self._tag_ids = None
+        self._excluded_tag_ids = {tag_id for tag_id in map(buffer.find_tag, self._excluded_tags) if tag_id is not None}
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        buffer = self.sourceModel().buffer
+        i = buffer.index(source_row)
+        if buffer.levels[i] < self._min_level:
+            return False
+        if self._pids is not None and buffer.pids[i] not in self._pids:
+            return False
+        if self._tags is not None or self._excluded_tags:
+            self._resolve_tags(buffer)
+            tag_id = buffer.tag_ids[i]
+            if self._tag_ids is not None and tag_id not in self._tag_ids:
+                return False
+            if tag_id in self._excluded_tag_ids:
+                return False
+        if self._regex is not None and not self._regex.search(buffer.messages[i]):
+            return False
+        return True
+
+
+class LogcatWidget(QWidget):
+    def __init__(self, cmd: Cmd, serial_provider=None, capacity: int = 200000, flush_msec: int = 50, parent=None):
+        super().__init__(parent)
+        self._cmd = cmd
+        self._serial_provider = serial_provider
+        self._job: CmdJob | None = None
+        self._parser = None
+        self._pending = LogcatColumns()
+
+        self.model = LogcatModel(capacity, self)
+        self.proxy = LogcatFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+
+        main_layout = QVBoxLayout(self)
+
+        top_layout = QHBoxLayout()
+        self.start_btn = QPushButton("开始")
+        self.format_comboBox = QComboBox()
+        self.format_comboBox.addItem("二进制", "binary")
+        self.format_comboBox.addItem("长格式", "long")
+        self.clear_btn = QPushButton("清空")
+        self.count_label = QLabel()
+        top_layout.addWidget(self.start_btn)
+        top_layout.addWidget(self.format_comboBox)
+        top_layout.addWidget(self.clear_btn)
+        top_layout.addStretch()
+        top_layout.addWidget(self.count_label)
+        main_layout.addLayout(top_layout)
+
+        filter_layout = QHBoxLayout()
+        self.level_comboBox = QComboBox()
+        for level in range(2, 8):
+            self.level_comboBox.addItem(LEVEL_CHARS[level], level if level > 2 else 0)
+        self.pid_lineEdit = QLineEdit()
+        self.pid_lineEdit.setPlaceholderText("PID")
+        self.pid_lineEdit.setMaximumWidth(120)
+        self.tag_lineEdit = QLineEdit()
+        self.tag_lineEdit.setPlaceholderText("标签，逗号分隔，-标签 排除")
+        self.regex_lineEdit = QLineEdit()
+        self.regex_lineEdit.setPlaceholderText("正则（全小写时忽略大小写）")
+        self.regex_lineEdit.setClearButtonEnabled(True)
+        filter_layout.addWidget(self.level_comboBox)
+        filter_layout.addWidget(self.pid_lineEdit)
+        filter_layout.addWidget(self.tag_lineEdit)
+        filter_layout.addWidget(self.regex_lineEdit, stretch=1)
+        main_layout.addLayout(filter_layout)
+
+        # QTreeView walks every row through python on each insert, a table with fixed rows does not
+        self.view = QTableView()
+        self.view.setModel(self.proxy)
+        self.view.setWordWrap(False)
+        self.view.setShowGrid(False)
+        self.view.verticalHeader().hide()
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(self.view.fontMetrics().height() + 4)
+        self.view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        header = self.view.horizontalHeader()
+        header.setStretchLastSection(True)
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        for column, width in enumerate((150, 60, 60, 40, 160)):
+            header.resizeSection(column, width)
+        main_layout.addWidget(self.view)
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(flush_msec)
+        self._flush_timer.timeout.connect(self.flush)
+
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(200)
+        self._filter_timer.timeout.connect(self.apply_filter)
+
+        self.start_btn.clicked.connect(self.toggle)
+        self.clear_btn.clicked.connect(self.clear)
+        self.level_comboBox.currentIndexChanged.connect(self.apply_filter)
+        self.pid_lineEdit.textChanged.connect(self._filter_timer.start)
+        self.tag_lineEdit.textChanged.connect(self._filter_timer.start)
+        self.regex_lineEdit.textChanged.connect(self._filter_timer.start)
+        self.proxy.rowsInserted.connect(self.update_count)
+        self.proxy.rowsRemoved.connect(self.update_count)
+        self.proxy.modelReset.connect(self.update_count)
+        self.proxy.layoutChanged.connect(self.update_count)
+
+        self.update_count()
+
+    @property
+    def running(self) -> bool:
+        return self._job is not None
+
+    def toggle(self) -> None:
+        if self.running:
+            self.stop()
+        else:
+            self.start(self._serial_provider() if self._serial_provider else None)
+
+    def start(self, serial: str | None = None) -> None:
+        self.stop()
+        parser_class = PARSERS[self.format_comboBox.currentData()]
+        parser = self._parser = parser_class()
+
+        def on_stdout(data: bytes):
+            if self._parser is not parser:
+                return
+            parser.feed(data, self._pending)
+            if len(self._pending) and not self._flush_timer.isActive():
+                self._flush_timer.start()
+
+        def on_finished(code, output):
+            if self._job is job:
+                self._job = None
+                self._update_state()
+
+        job = self._job = self._cmd.run(
+            "adb", (["-s", serial] if serial else []) + parser_class.ARGS, on_finished,
+            serial=serial, stdout_callback=on_stdout, stream=True
+        )
+        self._update_state()
+
+    def stop(self) -> None:
+        job, self._job = self._job, None
+        if job is not None:
+            job.cancel()
+        self.flush()
+        self._parser = None
+        self._update_state()
+
+    def flush(self) -> None:
+        if not len(self._pending):
+            return
+        pending, self._pending = self._pending, LogcatColumns()
+        scroll_bar = self.view.verticalScrollBar()
+        at_bottom = scroll_bar.value() >= scroll_bar.maximum() - 1
+        self.model.append_columns(pending)
+        if at_bottom:
+            self.view.scrollToBottom()
+
+    def clear(self) -> None:
+        self._pending = LogcatColumns()
+        self.model.clear()
+
+    def apply_filter(self) -> None:
+        self._filter_timer.stop()
+        try:
+            self.proxy.set_filter(
+                self.level_comboBox.currentData(),
+                self.pid_lineEdit.text(),
+                self.tag_lineEdit.text(),
+                self.regex_lineEdit.text()
+            )
+            self.regex_lineEdit.setStyleSheet("")
+        except re.error:
+            self.regex_lineEdit.setStyleSheet("color: red;")
+
+    def update_count(self, *_) -> None:
+        total = self.model.rowCount()
+        if self.proxy.active:
+            self.count_label.setText(f"{self.proxy.rowCount()} / {total} 行")
+        else:
+            self.count_label.setText(f"{total} 行")
+
+    def _update_state(self) -> None:
+        self.start_btn.setText("停止" if self.running else "开始")
+        self.format_comboBox.setEnabled(not self.running)
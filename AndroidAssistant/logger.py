@@ -1,21 +1,72 @@
-import datetime
-import html
 import os
 import subprocess
 import sys
+import time
+from collections import Counter, deque
 
-from PySide6.QtCore import QObject, Signal, QUrl
-from PySide6.QtGui import QTextCursor
-from PySide6.QtWidgets import QApplication, QTextBrowser
+from PySide6.QtCore import QObject, Signal, QUrl, QTimer
+from PySide6.QtWidgets import QApplication
+
+from log_record import LogRecord
+from log_view import LogModel, LogView
+from log_writer import LogFileWriter
 
 
 class Logger(QObject):
-    log_signal = Signal(str, str, bool)
+    log_signal = Signal(object)  # LogRecord
+
+    IDLE_TAG_SECONDS = 10.0
 
-    def __init__(self, text_browser: QTextBrowser, log_file_path: str | None = None):
+    def __init__(
+            self,
+            view: LogView,
+            log_file_path: str | None = None,
+            log_file_options: dict | None = None,
+            flush_msec: int = 50,
+            max_lines_per_flush: int = 10000,
+            capacity: int = 100000,
+            rate_limit: float | None = 200.0,
+            rate_burst: int = 1000,
+            rate_limited_levels: tuple = ("DEBUG", "INFO"),
+            collapse_repeats: bool = True,
+            summary_msec: int = 1000
+    ):
         super().__init__()
-        self.text_browser = text_browser
+        self.view = view
         self.log_file_path = log_file_path
+        self.max_lines_per_flush = max_lines_per_flush
+
+        self.model = LogModel(capacity, self)
+        self.view.setModel(self.model)
+
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self.rate_limited_levels = set(rate_limited_levels)
+        self.collapse_repeats = collapse_repeats
+
+        self.suppressed = Counter()  # tag -> lines dropped by the rate limit
+        self.collapsed = Counter()  # tag -> identical lines folded into a repeat summary
+
+        # tag -> [tokens, last refill]
+        self._buckets: dict[str, list] = {}
+        # tag -> [last record, repeats not yet reported]
+        self._last: dict[str, list] = {}
+        # tag -> lines dropped since the last summary
+        self._unreported: Counter = Counter()
+
+        self._summary_timer = QTimer(self)
+        self._summary_timer.setInterval(summary_msec)
+        self._summary_timer.timeout.connect(self.flush_summaries)
+
+        # records older than the view's capacity would be pushed out of the ring on arrival anyway,
+        # so the backlog behind the flush timer never needs to hold more than that
+        self._pending: deque[LogRecord] = deque(maxlen=capacity)
+        self.pending_dropped = 0
+        self._unreported_pending_drops = 0
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(flush_msec)
+        self._flush_timer.timeout.connect(self.flush)
 
         app = QApplication.instance()
         if app:
@@ -23,24 +74,136 @@ class Logger(QObject):
 
         self.log_signal.connect(self._handle_log_signal)
 
-        self.text_browser.setOpenExternalLinks(False)
-        self.text_browser.setOpenLinks(False)
-        self.text_browser.anchorClicked.connect(self._handle_anchorClicked)
+        self.view.anchorClicked.connect(self._handle_anchorClicked)
 
         if self.log_file_path:
-            self._file = open(self.log_file_path, "a", encoding="utf-8")
+            self._writer = LogFileWriter(
+                self.log_file_path, on_error=self._on_writer_error, **(log_file_options or {})
+            )
         else:
-            self._file = None
+            self._writer = None
+
+    def _handle_log_signal(self, record: LogRecord) -> None:
+        if self._accept(record):
+            self._emit(record)
+
+    def _on_writer_error(self, error: str) -> None:
+        # runs on the writer thread, log_signal queues it over to the GUI thread
+        self.warning(f"writing {self.log_file_path} failed: {error}", tag="[log]")
+
+    def _emit(self, record: LogRecord) -> None:
+        if len(self._pending) == self._pending.maxlen:
+            self.pending_dropped += 1
+            self._unreported_pending_drops += 1
+        self._pending.append(record)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+        if self._writer:
+            self._writer.write(record.line)
+
+    def _accept(self, record: LogRecord) -> bool:
+        tag = record.tag
+
+        if self.collapse_repeats:
+            last = self._last.get(tag)
+            if last and last[0].level == record.level and last[0].text == record.text:
+                last[1] += 1
+                self.collapsed[tag] += 1
+                return False
+            self._report_repeats(tag)
+            self._last[tag] = [record, 0]
+        self._start_summary_timer()
 
-    def _handle_log_signal(self, text: str, color: str, is_html: bool) -> None:
-        if not is_html:
-            safe_text = html.escape(text)
+        if not self.rate_limit or record.level not in self.rate_limited_levels:
+            # a warning or result line closes a burst, say what was held back before it
+            self._report_suppressed(tag)
+            return True
+
+        now = time.monotonic()
+        bucket = self._buckets.get(tag)
+        if bucket is None:
+            bucket = self._buckets[tag] = [float(self.rate_burst), now]
         else:
-            safe_text = text
-        html_text = f'<span style="color:{color};">{safe_text}</span>'
+            bucket[0] = min(float(self.rate_burst), bucket[0] + (now - bucket[1]) * self.rate_limit)
+            bucket[1] = now
+
+        if bucket[0] < 1.0:
+            self.suppressed[tag] += 1
+            self._unreported[tag] += 1
+            return False
+        bucket[0] -= 1.0
+        return True
+
+    def _start_summary_timer(self) -> None:
+        if not self._summary_timer.isActive():
+            self._summary_timer.start()
+
+    def _report_repeats(self, tag: str) -> None:
+        last = self._last.get(tag)
+        if last and last[1]:
+            record = last[0]
+            self._emit(LogRecord(record.level, f"last message repeated {last[1]} times", tag, record.command))
+            last[1] = 0
+
+    def _report_suppressed(self, tag: str) -> None:
+        dropped = self._unreported.pop(tag, 0)
+        if dropped:
+            self._emit(LogRecord("WARNING", f"{dropped} lines suppressed by rate limit", tag))
+
+    def flush_summaries(self) -> None:
+        for tag in [tag for tag, last in self._last.items() if last[1]]:
+            self._report_repeats(tag)
+        for tag in list(self._unreported):
+            self._report_suppressed(tag)
+
+        # forget idle tags so one-off job tags do not pile up
+        now, wall = time.monotonic(), time.time()
+        idle = self.IDLE_TAG_SECONDS
+        for tag in [tag for tag, bucket in self._buckets.items() if now - bucket[1] > idle]:
+            del self._buckets[tag]
+        for tag in [tag for tag, last in self._last.items() if wall - last[0].timestamp > idle]:
+            del self._last[tag]
 
-        self.text_browser.append(html_text)
-        self.text_browser.moveCursor(QTextCursor.End)  # noqa
+        if not self._last and not self._buckets:
+            self._summary_timer.stop()
+
+    def stats(self) -> dict:
+        return {
+            "suppressed": sum(self.suppressed.values()),
+            "collapsed": sum(self.collapsed.values()),
+            "suppressed_by_tag": dict(self.suppressed),
+            "collapsed_by_tag": dict(self.collapsed),
+            "writer_dropped": self._writer.dropped if self._writer else 0,
+            "writer_failed": self._writer.failed if self._writer else 0,
+            "pending_dropped": self.pending_dropped,
+            "search_cache_chars": self.model.search_cache_size,
+        }
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        records = [self._pending.popleft() for _ in range(min(self.max_lines_per_flush, len(self._pending)))]
+        if self._unreported_pending_drops:
+            records.append(LogRecord(
+                "WARNING", f"{self._unreported_pending_drops} lines dropped from the view while it fell behind"
+            ))
+            self._unreported_pending_drops = 0
+
+        at_bottom = self.view.is_at_bottom()
+        self.model.append_records(records)
+        if at_bottom:
+            self.view.scrollToBottom()
+        if self._pending:
+            self._flush_timer.start()
+
+    def set_capacity(self, capacity: int) -> None:
+        self.model.set_capacity(capacity)
+        self._pending = deque(self._pending, maxlen=capacity)
+
+    def clear(self) -> None:
+        self._pending.clear()
+        self.model.clear()
 
     @staticmethod
     def _handle_anchorClicked(url: QUrl) -> None:  # noqa
@@ -81,32 +244,30 @@ class Logger(QObject):
             else:
                 subprocess.Popen(["xdg-open", path])
 
-    def _log(self, level: str, msg: str, color: str, is_html: bool = False, tag: str = "[*]") -> None:
-        datetime_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        full_msg = f"{datetime_str} {level} {tag} {msg}"
-
-        self.log_signal.emit(full_msg, color, is_html)
+    def _log(self, level: str, msg: str, is_html: bool = False, tag: str = "[*]", command: str | None = None) -> None:
+        record = LogRecord(level, msg, tag, command, is_html)
 
-        if self._file:
-            self._file.write(full_msg + "\n")
-            self._file.flush()
+        self.log_signal.emit(record)
 
-    def debug(self, msg: str, is_html: bool = False, tag: str = "[*]") -> None:
-        self._log("DEBUG    ", msg, "gray", is_html, tag)
+    def debug(self, msg: str, is_html: bool = False, tag: str = "[*]", command: str | None = None) -> None:
+        self._log("DEBUG", msg, is_html, tag, command)
 
-    def info(self, msg: str, is_html: bool = False, tag: str = "[*]") -> None:
-        self._log("INFO     ", msg, "black", is_html, tag)
+    def info(self, msg: str, is_html: bool = False, tag: str = "[*]", command: str | None = None) -> None:
+        self._log("INFO", msg, is_html, tag, command)
 
-    def success(self, msg: str, is_html: bool = False, tag: str = "[*]") -> None:
-        self._log("SUCCESS  ", msg, "green", is_html, tag)
+    def success(self, msg: str, is_html: bool = False, tag: str = "[*]", command: str | None = None) -> None:
+        self._log("SUCCESS", msg, is_html, tag, command)
 
-    def warning(self, msg: str, is_html: bool = False, tag: str = "[*]") -> None:
-        self._log("WARNING  ", msg, "orange", is_html, tag)
+    def warning(self, msg: str, is_html: bool = False, tag: str = "[*]", command: str | None = None) -> None:
+        self._log("WARNING", msg, is_html, tag, command)
 
-    def error(self, msg: str, is_html: bool = False, tag: str = "[*]") -> None:
-        self._log("ERROR    ", msg, "red", is_html, tag)
+    def error(self, msg: str, is_html: bool = False, tag: str = "[*]", command: str | None = None) -> None:
+        self._log("ERROR", msg, is_html, tag, command)
 
     def close(self) -> None:
-        if self._file and not self._file.closed:
-            self._file.flush()
-            self._file.close()
+        self._summary_timer.stop()
+        self.flush_summaries()
+        self._flush_timer.stop()
+        self._pending.clear()
+        if self._writer:
+            self._writer.close()
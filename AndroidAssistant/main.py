@@ -6,28 +6,37 @@ import pandas as pd
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import QApplication, QMainWindow, QFileDialog, QMessageBox, QMenu, QTableWidgetItem, \
-    QAbstractItemView, QDialog, QVBoxLayout, QLabel, QHBoxLayout, QLineEdit, QPushButton, QTextBrowser
-from androguard.core import apk as androguard_core_apk
-
-from cmd import Cmd
+    QAbstractItemView, QDialog, QVBoxLayout, QLabel, QHBoxLayout, QLineEdit, QPushButton, QTextBrowser, QDockWidget, \
+    QCheckBox, QInputDialog, QSpinBox, QProgressBar, QTableWidget, QComboBox
+
+import operations
+from adb_client import AdbBackend
+from cmd import Cmd, JOB_PENDING
+from device_snapshot import DeviceSnapshot
+from file_model import FileEntry, FileListModel, DirScanner, format_size
+from jobs_widget import JobsWidget
+from log_view import LogView, LogFilterBar
+from logcat import LogcatWidget
 from logger import Logger
 from signals import Signals
+from transfer import TransferQueue, PUSH, PULL, ITEM_PENDING, ITEM_RUNNING, ITEM_DONE, ITEM_FAILED, \
+    ITEM_CANCELLED, ITEM_UNCHANGED, NOTE_NEW, NOTE_CHANGED, BULK_AUTO, BULK_NEVER, BULK_ALWAYS, format_duration
 from ui_mainwindow import Ui_MainWindow
 import sys
 import os
-import subprocess
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout,
     QPushButton, QLineEdit, QDialog,
-    QTreeWidget, QTreeWidgetItem,
+    QTableView, QHeaderView,
     QHBoxLayout, QLabel, QFrame
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QIcon
-from PySide6.QtWidgets import QStyle
 
 
 class BaseFileDialog(QDialog):
+    CACHE_LISTINGS = True
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
@@ -38,6 +47,8 @@ class BaseFileDialog(QDialog):
         self.history = []
         self.future = []
         self.only_dir_mode = False
+        self._listings = {}  # path -> entries last seen, shown right away while a fresh listing loads
+        self._load_id = 0
 
         main_layout = QVBoxLayout(self)
         main_layout.setSpacing(8)
@@ -46,9 +57,11 @@ class BaseFileDialog(QDialog):
         self.title_label.setStyleSheet("font-size:16px;font-weight:bold;")
         main_layout.addWidget(self.title_label)
 
-        nav_layout = QHBoxLayout()
+        nav_layout = self.nav_layout = QHBoxLayout()
         self.back_btn = QPushButton("←")
         self.forward_btn = QPushButton("→")
+        self.refresh_btn = QPushButton("刷新")
+        self.refresh_btn.setShortcut("F5")
 
         self.path_edit = QLineEdit()
         self.path_edit.returnPressed.connect(self.jump_to_path)
@@ -56,6 +69,7 @@ class BaseFileDialog(QDialog):
         nav_layout.addWidget(self.back_btn)
         nav_layout.addWidget(self.forward_btn)
         nav_layout.addWidget(self.path_edit)
+        nav_layout.addWidget(self.refresh_btn)
         main_layout.addLayout(nav_layout)
 
         line = QFrame()
@@ -63,12 +77,22 @@ class BaseFileDialog(QDialog):
         line.setFrameShadow(QFrame.Sunken)
         main_layout.addWidget(line)
 
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabels(["名称"])
-        self.tree.setColumnWidth(0, 600)
-        self.tree.setSelectionMode(QTreeWidget.ExtendedSelection)
-        self.tree.setAlternatingRowColors(True)
-        main_layout.addWidget(self.tree, stretch=1)
+        self.model = FileListModel(self)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setSortingEnabled(True)
+        self.view.sortByColumn(FileListModel.NAME, Qt.SortOrder.AscendingOrder)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.view.setAlternatingRowColors(True)
+        self.view.setShowGrid(False)
+        self.view.setWordWrap(False)
+        self.view.verticalHeader().hide()
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(self.view.fontMetrics().height() + 6)
+        self.view.horizontalHeader().setSectionResizeMode(FileListModel.NAME, QHeaderView.ResizeMode.Stretch)
+        main_layout.addWidget(self.view, stretch=1)
 
         self.selected_label = QLineEdit()
         self.selected_label.setReadOnly(True)
@@ -85,26 +109,17 @@ class BaseFileDialog(QDialog):
         bottom_layout.addWidget(self.cancel_btn)
         main_layout.addLayout(bottom_layout)
 
-        self.tree.itemDoubleClicked.connect(self.enter_directory)
-        self.tree.itemSelectionChanged.connect(self.update_selected_label)
+        self.view.doubleClicked.connect(self.enter_directory)
+        self.view.selectionModel().selectionChanged.connect(self.update_selected_label)
+        self.model.modelReset.connect(self.update_selected_label)
         self.back_btn.clicked.connect(self.go_back)
         self.forward_btn.clicked.connect(self.go_forward)
+        self.refresh_btn.clicked.connect(self.refresh)
         self.ok_btn.clicked.connect(self.accept)
         self.cancel_btn.clicked.connect(self.reject)
 
         self.load_files()
 
-    def add_item(self, name, is_dir):
-        icon = self.style().standardIcon(
-            QStyle.SP_DirIcon if is_dir else QStyle.SP_FileIcon
-        )
-        display_name = name + "/" if is_dir else name
-
-        item = QTreeWidgetItem([display_name])
-        item.setIcon(0, icon)
-        item.setData(0, Qt.UserRole, is_dir)
-        self.tree.addTopLevelItem(item)
-
     def jump_to_path(self):
         new_path = self.path_edit.text().strip()
         if not new_path:
@@ -113,66 +128,78 @@ class BaseFileDialog(QDialog):
         self.current_path = new_path
         self.load_files()
 
-    def load_files(self):
-        self.tree.clear()
-        self.path_edit.setText(self.current_path)
-        self.title_label.setText(f"选择的目录或文件: {self.current_path}")
-
+    def parent_entry(self):
         parent = self.parent_path(self.current_path)
         if parent and parent != self.current_path:
-            parent_item = QTreeWidgetItem([".."])
-            parent_item.setIcon(0, self.style().standardIcon(QStyle.SP_ArrowUp))
-            parent_item.setData(0, Qt.UserRole, "parent")
-            self.tree.addTopLevelItem(parent_item)
-
-        dirs, files = self.list_dir(self.current_path)
-        dirs.sort()
-        files.sort()
-
-        for d in dirs:
-            self.add_item(d, True)
+            return FileEntry("..", True, path=parent, is_parent=True)
+        return None
 
-        if not self.only_dir_mode:
-            for f in files:
-                self.add_item(f, False)
+    def load_files(self):
+        path = self.current_path
+        self._load_id += 1
+        load_id = self._load_id
 
-        self.update_selected_label()
+        self.path_edit.setText(path)
         self.update_nav_buttons()
 
-    def enter_directory(self, item):
-        data = item.data(0, Qt.UserRole)
+        listing = self._listings.get(path) if self.CACHE_LISTINGS else None
+        self.show_listing(listing or [])
+        if listing is None:
+            self.title_label.setText(f"正在加载: {path}")
+
+        fresh = []
+
+        def on_listed(entries, done=True, error=""):
+            fresh.extend(entries)
+            if done and not error and self.CACHE_LISTINGS:
+                self._listings[path] = fresh
+            if load_id != self._load_id:
+                return
+            if listing is None:
+                # nothing was shown yet, fill in chunk by chunk
+                self.model.add_entries(entries)
+            elif done and fresh != listing:
+                self.show_listing(fresh)
+            if error:
+                self.title_label.setText(f"无法读取: {path}")
+                if self.isVisible():
+                    QMessageBox.warning(self, "错误", f"无法读取目录 {path}\n{error}")
+            elif done:
+                self.title_label.setText(f"选择的目录或文件: {path}")
+            else:
+                self.title_label.setText(f"正在加载: {path}（已读取 {len(fresh)} 项）")
 
-        if data == "parent":
-            self.future.clear()
-            self.history.append(self.current_path)
-            self.current_path = self.parent_path(self.current_path)
+        self.list_dir_async(path, on_listed)
 
-        elif data:
-            self.history.append(self.current_path)
-            self.future.clear()
-            name = item.text(0).rstrip("/")
-            self.current_path = self.join_path(self.current_path, name)
+    def show_listing(self, entries):
+        self.model.set_entries(entries, self.parent_entry(), self.only_dir_mode)
 
+    def refresh(self):
+        self._listings.pop(self.current_path, None)
+        self.invalidate(self.current_path)
         self.load_files()
 
-    def update_selected_label(self):
-        items = self.tree.selectedItems()
-        paths = []
+    def enter_directory(self, index):
+        entry = self.model.entry(index.row())
+        if not entry.is_dir:
+            return
 
-        for item in items:
-            data = item.data(0, Qt.UserRole)
-            if data == "parent":
-                continue
+        self.history.append(self.current_path)
+        self.future.clear()
+        self.current_path = entry.path or self.join_path(self.current_path, entry.name)
+        self.load_files()
 
-            name = item.text(0).rstrip("/")
-            full = self.join_path(self.current_path, name)
+    def update_selected_label(self, *_):
+        self.selected_label.setText(";".join(entry.path for entry in self.selected_entries()))
 
-            if self.only_dir_mode and not data:
+    def selected_entries(self):
+        entries = []
+        for index in self.view.selectionModel().selectedRows():
+            entry = self.model.entry(index.row())
+            if entry.is_parent or (self.only_dir_mode and not entry.is_dir):
                 continue
-
-            paths.append(full)
-
-        self.selected_label.setText(";".join(paths))
+            entries.append(entry.at(entry.path or self.join_path(self.current_path, entry.name)))
+        return entries
 
     def selected_files(self):
         return self.selected_label.text().split(";") if self.selected_label.text() else []
@@ -198,9 +225,12 @@ class BaseFileDialog(QDialog):
     def get_root_path(self):
         raise NotImplementedError
 
-    def list_dir(self, path):
+    def list_dir_async(self, path, callback):
         raise NotImplementedError
 
+    def invalidate(self, path):
+        pass
+
     def join_path(self, base, name):
         raise NotImplementedError
 
@@ -208,22 +238,28 @@ class BaseFileDialog(QDialog):
         raise NotImplementedError
 
     @classmethod
-    def getOpenFileNames(cls, parent=None):
-        dialog = cls(parent)
+    def getOpenEntries(cls, parent=None, **kwargs) -> list[FileEntry]:
+        dialog = cls(parent, **kwargs)
         dialog.only_dir_mode = False
-        dialog.tree.setSelectionMode(QTreeWidget.ExtendedSelection)
+        dialog.view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         dialog.setWindowTitle("选择文件或目录")
 
         if dialog.exec():
-            return dialog.selected_files()
+            return dialog.selected_entries()
         return []
 
     @classmethod
-    def getExistingDirectory(cls, parent=None):
-        dialog = cls(parent)
+    def getOpenFileNames(cls, parent=None, **kwargs):
+        return [entry.path for entry in cls.getOpenEntries(parent, **kwargs)]
+
+    @classmethod
+    def getExistingDirectory(cls, parent=None, **kwargs):
+        dialog = cls(parent, **kwargs)
         dialog.only_dir_mode = True
-        dialog.tree.setSelectionMode(QTreeWidget.SingleSelection)
+        dialog.view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
         dialog.setWindowTitle("选择目录")
+        # the first listing was requested before the mode was known
+        dialog.load_files()
 
         if dialog.exec():
             return dialog.selected_files()[0]
@@ -231,24 +267,33 @@ class BaseFileDialog(QDialog):
 
 
 class PcFileDialog(BaseFileDialog):
+    # the local file system is cheap to read again, only device listings are worth keeping
+    CACHE_LISTINGS = False
+
+    def __init__(self, parent=None):
+        self._scanner = DirScanner()
+        self._scan_id = 0
+        self._scan_callback = None
+        self._scanner.chunkReady.connect(self._on_chunk)
+        self._scanner.detailsReady.connect(self._on_details)
+        super().__init__(parent)
+        self.finished.connect(lambda _: self._scanner.cancel())
 
     def get_root_path(self):
         return os.path.abspath(os.sep)
 
-    def list_dir(self, path):
-        try:
-            entries = os.listdir(path)
-        except:  # noqa
-            return [], []
-
-        dirs, files = [], []
-        for name in entries:
-            full = os.path.join(path, name)
-            if os.path.isdir(full):
-                dirs.append(name)
-            else:
-                files.append(name)
-        return dirs, files
+    def list_dir_async(self, path, callback):
+        self._scan_id = self._scanner.scan(path)
+        self._scan_callback = callback
+
+    def _on_chunk(self, scan_id, entries, done, error):
+        if scan_id != self._scan_id:
+            return
+        self._scan_callback(entries, done, error)
+
+    def _on_details(self, scan_id, entries):
+        if scan_id == self._scan_id:
+            self.model.update_entries(entries)
 
     def join_path(self, base, name):
         return os.path.join(base, name)
@@ -258,25 +303,135 @@ class PcFileDialog(BaseFileDialog):
 
 
 class MobileFileDialog(BaseFileDialog):
+    PREFETCH_LIMIT = 16
+
+    def __init__(self, parent=None, serial=None, cmd: Cmd | None = None):
+        self.serial = serial
+        self._cmd = cmd if cmd is not None else Cmd()
+        self._prefetch_jobs = []
+        self._snapshot: DeviceSnapshot | None = None
+        self.search_edit = QLineEdit()
+        super().__init__(parent)
+        self.finished.connect(self.cancel_prefetch)
+
+        self.snapshot_btn = QPushButton("快照")
+        self.snapshot_btn.setToolTip("一次读取当前目录下的整棵子树，之后在其中浏览和搜索不再访问设备")
+        self.search_edit.setPlaceholderText("在快照中搜索文件名")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setMaximumWidth(220)
+        self.search_edit.setEnabled(False)
+        self.nav_layout.addWidget(self.snapshot_btn)
+        self.nav_layout.addWidget(self.search_edit)
+
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(200)
+        self._search_timer.timeout.connect(self.show_search)
+        self.search_edit.textChanged.connect(self._search_timer.start)
+        self.snapshot_btn.clicked.connect(self.take_snapshot)
+
+    def load_files(self):
+        if self.search_edit.text():
+            self.search_edit.blockSignals(True)
+            self.search_edit.clear()
+            self.search_edit.blockSignals(False)
+        super().load_files()
 
     def get_root_path(self):
         return "/"
 
-    def list_dir(self, path):
-        cmd = ["adb", "shell", "su", "-c", "ls", "-l", path]
-        result = subprocess.run(cmd, capture_output=True, text=True)
+    def list_dir_async(self, path, callback):
+        self.cancel_prefetch()
+        if self._snapshot is not None and self._snapshot.covers(path):
+            callback(self._snapshot.listing(path))
+            return
+
+        def on_listed(code, entries, output):
+            callback(entries, error="" if code == 0 else output.stderr.strip() or f"退出码 {code}")
+            if code == 0 and path == self.current_path and self.isVisible():
+                self.prefetch(path, sorted(entry.name for entry in entries if entry.is_dir))
 
-        dirs, files = [], []
-        for line in result.stdout.splitlines():
-            parts = line.split()
-            if len(parts) < 6:
+        operations.list_dir(self._cmd, self.serial, path, on_listed)
+
+    def prefetch(self, path, dirs):
+        parent = self.parent_path(path)
+        targets = [parent] if parent and parent != path else []
+        targets += [self.join_path(path, name) for name in dirs[:self.PREFETCH_LIMIT]]
+
+        for target in targets:
+            if target in self._listings:
                 continue
-            name = parts[-1]
-            if line.startswith("d"):
-                dirs.append(name)
-            else:
-                files.append(name)
-        return dirs, files
+
+            def on_listed(code, entries, output, target=target):
+                if code == 0:
+                    self._listings[target] = entries
+
+            job = operations.list_dir(self._cmd, self.serial, target, on_listed, prefetch=True)
+            if not job.done:
+                self._prefetch_jobs.append(job)
+
+    def cancel_prefetch(self, *_):
+        jobs, self._prefetch_jobs = self._prefetch_jobs, []
+        for job in jobs:
+            # a navigation may have joined a queued prefetch, that one has to run
+            if job.state == JOB_PENDING and not job.followers:
+                job.cancel()
+
+    def invalidate(self, path):
+        operations.invalidate_dir(self._cmd, self.serial, path)
+
+    def refresh(self):
+        if self._snapshot is None or not self._snapshot.covers(self.current_path):
+            super().refresh()
+            return
+
+        snapshot = self._snapshot
+        self.refresh_btn.setEnabled(False)
+        self.title_label.setText(f"正在刷新快照: {snapshot.root}")
+
+        def on_refreshed(code, changed):
+            self.refresh_btn.setEnabled(True)
+            if snapshot is not self._snapshot:
+                return
+            if code != 0:
+                self._snapshot = None
+                self.search_edit.setEnabled(False)
+            self._listings.clear()
+            self.load_files()
+            if code == 0:
+                self.title_label.setText(f"快照 {snapshot.root}：{len(snapshot)} 项，{changed} 个目录有变化")
+
+        operations.refresh_snapshot(self._cmd, self.serial, snapshot, on_refreshed)
+
+    def take_snapshot(self):
+        root = self.current_path
+        self.snapshot_btn.setEnabled(False)
+        self.title_label.setText(f"正在生成快照: {root}")
+
+        def on_snapshot(code, snapshot):
+            self.snapshot_btn.setEnabled(True)
+            if code != 0:
+                self.title_label.setText(f"生成快照失败: {root}")
+                return
+            self._snapshot = snapshot
+            self._listings.clear()
+            self.search_edit.setEnabled(True)
+            self.load_files()
+            self.title_label.setText(f"快照 {snapshot.root}：{len(snapshot)} 项")
+
+        operations.snapshot_dir(self._cmd, self.serial, root, on_snapshot)
+
+    def show_search(self):
+        query = self.search_edit.text()
+        if not query or self._snapshot is None:
+            self.load_files()
+            return
+
+        snapshot = self._snapshot
+        found = snapshot.search(query)
+        entries = [snapshot.entry(entry_id, full_path=True) for entry_id in found]
+        self.model.set_entries(entries, None, self.only_dir_mode)
+        self.title_label.setText(f"快照 {snapshot.root} 中匹配 “{query}” 的 {len(found)} 项")
 
     def join_path(self, base, name):
         return base.rstrip("/") + "/" + name
@@ -286,11 +441,30 @@ class MobileFileDialog(BaseFileDialog):
 
 
 class ADBPushPullDialog(QDialog):
-    def __init__(self, title, parent=None):
+    ITEM_STATE_TEXTS = {
+        ITEM_PENDING: "排队中",
+        ITEM_RUNNING: "传输中",
+        ITEM_DONE: "完成",
+        ITEM_FAILED: "失败",
+        ITEM_CANCELLED: "已取消",
+        ITEM_UNCHANGED: "未变化",
+    }
+
+    ITEM_NOTE_TEXTS = {
+        NOTE_NEW: "新增",
+        NOTE_CHANGED: "变化",
+    }
+
+    def __init__(self, title, cmd: Cmd, serials: list, parent=None):
         super().__init__(parent)
         self.title = title
+        self._cmd = cmd
+        self.serials = serials
+        self._source_entries: dict[str, FileEntry] = {}  # what the browse dialog already knows about each source
+        self._transfer: TransferQueue | None = None
+        self._item_rows: dict[int, int] = {}  # id(TransferItem) -> table row
         self.setWindowTitle(self.title)
-        self.resize(450, 200)
+        self.resize(760, 520)
 
         main_layout = QVBoxLayout(self)
 
@@ -322,32 +496,81 @@ class ADBPushPullDialog(QDialog):
         row2.addWidget(self.btn2)
         main_layout.addLayout(row2)
 
+        row3 = QHBoxLayout()
+        self.parallel_spin_box = QSpinBox()
+        self.parallel_spin_box.setRange(1, 16)
+        self.parallel_spin_box.setValue(4)
+        self.retries_spin_box = QSpinBox()
+        self.retries_spin_box.setRange(0, 10)
+        self.retries_spin_box.setValue(2)
+        row3.addWidget(QLabel("并行数："))
+        row3.addWidget(self.parallel_spin_box)
+        row3.addWidget(QLabel("失败重试："))
+        row3.addWidget(self.retries_spin_box)
+        self.sync_check_box = QCheckBox("增量同步")
+        self.sync_check_box.setToolTip("先比较两端文件的 MD5，只传输新增和有变化的文件")
+        row3.addWidget(self.sync_check_box)
+        self.bulk_combo_box = QComboBox()
+        for text, mode in (("自动", BULK_AUTO), ("逐个文件", BULK_NEVER), ("tar 打包", BULK_ALWAYS)):
+            self.bulk_combo_box.addItem(text, mode)
+        self.bulk_combo_box.setToolTip("目录里小文件很多时，自动改用 tar 流整体传输以省去逐个文件的开销")
+        self.compress_check_box = QCheckBox("压缩")
+        self.compress_check_box.setToolTip("tar 流用 gzip 压缩，适合可压缩的数据和较慢的连接")
+        row3.addWidget(QLabel("传输方式："))
+        row3.addWidget(self.bulk_combo_box)
+        row3.addWidget(self.compress_check_box)
+        row3.addStretch()
+        main_layout.addLayout(row3)
+
         self.text_browser = QTextBrowser()
-        main_layout.addWidget(self.text_browser)
+        main_layout.addWidget(self.text_browser, stretch=1)
+
+        self.item_table = QTableWidget(0, 5)
+        self.item_table.setHorizontalHeaderLabels(["设备", "源", "大小", "进度", "状态"])
+        self.item_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.item_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.item_table.verticalHeader().setVisible(False)
+        self.item_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.item_table.setColumnHidden(0, len(self.serials) <= 1)
+        self.item_table.hide()
+        main_layout.addWidget(self.item_table, stretch=2)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setTextVisible(False)
+        self.progress_label = QLabel()
+        self.progress_bar.hide()
+        main_layout.addWidget(self.progress_bar)
+        main_layout.addWidget(self.progress_label)
 
         bottom_layout = QHBoxLayout()
         bottom_layout.addStretch()
+        self.dry_run_btn = QPushButton("预演")
+        self.dry_run_btn.setToolTip("只比较校验和并列出需要传输的文件，不实际传输")
         self.ok_btn = QPushButton("确定")
         self.cancel_btn = QPushButton("取消")
+        bottom_layout.addWidget(self.dry_run_btn)
         bottom_layout.addWidget(self.ok_btn)
         bottom_layout.addWidget(self.cancel_btn)
         main_layout.addLayout(bottom_layout)
 
-        self.ok_btn.clicked.connect(self.on_ok)
-        self.cancel_btn.clicked.connect(self.close)
+        self.dry_run_btn.clicked.connect(lambda: self.on_ok(dry_run=True))
+        self.ok_btn.clicked.connect(lambda: self.on_ok())
+        self.cancel_btn.clicked.connect(self.on_cancel)
 
         def on_btn1_clicked():
             if title == "adb push":
-                value = ";".join(PcFileDialog.getOpenFileNames(self))
+                entries = PcFileDialog.getOpenEntries(self)
 
             else:
                 assert title == "adb pull"
-                value = ";".join(MobileFileDialog.getOpenFileNames(self))
-            self.update_line(self.line_edit1, value)
+                entries = MobileFileDialog.getOpenEntries(self, serial=self.serials[0], cmd=self._cmd)
+            self._source_entries = {entry.path: entry for entry in entries}
+            self.update_line(self.line_edit1, ";".join(self._source_entries))
 
         def on_btn2_clicked():
             if title == "adb push":
-                value = MobileFileDialog.getExistingDirectory(self)
+                value = MobileFileDialog.getExistingDirectory(self, serial=self.serials[0], cmd=self._cmd)
             else:
                 assert title == "adb pull"
                 value = PcFileDialog.getExistingDirectory(self)
@@ -369,11 +592,165 @@ class ADBPushPullDialog(QDialog):
         self.text_browser.clear()
 
         for i in text1.split(";"):
-            self.text_browser.append(f"{self.title} {i} {text2}")
+            self.text_browser.append(f"{self.title} {i} {text2}{self._describe_source(i)}")
+
+        sizes = self.known_sizes(text1.split(";"))
+        if sizes:
+            self.text_browser.append(f"\n已知大小的文件 {len(sizes)} 个，合计 {format_size(sum(sizes.values()))}")
+
+    def _describe_source(self, source):
+        entry = self._source_entries.get(source)
+        if entry is None:
+            return ""
+        details = ["目录" if entry.is_dir else format_size(entry.size)]
+        if entry.link:
+            details.append(f"链接到 {entry.link}")
+        return f"（{'，'.join(detail for detail in details if detail)}）"
+
+    def known_sizes(self, sources) -> dict[str, int]:
+        # sizes come from the listing the source was picked in, no extra round trip to the device
+        sizes = {}
+        for source in sources:
+            entry = self._source_entries.get(source)
+            if entry is not None and not entry.is_dir and entry.size is not None:
+                sizes[source] = entry.size
+        return sizes
+
+    def on_ok(self, dry_run=False):
+        sources = [i for i in self.line_edit1.text().split(";") if i]
+        target = self.line_edit2.text()
+        if not sources or not target or (self._transfer is not None and self._transfer.active):
+            return
+
+        transfer = self._transfer = TransferQueue(
+            self._cmd, PUSH if self.title == "adb push" else PULL, self.serials,
+            self.parallel_spin_box.value(), self.retries_spin_box.value(),
+            sync=self.sync_check_box.isChecked(), dry_run=dry_run,
+            bulk=self.bulk_combo_box.currentData(), compress=self.compress_check_box.isChecked(), parent=self
+        )
+        transfer.itemsPlanned.connect(self.on_items_planned)
+        transfer.itemChanged.connect(self.on_item_changed)
+        transfer.progressChanged.connect(self.on_progress_changed)
+        transfer.message.connect(self.text_browser.append)
+        transfer.finished.connect(self.on_transfer_finished)
+
+        self.ok_btn.setEnabled(False)
+        self.dry_run_btn.setEnabled(False)
+        self.btn1.setEnabled(False)
+        self.btn2.setEnabled(False)
+        self.cancel_btn.setText("停止")
+        self.text_browser.clear()
+        self.text_browser.append("正在规划传输…")
+        self.item_table.setRowCount(0)
+        self._item_rows.clear()
+        self.item_table.show()
+        self.progress_bar.show()
+        self.progress_bar.setValue(0)
+        transfer.start(sources, target, self._source_entries)
+
+    def on_cancel(self):
+        if self._transfer is not None and self._transfer.active:
+            self._transfer.cancel()
+        else:
+            self.close()
+
+    def closeEvent(self, event):
+        if self._transfer is not None:
+            self._transfer.cancel()
+        super().closeEvent(event)
+
+    def on_items_planned(self, items):
+        table = self.item_table
+        table.setUpdatesEnabled(False)
+        row = table.rowCount()
+        table.setRowCount(row + len(items))
+        for item in items:
+            self._item_rows[id(item)] = row
+            table.setItem(row, 0, QTableWidgetItem(item.serial or ""))
+            source_item = QTableWidgetItem(item.source)
+            source_item.setToolTip(f"{item.source} -> {item.target}")
+            table.setItem(row, 1, source_item)
+            table.setItem(row, 2, QTableWidgetItem(format_size(item.size)))
+            table.setItem(row, 3, QTableWidgetItem(""))
+            table.setItem(row, 4, QTableWidgetItem(self.ITEM_STATE_TEXTS[item.state]))
+            row += 1
+        table.setUpdatesEnabled(True)
+
+    def _update_item_row(self, item):
+        row = self._item_rows.get(id(item))
+        if row is None:
+            return
+        progress = item.progress
+        rate = f"  {format_size(int(item.rate))}/s" if item.state == ITEM_RUNNING and item.transferred else ""
+        self.item_table.item(row, 2).setText(format_size(item.size))
+        self.item_table.item(row, 3).setText(("" if progress is None else f"{progress:.0%}") + rate)
+        state = self.ITEM_STATE_TEXTS[item.state]
+        if item.state == ITEM_RUNNING and item.bulk is not None:
+            state += "（tar）"
+        if item.state == ITEM_PENDING and item.note:
+            state += f"（{self.ITEM_NOTE_TEXTS[item.note]}）"
+        if item.attempts > 1:
+            state += f"（第 {item.attempts} 次）"
+        self.item_table.item(row, 4).setText(state)
+        self.item_table.item(row, 4).setToolTip(item.error)
+
+    def on_item_changed(self, item):
+        self._update_item_row(item)
+        if item.bulk is not None:
+            # the tar item reports for all of its files at once
+            return
+        if item.state == ITEM_FAILED:
+            label = f"[{item.serial}] {item.source}" if len(self.serials) > 1 else item.source
+            self.text_browser.append(f"失败：{label}\n{item.error}")
+        elif item.state == ITEM_PENDING and item.error:
+            self.text_browser.append(f"重试：{item.source}（{item.error}）")
+
+    def on_progress_changed(self):
+        transfer = self._transfer
+        for item in transfer.items:
+            if item.state == ITEM_RUNNING:
+                self._update_item_row(item)
+
+        total, transferred = transfer.total_size, transfer.transferred
+        counts = transfer.counts()
+        finished = counts[ITEM_DONE] + counts[ITEM_FAILED] + counts[ITEM_CANCELLED] + counts[ITEM_UNCHANGED]
+        if total:
+            self.progress_bar.setValue(int(min(transferred / total, 1.0) * 1000))
+        elif transfer.items:
+            self.progress_bar.setValue(int(finished / len(transfer.items) * 1000))
+        self.progress_label.setText(
+            f"{finished}/{len(transfer.items)} 个文件，{format_size(transferred)} / {format_size(total)}，"
+            f"{transfer.rate / 1024 / 1024:.1f} MB/s，剩余 {format_duration(transfer.eta)}"
+        )
 
-    def on_ok(self):
-        print(self.line_edit.text())
-        self.close()
+    def on_transfer_finished(self, summary):
+        self.ok_btn.setEnabled(True)
+        self.dry_run_btn.setEnabled(True)
+        self.btn1.setEnabled(True)
+        self.btn2.setEnabled(True)
+        self.cancel_btn.setText("取消")
+        if summary["dry_run"]:
+            self.progress_bar.hide()
+            self.progress_label.setText("预演完成，未传输任何文件")
+            return
+        if summary["total"] and not summary["failed"] and not summary["cancelled"]:
+            self.progress_bar.setValue(1000)
+
+        lines = [
+            f"\n共 {summary['total']} 个文件，成功 {summary['done']} 个，失败 {summary['failed']} 个"
+            + (f"，未变化 {summary['unchanged']} 个" if summary["unchanged"] else "")
+            + (f"，取消 {summary['cancelled']} 个" if summary["cancelled"] else "")
+            + (f"，跳过 {summary['skipped']} 个非普通文件" if summary["skipped"] else ""),
+            f"传输 {format_size(summary['bytes'])}，用时 {format_duration(summary['elapsed'])}，"
+            f"平均 {summary['rate'] / 1024 / 1024:.1f} MB/s"
+            + (f"，重试 {summary['retried']} 次" if summary["retried"] else ""),
+        ]
+        self.text_browser.append("\n".join(lines))
+        if self._cmd.logger:
+            self._cmd.logger.info(
+                f"adb {self._transfer.direction}: {summary['done']}/{summary['total']} files, "
+                f"{summary['bytes']} bytes in {summary['elapsed']:.1f}s, {summary['failed']} failed"
+            )
 
 
 class AndroidAssistant(QMainWindow):
@@ -410,13 +787,13 @@ class AndroidAssistant(QMainWindow):
         )
 
         self._ui.adb_reboot_pushButton.clicked.connect(
-            lambda: self._cmd.run("adb", ["reboot"])
+            lambda: self._adb_fan_out(["reboot"])
         )
         self._ui.adb_reboot_recovery_pushButton.clicked.connect(
-            lambda: self._cmd.run("adb", ["reboot", "recovery"])
+            lambda: self._adb_fan_out(["reboot", "recovery"])
         )
         self._ui.adb_reboot_bootloader_pushButton.clicked.connect(
-            lambda: self._cmd.run("adb", ["reboot", "bootloader"])
+            lambda: self._adb_fan_out(["reboot", "bootloader"])
         )
 
         self._ui.process_search_pushButton.clicked.connect(self.on_process_search_pushButton_clicked)
@@ -428,39 +805,24 @@ class AndroidAssistant(QMainWindow):
         self._ui.adb_shell_pm_list_packages_pushButton.clicked.connect(
             self.on_adb_shell_pm_list_packages_pushButton_clicked
         )
-        self._ui.adb_reboot_bootloader_pushButton.clicked.connect(
-            lambda: self._cmd.run("adb", ["reboot", "bootloader"])
-        )
         self._ui.fastboot_reboot_pushButton.clicked.connect(
             lambda: self._cmd.run("fastboot", ["reboot"])
         )
         self._ui.fastboot_devices_pushButton.clicked.connect(self.on_fastboot_devices_pushButton_clicked)
 
-        # def on_adb_push_pc_mobile_pushButton_clicked():
-        #     pc_file_path = self._ui.pc_lineEdit.text()
-        #     mobile_file_path = self._ui.mobile_lineEdit.text()
-        #     if not pc_file_path or not mobile_file_path:
-        #         return
-        #     program_args = ["push", pc_file_path, mobile_file_path]
-        #     self._cmd.run("adb", program_args)
-
         def on_adb_push_pc_mobile_pushButton_clicked():
-            dialog = ADBPushPullDialog("adb push", self)
-            dialog.show()
+            serials = self._target_serials()
+            if serials:
+                dialog = ADBPushPullDialog("adb push", self._cmd, serials, self)
+                dialog.show()
 
         self._ui.adb_push_pc_mobile_pushButton.clicked.connect(on_adb_push_pc_mobile_pushButton_clicked)
 
-        # def on_adb_pull_mobile_pc_pushButton_clicked():
-        #     mobile_file_path = self._ui.mobile_lineEdit.text()
-        #     pc_file_path = self._ui.pc_lineEdit.text()
-        #     if not mobile_file_path or not pc_file_path:
-        #         return
-        #     program_args = ["pull", mobile_file_path, pc_file_path]
-        #     self._cmd.run("adb", program_args)
-
         def on_adb_pull_mobile_pc_pushButton_clicked():
-            dialog = ADBPushPullDialog("adb pull", self)
-            dialog.show()
+            serials = self._target_serials()
+            if serials:
+                dialog = ADBPushPullDialog("adb pull", self._cmd, serials, self)
+                dialog.show()
 
         self._ui.adb_pull_mobile_pc_pushButton.clicked.connect(on_adb_pull_mobile_pc_pushButton_clicked)
 
@@ -481,7 +843,7 @@ class AndroidAssistant(QMainWindow):
             def callback(code, output):
                 self._ui.fastboot_devices_listWidget.clear()
                 if code == 0:
-                    data = output.replace("\r\n", "\n")
+                    data = output.text.replace("\r\n", "\n")
                     items = re.findall(r"\(bootloader\) (.*?)\n", data, re.DOTALL)
                     self._ui.fastboot_devices_listWidget.addItems(items)
 
@@ -495,27 +857,153 @@ class AndroidAssistant(QMainWindow):
             self.on_adb_shell_am_force__stop_package_pushButton_clicked
         )
 
-        self._ui.log_textBrowser.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self._ui.log_textBrowser.customContextMenuRequested.connect(self.context_menu)
+        self._log_view = LogView()
+        self._ui.verticalLayout_3.replaceWidget(self._ui.log_textBrowser, self._log_view)
+        self._ui.log_textBrowser.hide()
+        self._log_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self._log_view.customContextMenuRequested.connect(self.context_menu)
 
         # log_file_path = "app.log"
         log_file_path = None
-        self._logger = Logger(self._ui.log_textBrowser, log_file_path)
+        self._logger = Logger(self._log_view, log_file_path)
+        self._log_filter_bar = LogFilterBar(self._logger.model)
+        self._ui.verticalLayout_3.insertWidget(0, self._log_filter_bar)
 
         self._cmd = Cmd(self._logger)
 
+        self._ui.adb_devices_listWidget.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self._adb_devices_all_checkBox = QCheckBox("所有设备")
+        self._ui.horizontalLayout.insertWidget(1, self._adb_devices_all_checkBox)
+        self._cmd.queueChanged.connect(self.on_cmd_queueChanged)
+        self._adb_backend: AdbBackend | None = None
+
+        self._jobs_widget = JobsWidget(self._cmd)
+        self._jobs_dockWidget = QDockWidget("任务", self)
+        self._jobs_dockWidget.setObjectName("jobs_dockWidget")
+        self._jobs_dockWidget.setWidget(self._jobs_widget)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self._jobs_dockWidget)
+        self.tabifyDockWidget(self._ui.dockWidget, self._jobs_dockWidget)
+        self._ui.dockWidget.raise_()
+
+        self._logcat_widget = LogcatWidget(self._cmd, self._current_serial)
+        self._ui.tabWidget.addTab(self._logcat_widget, "logcat")
+
+        settings_menu = self._ui.menubar.addMenu("设置")
+        native_adb_action = settings_menu.addAction("使用原生 adb 协议")
+        native_adb_action.setCheckable(True)
+        native_adb_action.toggled.connect(self.on_native_adb_action_toggled)
+        clear_cache_action = settings_menu.addAction("清空命令结果缓存")
+        clear_cache_action.triggered.connect(self.on_clear_cache_action_triggered)
+        log_capacity_action = settings_menu.addAction("日志容量")
+        log_capacity_action.triggered.connect(self.on_log_capacity_action_triggered)
+
     def _init_signal(self):
         self._signals = Signals()
         self._signals.adb_shell_pm_list_packages.connect(
             self.on_adb_shell_pm_list_packages_pushButton_clicked
         )
 
+    def closeEvent(self, event):
+        self._cmd.cancel_all()
+        super().closeEvent(event)
+
     def context_menu(self, point):
         menu = QMenu()
+        copy_action = menu.addAction("复制")
+        copy_action.setEnabled(self._log_view.selectionModel().hasSelection())
         clear_action = menu.addAction("清空")
-        action = menu.exec(self._ui.log_textBrowser.mapToGlobal(point))
-        if action == clear_action:
-            self._ui.log_textBrowser.clear()
+        action = menu.exec(self._log_view.viewport().mapToGlobal(point))
+        if action == copy_action:
+            QApplication.clipboard().setText(self._log_view.selected_text())
+        elif action == clear_action:
+            self._logger.clear()
+
+    def on_native_adb_action_toggled(self, checked):
+        if checked:
+            if self._adb_backend is None:
+                self._adb_backend = AdbBackend()
+                QApplication.instance().aboutToQuit.connect(self._adb_backend.shutdown)
+            self._cmd.set_backend(self._adb_backend)
+            self._logger.info("adb commands now go through the adb server socket directly")
+        else:
+            self._cmd.set_backend(None)
+            self._logger.info("adb commands now spawn the adb executable")
+
+    def on_clear_cache_action_triggered(self):
+        stats = self._cmd.cache.stats()
+        self._cmd.cache.clear()
+        self._logger.info(
+            f"result cache cleared: {stats['entries']} entries, "
+            f"{stats['hits']} hits / {stats['misses']} misses"
+        )
+
+    def on_log_capacity_action_triggered(self):
+        capacity, ok = QInputDialog.getInt(
+            self, "日志容量", "最多保留的日志行数：", self._logger.model.capacity, 1000, 10000000, 10000
+        )
+        if ok:
+            self._logger.set_capacity(capacity)
+
+    def on_cmd_queueChanged(self, running, pending):
+        if not running and not pending:
+            self._ui.statusbar.clearMessage()
+            return
+        stats = self._cmd.stats()
+        self._ui.statusbar.showMessage(
+            f"运行中 {running} 个，排队 {pending} 个，"
+            f"平均等待 {stats['avg_wait']:.1f}s，最长等待 {stats['max_wait']:.1f}s"
+        )
+
+    def _listed_serials(self) -> list[tuple[str, bool]]:
+        serials = []
+        for i in range(self._ui.adb_devices_listWidget.count()):
+            item = self._ui.adb_devices_listWidget.item(i)
+            fields = item.text().split("\t")
+            if len(fields) >= 2 and fields[1] == "device":
+                serials.append((fields[0], item.isSelected()))
+        return serials
+
+    def _target_serials(self) -> list[str | None]:
+        listed = self._listed_serials()
+        if self._adb_devices_all_checkBox.isChecked():
+            serials = [serial for serial, _ in listed]
+        else:
+            serials = [serial for serial, selected in listed if selected]
+        if serials:
+            return serials
+        if len(listed) <= 1:
+            # nothing to choose from, let adb pick the only attached device
+            return [serial for serial, _ in listed] or [None]
+        QMessageBox.warning(self, "提示", "已连接多台设备，请先在设备列表中选择设备，或勾选所有设备")
+        return []
+
+    def _current_serial(self) -> str | None:
+        listed = self._listed_serials()
+        selected = [serial for serial, selected in listed if selected]
+        if selected:
+            return selected[0]
+        return listed[0][0] if listed else None
+
+    @staticmethod
+    def _device_label(serial, name, multi):
+        return f"[{serial}] {name}" if multi else name
+
+    def _adb_fan_out(self, program_args):
+        serials = self._target_serials()
+        if not serials:
+            return
+
+        def callback(results):
+            if len(results) == 1:
+                return
+            fail_serials = [serial for serial, (code, _) in results.items() if code != 0]
+            msg = f"adb {' '.join(program_args)}: {len(results) - len(fail_serials)}/{len(results)} devices succeeded"
+            if fail_serials:
+                self._logger.error(f"{msg}, failed on {', '.join(fail_serials)}")
+            else:
+                self._logger.success(msg)
+
+        self._cmd.fan_out(serials, "adb", program_args, callback)
 
     @property
     def ui(self):
@@ -526,18 +1014,16 @@ class AndroidAssistant(QMainWindow):
         return self._logger
 
     def on_adb_shell_pm_list_packages_pushButton_clicked(self):
-        def callback(code, output):
+        def callback(code, package_names, output):
             self._ui.adb_shell_pm_list_packages_listWidget.clear()
             if code == 0:
-                items = [line.replace("package:", "").strip() for line in output.strip().split("\n") if line.strip()]
-                self._ui.adb_shell_pm_list_packages_listWidget.addItems(items)
+                self._ui.adb_shell_pm_list_packages_listWidget.addItems(package_names)
 
-        program_args = ["shell", "pm", "list", "packages"]
-        if self._ui.adb_shell_pm_list_packages_s_checkBox.isChecked():
-            program_args.append("-s")
-        if self._ui.adb_shell_pm_list_packages_3_checkBox.isChecked():
-            program_args.append("-3")
-        self._cmd.run("adb", program_args, callback)
+        operations.list_packages(
+            self._cmd, self._current_serial(), callback,
+            system=self._ui.adb_shell_pm_list_packages_s_checkBox.isChecked(),
+            third_party=self._ui.adb_shell_pm_list_packages_3_checkBox.isChecked()
+        )
 
     def on_process_search_pushButton_clicked(self):
         def callback(code, output, process_keyword):
@@ -548,7 +1034,7 @@ class AndroidAssistant(QMainWindow):
                 self._ui.process_tableWidget.verticalHeader().setVisible(True)
 
                 if code == 0:
-                    data = [line.split() for line in output.replace("\r\n", "\n").strip().split("\n")]
+                    data = [line.split() for line in output.stdout.replace("\r\n", "\n").strip().split("\n")]
                     columns = data.pop(0)
                     df = pd.DataFrame(data, columns=columns)
 
@@ -575,16 +1061,18 @@ class AndroidAssistant(QMainWindow):
                 QMessageBox.warning(self, "错误", "进程搜索失败")
 
         def main():
-            program_args = ["shell", "sh", "-c", "ps | grep -v grep"]
+            serial = self._current_serial()
+            program_args = (["-s", serial] if serial else []) + ["shell", "sh", "-c", "ps | grep -v grep"]
             text = self._ui.process_keyword_lineEdit.text()
             process_keyword = text.strip()
-            self._cmd.run("adb", program_args, callback, callback_kwargs=dict(process_keyword=process_keyword))
+            self._cmd.run(
+                "adb", program_args,
+                callback, callback_kwargs=dict(process_keyword=process_keyword), serial=serial, use_session=True
+            )
 
         main()
 
     def on_rename_apk_pushButton_clicked(self):
-        androguard_core_apk.logger.remove(handler_id=None)
-
         apk_file_paths, _ = QFileDialog.getOpenFileNames(
             self,
             "可多选要重命名的 apk 文件路径",
@@ -596,37 +1084,28 @@ class AndroidAssistant(QMainWindow):
             for apk_file_path in apk_file_paths:
                 self._logger.debug(f"{apk_file_path}")
                 apk_file_path = os.path.abspath(apk_file_path)
-                dir_path = os.path.dirname(apk_file_path)
-                apk = androguard_core_apk.APK(apk_file_path)
-                new_apk_file_name = apk.get_app_name() + "_" + apk.get_androidversion_name() + ".apk"
-                new_apk_file_path = os.path.abspath(os.path.join(dir_path, new_apk_file_name))
+                new_apk_file_path = operations.rename_apk(apk_file_path)
                 if apk_file_path != new_apk_file_path:
-                    if os.path.exists(new_apk_file_path):
-                        os.remove(new_apk_file_path)
-                    os.rename(apk_file_path, new_apk_file_path)
                     self._logger.success(f"{apk_file_path} -> {new_apk_file_path}")
 
     def on_adb_devices_pushButton_clicked(self):
-        def callback(code, output):
+        def callback(code, devices, output):
+            selected_serials = {serial for serial, selected in self._listed_serials() if selected}
             self._ui.adb_devices_listWidget.clear()
             if code == 0:
-                data = re.findall(r"List of devices attached(.*)", output, re.DOTALL)[0].strip()
-                data = data.replace("\r\n", "").split("\n")
-                items = ["\t".join(i.split()) for i in data]
+                self._ui.adb_devices_listWidget.addItems(["\t".join(fields) for fields in devices])
+                for i in range(self._ui.adb_devices_listWidget.count()):
+                    item = self._ui.adb_devices_listWidget.item(i)
+                    item.setSelected(item.text().split("\t")[0] in selected_serials)
 
-                self._ui.adb_devices_listWidget.addItems(items)
-
-        program_args = ["devices"]
-        if self._ui.adb_devices_l_checkBox.isChecked():
-            program_args.append("-l")
-        self._cmd.run("adb", program_args, callback)
+        operations.list_devices(self._cmd, callback, long=self._ui.adb_devices_l_checkBox.isChecked())
 
     def on_fastboot_devices_pushButton_clicked(self):
         def callback(code, output):
             self._ui.fastboot_devices_listWidget.clear()
             if code == 0:
                 if output:
-                    data = output.strip()
+                    data = output.text.strip()
                     items = data.split("\r\n")
                     if len(items) == 1:
                         items = items[0].split("\n")
@@ -643,28 +1122,31 @@ class AndroidAssistant(QMainWindow):
             "apk 文件路径 (*.apk)"
         )
 
-        if apk_file_paths:
-            total = len(apk_file_paths)
+        serials = self._target_serials() if apk_file_paths else []
+        if serials:
+            multi = len(serials) > 1
+            total = len(apk_file_paths) * len(serials)
             finished_count = 0
             success_dict = {}
             fail_dict = {}
 
-            def callback(code, output, apk_file_path):
+            def callback(serial, apk_file_path, code, output):
                 nonlocal finished_count
 
                 finished_count += 1
 
+                key = self._device_label(serial, apk_file_path, multi)
                 if code == 0:
-                    success_dict[apk_file_path] = output
+                    success_dict[key] = output
                 else:
-                    fail_dict[apk_file_path] = output
+                    fail_dict[key] = output
 
                 if finished_count == total:
                     success_count = len(success_dict)
                     fail_count = len(fail_dict)
 
                     result_msg = (
-                        f"共安装 {total} 个应用\n"
+                        f"共安装 {total} 个应用{f'（{len(serials)} 台设备）' if multi else ''}\n"
                         f"成功 {success_count} 个\n"
                         f"失败 {fail_count} 个\n\n"
                     )
@@ -681,14 +1163,10 @@ class AndroidAssistant(QMainWindow):
 
                     QMessageBox.information(self, "安装结果", result_msg)
 
-                self._signals.adb_shell_pm_list_packages.emit()
+                self._signals.debounce("adb_shell_pm_list_packages")
 
             def main():
-                for apk_file_path in apk_file_paths:
-                    self._cmd.run(
-                        "adb", ["install", apk_file_path],
-                        callback, callback_kwargs=dict(apk_file_path=apk_file_path)
-                    )
+                operations.install_apks(self._cmd, serials, apk_file_paths, item_callback=callback)
 
             main()
 
@@ -698,34 +1176,39 @@ class AndroidAssistant(QMainWindow):
             return
 
         package_names = [item.text() for item in items]
+        serials = self._target_serials()
+        if not serials:
+            return
+        multi = len(serials) > 1
 
         reply = QMessageBox.question(
             self,
             "提示",
-            f"确定卸载：\n{'，'.join(package_names)} ?"
+            f"确定{f'在 {len(serials)} 台设备上' if multi else ''}卸载：\n{'，'.join(package_names)} ?"
         )
         if reply == QMessageBox.StandardButton.Yes:
-            total = len(package_names)
+            total = len(package_names) * len(serials)
             finished_count = 0
             success_dict = {}
             fail_dict = {}
 
-            def callback(code, output, package_name):
+            def callback(serial, package_name, code, output):
                 nonlocal finished_count
 
                 finished_count += 1
 
+                key = self._device_label(serial, package_name, multi)
                 if code == 0:
-                    success_dict[package_name] = output
+                    success_dict[key] = output
                 else:
-                    fail_dict[package_name] = output
+                    fail_dict[key] = output
 
                 if finished_count == total:
                     success_count = len(success_dict)
                     fail_count = len(fail_dict)
 
                     result_msg = (
-                        f"共卸载 {total} 个应用\n"
+                        f"共卸载 {total} 个应用{f'（{len(serials)} 台设备）' if multi else ''}\n"
                         f"成功 {success_count} 个\n"
                         f"失败 {fail_count} 个\n\n"
                     )
@@ -742,14 +1225,10 @@ class AndroidAssistant(QMainWindow):
 
                     QMessageBox.information(self, "卸载结果", result_msg)
 
-                self._signals.adb_shell_pm_list_packages.emit()
+                self._signals.debounce("adb_shell_pm_list_packages")
 
             def main():
-                for package_name in package_names:
-                    self._cmd.run(
-                        "adb", ["uninstall", package_name],
-                        callback, callback_kwargs=dict(package_name=package_name)
-                    )
+                operations.uninstall_packages(self._cmd, serials, package_names, item_callback=callback)
 
             main()
 
@@ -759,33 +1238,39 @@ class AndroidAssistant(QMainWindow):
             return
 
         package_names = [i.text() for i in selected_items]
+        serials = self._target_serials()
+        if not serials:
+            return
+        multi = len(serials) > 1
+
         reply = QMessageBox.question(
             self,
             "提示",
-            f"确定强制停止：\n{'，'.join(package_names)} ?"
+            f"确定{f'在 {len(serials)} 台设备上' if multi else ''}强制停止：\n{'，'.join(package_names)} ?"
         )
         if reply == QMessageBox.StandardButton.Yes:
-            total = len(package_names)
+            total = len(package_names) * len(serials)
             finished_count = 0
             success_dict = {}
             fail_dict = {}
 
-            def callback(code, output, package_name):
+            def callback(serial, package_name, code, output):
                 nonlocal finished_count
 
                 finished_count += 1
 
+                key = self._device_label(serial, package_name, multi)
                 if code == 0:
-                    success_dict[package_name] = output
+                    success_dict[key] = output
                 else:
-                    fail_dict[package_name] = output
+                    fail_dict[key] = output
 
                 if finished_count == total:
                     success_count = len(success_dict)
                     fail_count = len(fail_dict)
 
                     result_msg = (
-                        f"共强制停止 {total} 个应用\n"
+                        f"共强制停止 {total} 个应用{f'（{len(serials)} 台设备）' if multi else ''}\n"
                         f"成功 {success_count} 个\n"
                         f"失败 {fail_count} 个\n\n"
                     )
@@ -802,14 +1287,10 @@ class AndroidAssistant(QMainWindow):
 
                     QMessageBox.information(self, "强制停止结果", result_msg)
 
-                self._signals.adb_shell_pm_list_packages.emit()
+                self._signals.debounce("adb_shell_pm_list_packages")
 
             def main():
-                for package_name in package_names:
-                    self._cmd.run(
-                        "adb", ["shell", "am", "force-stop", package_name],
-                        callback, callback_kwargs=dict(package_name=package_name)
-                    )
+                operations.force_stop_packages(self._cmd, serials, package_names, item_callback=callback)
 
             main()
 
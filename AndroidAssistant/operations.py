@@ -0,0 +1,334 @@
+import os
+import re
+import stat
+
+from androguard.core import apk as androguard_core_apk
+
+from cmd import Cmd, CmdJob
+from device_snapshot import DeviceSnapshot, STAT_FORMAT, DIR_STAT_FORMAT, parse_dir_stat_lines, parse_stat_lines
+from file_model import FileEntry
+from result_cache import strip_serial
+from shell_session import shell_quote
+
+BATCH_CHUNK_SIZE = 100
+LISTING_TTL = 15.0
+SNAPSHOT_TIMEOUT = 300
+
+_MD5SUM_LINE = re.compile(r"^(\\?)([0-9a-f]{32})  (.*)$")
+
+
+def parse_adb_devices(text: str) -> list[list[str]]:
+    found = re.findall(r"List of devices attached(.*)", text, re.DOTALL)
+    if not found:
+        return []
+    return [line.split() for line in found[0].replace("\r\n", "\n").split("\n") if line.strip()]
+
+
+def parse_packages(text: str) -> list[str]:
+    return [line.replace("package:", "").strip() for line in text.strip().split("\n") if line.strip()]
+
+
+def online_serials(devices: list[list[str]]) -> list[str]:
+    return [fields[0] for fields in devices if len(fields) >= 2 and fields[1] == "device"]
+
+
+def parse_listing(text: str) -> list[FileEntry]:
+    # stat lines of every entry, a NUL, then target mode and size, path and target of each symlink, NUL separated
+    stat_text, _, link_text = text.partition("\0")
+    targets = {}
+    fields = link_text.split("\0")
+    for i in range(0, len(fields) - 2, 3):
+        target_stat, path, link = fields[i:i + 3]
+        target_mode, _, target_size = target_stat.partition(" ")
+        if re.fullmatch(r"[0-9a-f]+", target_mode) and target_size.isdigit():
+            targets[path] = (int(target_mode, 16), int(target_size), link)
+        else:
+            # a dangling link
+            targets[path] = (None, None, link)
+
+    entries = []
+    for path, mode, size, mtime in parse_stat_lines(stat_text):
+        name = path.rpartition("/")[2]
+        is_dir, link = stat.S_ISDIR(mode), None
+        if stat.S_ISLNK(mode) and path in targets:
+            target_mode, target_size, link = targets[path]
+            is_dir = target_mode is not None and stat.S_ISDIR(target_mode)
+            size = target_size if target_size is not None else size
+        entries.append(FileEntry(name, is_dir, None if is_dir else size, mtime, mode=mode, link=link))
+    return entries
+
+
+def _collector(total: int, item_callback=None, callback=None):
+    results = {}
+
+    def on_item(serial, item, code, output):
+        results[(serial, item)] = (code, output)
+        if item_callback:
+            item_callback(serial, item, code, output)
+        if len(results) == total and callback:
+            callback(results)
+
+    if total == 0 and callback:
+        callback(results)
+    return on_item
+
+
+def list_devices(cmd: Cmd, callback, long: bool = False) -> CmdJob:
+    def on_finished(code, output):
+        callback(code, parse_adb_devices(output.stdout) if code == 0 else [], output)
+
+    return cmd.run("adb", ["devices"] + (["-l"] if long else []), on_finished)
+
+
+def list_packages(
+        cmd: Cmd,
+        serial: str | None,
+        callback,
+        system: bool = False,
+        third_party: bool = False,
+        use_session: bool = True
+) -> CmdJob:
+    def on_finished(code, output):
+        callback(code, parse_packages(output.stdout) if code == 0 else [], output)
+
+    program_args = (["-s", serial] if serial else []) + ["shell", "pm", "list", "packages"]
+    if system:
+        program_args.append("-s")
+    if third_party:
+        program_args.append("-3")
+    return cmd.run("adb", program_args, on_finished, serial=serial, use_session=use_session)
+
+
+def list_dir_args(serial: str | None, path: str) -> list[str]:
+    # -H follows the path itself when it is a link, like /sdcard
+    find = f"find -H {shell_quote(path)} -mindepth 1 -maxdepth 1"
+    target_stat = 'printf "%s\\0%s\\0%s\\0" "$(stat -L -c "%f %s" "$f" 2>/dev/null)" "$f" "$(readlink "$f")"'
+    script = (
+        f"{find} -exec stat -c {shell_quote(STAT_FORMAT)} {{}} + 2>/dev/null; printf '\\0'; "
+        f"{find} -type l -exec sh -c {shell_quote(f'for f; do {target_stat}; done')} sh {{}} + 2>/dev/null"
+    )
+    return (["-s", serial] if serial else []) + ["shell", "su", "-c", shell_quote(script)]
+
+
+def list_dir(
+        cmd: Cmd,
+        serial: str | None,
+        path: str,
+        callback,
+        prefetch: bool = False,
+        ttl: float = LISTING_TTL
+) -> CmdJob:
+    def on_finished(code, output):
+        entries = parse_listing(output.stdout) if code == 0 or output.stdout else []
+        # find exits non zero on any unreadable entry, an empty result is the real failure
+        callback(0 if entries else code, entries, output)
+
+    # prefetches queue behind everything else in their own processes and leave the session to navigation
+    return cmd.run(
+        "adb", list_dir_args(serial, path), on_finished,
+        use_logger=False, priority=-10 if prefetch else 10, serial=serial,
+        use_session=not prefetch, cache_ttl=ttl
+    )
+
+
+def invalidate_dir(cmd: Cmd, serial: str | None, path: str | None = None) -> int:
+    if path is None:
+        return cmd.cache.invalidate("adb", strip_serial(list_dir_args(None, "/"))[:3], serial)
+    return cmd.cache.invalidate("adb", strip_serial(list_dir_args(None, path)), serial)
+
+
+def _su_args(serial: str | None, script: str) -> list[str]:
+    return (["-s", serial] if serial else []) + ["shell", "su", "-c", shell_quote(script)]
+
+
+def _tree_stat(root: str, stat_format: str, find_args: str = "") -> str:
+    # a root that links to a directory, like /sdcard, is followed: stat -L reports the target and
+    # find -H walks it, while links further down are still listed as links
+    root, stat_format = shell_quote(root), shell_quote(stat_format)
+    return (
+        f"stat -L -c {stat_format} {root} 2>/dev/null; "
+        f"find -H {root} -mindepth 1 {find_args}-exec stat -c {stat_format} {{}} + 2>/dev/null"
+    )
+
+
+def snapshot_dir(cmd: Cmd, serial: str | None, root: str, callback, timeout: float | None = SNAPSHOT_TIMEOUT) -> CmdJob:
+    def on_finished(code, output):
+        snapshot = DeviceSnapshot(root)
+        snapshot.load(output.stdout)
+        # find exits non zero on any unreadable entry, an empty result is the real failure
+        callback(0 if len(snapshot) or code == 0 else code, snapshot)
+
+    return cmd.run("adb", _su_args(serial, _tree_stat(root, STAT_FORMAT)), on_finished, serial=serial, timeout=timeout)
+
+
+def refresh_snapshot(
+        cmd: Cmd,
+        serial: str | None,
+        snapshot: DeviceSnapshot,
+        callback,
+        timeout: float | None = SNAPSHOT_TIMEOUT
+) -> CmdJob:
+    # a directory's mtime moves whenever an entry is added, removed or renamed in it,
+    # so only directories whose mtime changed are listed again
+    def on_dirs(code, output):
+        dir_mtimes = parse_dir_stat_lines(output.stdout)
+        if snapshot.root not in dir_mtimes:
+            callback(code or 1, 0)
+            return
+        changed, new_roots = snapshot.changed_dirs(dir_mtimes)
+        if not changed and not new_roots:
+            callback(0, 0)
+            return
+
+        def on_entries(code, output):
+            if code != 0 and not output.stdout:
+                callback(code, 0)
+                return
+            snapshot.apply_changes(changed, dir_mtimes, output.stdout)
+            callback(0, len(changed) + len(new_roots))
+
+        stat_args = f"-exec stat -c {shell_quote(STAT_FORMAT)} {{}} +"
+        lines = [f"find -H {shell_quote(path)} -mindepth 1 -maxdepth 1 {stat_args}" for path in changed]
+        lines += [f"find -H {shell_quote(path)} {stat_args}" for path in new_roots]
+        # the script grows with the number of changed directories, feed it through stdin instead of the command line
+        cmd.run(
+            "adb", (["-s", serial] if serial else []) + ["shell", "su", "-c", "sh"], on_entries,
+            serial=serial, timeout=timeout, stdin=("exec 2>/dev/null\n" + "\n".join(lines) + "\n").encode()
+        )
+
+    script = _tree_stat(snapshot.root, DIR_STAT_FORMAT, "-type d ")
+    return cmd.run("adb", _su_args(serial, script), on_dirs, serial=serial, timeout=timeout)
+
+
+def parse_md5sum(text: str) -> dict[str, str]:
+    manifest = {}
+    for line in text.split("\n"):
+        match = _MD5SUM_LINE.match(line)
+        if not match:
+            continue
+        escaped, digest, path = match.groups()
+        if escaped:
+            # md5sum escapes names containing a newline or backslash and marks the line with a leading backslash
+            path = re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), path)
+        manifest[path] = digest
+    return manifest
+
+
+def hash_remote(
+        cmd: Cmd,
+        serial: str | None,
+        roots: list[tuple[str, bool]],
+        callback,
+        timeout: float | None = SNAPSHOT_TIMEOUT
+) -> CmdJob:
+    # one md5sum pass over every tree, find batches the files so md5sum starts only a few times
+    def on_finished(code, output):
+        manifest = parse_md5sum(output.stdout)
+        callback(0 if manifest or code == 0 else code, manifest)
+
+    lines = [
+        f"find -H {shell_quote(path)} -type f -exec md5sum {{}} +" if is_dir else f"md5sum {shell_quote(path)}"
+        for path, is_dir in roots
+    ]
+    return cmd.run(
+        "adb", (["-s", serial] if serial else []) + ["shell", "su", "-c", "sh"], on_finished,
+        serial=serial, timeout=timeout, stdin=("exec 2>/dev/null\n" + "\n".join(lines) + "\n").encode()
+    )
+
+
+def install_apks(
+        cmd: Cmd,
+        serials: list,
+        apk_file_paths: list[str],
+        item_callback=None,
+        callback=None,
+        install_args: list[str] | None = None,
+        timeout: float | None = 600
+) -> list[CmdJob]:
+    serials = list(dict.fromkeys(serials)) or [None]
+    on_item = _collector(len(serials) * len(apk_file_paths), item_callback, callback)
+
+    jobs = []
+    for apk_file_path in apk_file_paths:
+        jobs += cmd.fan_out(
+            serials, "adb", ["install"] + list(install_args or []) + [apk_file_path],
+            item_callback=lambda serial, code, output, apk_file_path=apk_file_path: on_item(
+                serial, apk_file_path, code, output
+            ),
+            timeout=timeout
+        )
+    return jobs
+
+
+def _run_package_batches(
+        cmd: Cmd,
+        serials: list,
+        package_names: list[str],
+        command: str,
+        seconds_per_item: float,
+        check_output,
+        item_callback,
+        callback
+) -> list[CmdJob]:
+    serials = list(dict.fromkeys(serials)) or [None]
+    on_item = _collector(len(serials) * len(package_names), item_callback, callback)
+
+    def on_batch_item(serial, package_name, code, output):
+        if code == 0 and check_output and not check_output(output):
+            code = 1
+        on_item(serial, package_name, code, output)
+
+    jobs = []
+    for serial in serials:
+        for start in range(0, len(package_names), BATCH_CHUNK_SIZE):
+            chunk = package_names[start:start + BATCH_CHUNK_SIZE]
+            jobs.append(cmd.run_batch(
+                [(package_name, f"{command} {shell_quote(package_name)}") for package_name in chunk],
+                item_callback=lambda package_name, code, output, serial=serial: on_batch_item(
+                    serial, package_name, code, output
+                ),
+                serial=serial, timeout=60 + seconds_per_item * len(chunk)
+            ))
+    return jobs
+
+
+def uninstall_packages(
+        cmd: Cmd,
+        serials: list,
+        package_names: list[str],
+        item_callback=None,
+        callback=None
+) -> list[CmdJob]:
+    # pm uninstall exits 0 even when it prints "Failure [...]"
+    return _run_package_batches(
+        cmd, serials, package_names, "pm uninstall", 30,
+        lambda output: "Failure" not in output.text, item_callback, callback
+    )
+
+
+def force_stop_packages(
+        cmd: Cmd,
+        serials: list,
+        package_names: list[str],
+        item_callback=None,
+        callback=None
+) -> list[CmdJob]:
+    return _run_package_batches(
+        cmd, serials, package_names, "am force-stop", 10,
+        None, item_callback, callback
+    )
+
+
+def rename_apk(apk_file_path: str) -> str:
+    androguard_core_apk.logger.remove(handler_id=None)
+
+    apk_file_path = os.path.abspath(apk_file_path)
+    dir_path = os.path.dirname(apk_file_path)
+    apk = androguard_core_apk.APK(apk_file_path)
+    new_apk_file_name = apk.get_app_name() + "_" + apk.get_androidversion_name() + ".apk"
+    new_apk_file_path = os.path.abspath(os.path.join(dir_path, new_apk_file_name))
+    if apk_file_path != new_apk_file_path:
+        if os.path.exists(new_apk_file_path):
+            os.remove(new_apk_file_path)
+        os.rename(apk_file_path, new_apk_file_path)
+    return new_apk_file_path
@@ -0,0 +1,177 @@
+import os
+import time
+
+ANY_SERIAL = object()
+
+PM_LIST_PACKAGES = ("adb", ("shell", "pm", "list", "packages"))
+# directory listings of MobileFileDialog
+DEVICE_LISTING = ("adb", ("shell", "su", "-c"))
+
+# (program, args prefix, ttl seconds); the longest matching prefix wins
+DEFAULT_TTLS = [
+    ("adb", ("devices",), 2.0),
+    ("adb", ("get-state",), 2.0),
+    ("adb", ("shell", "pm", "list", "packages"), 10.0),
+    ("adb", ("shell", "getprop"), 60.0),
+    ("fastboot", ("devices",), 2.0),
+    ("fastboot", ("getvar", "all"), 60.0),
+]
+
+# (program, args prefix of a mutating command, [(program, args prefix) it makes stale], all serials)
+DEFAULT_INVALIDATIONS = [
+    ("adb", ("install",), [PM_LIST_PACKAGES], False),
+    ("adb", ("install-multiple",), [PM_LIST_PACKAGES], False),
+    ("adb", ("uninstall",), [PM_LIST_PACKAGES], False),
+    ("adb", ("shell", "pm", "install"), [PM_LIST_PACKAGES], False),
+    ("adb", ("shell", "pm", "uninstall"), [PM_LIST_PACKAGES], False),
+    ("adb", ("shell", "sh"), [PM_LIST_PACKAGES, DEVICE_LISTING], False),
+    ("adb", ("push",), [DEVICE_LISTING], False),
+    ("adb", ("shell", "rm"), [DEVICE_LISTING], False),
+    ("adb", ("shell", "mv"), [DEVICE_LISTING], False),
+    ("adb", ("shell", "mkdir"), [DEVICE_LISTING], False),
+    ("adb", ("shell", "tar"), [DEVICE_LISTING], False),
+    ("adb", ("reboot",), [("adb", ()), ("fastboot", ("devices",))], False),
+    ("adb", ("kill-server",), [("adb", ())], True),
+    ("adb", ("start-server",), [("adb", ("devices",))], True),
+    ("adb", ("connect",), [("adb", ("devices",))], True),
+    ("adb", ("disconnect",), [("adb", ("devices",))], True),
+    ("fastboot", ("flash",), [("fastboot", ("getvar",))], False),
+    ("fastboot", ("reboot",), [("fastboot", ()), ("adb", ("devices",))], False),
+]
+
+# (program, args prefix) of commands that only read, identical ones in flight share a process even when uncached
+DEFAULT_IDEMPOTENT = [
+    ("adb", ("get-serialno",)),
+    ("adb", ("pull",)),
+    ("adb", ("shell", "cat")),
+    ("adb", ("shell", "dumpsys")),
+    ("adb", ("shell", "getprop")),
+    ("adb", ("shell", "ls")),
+    ("adb", ("shell", "md5sum")),
+    ("adb", ("shell", "pm", "list")),
+    ("adb", ("shell", "pm", "path")),
+    ("adb", ("shell", "ps")),
+    ("adb", ("shell", "stat")),
+    ("fastboot", ("getvar",)),
+]
+
+
+def strip_serial(program_args: list) -> tuple:
+    args = list(program_args)
+    if args[:1] == ["-s"]:
+        args = args[2:]
+    return tuple(args)
+
+
+class ResultCache:
+    def __init__(self, ttls=None, invalidations=None, max_entries: int = 256, idempotent=None):
+        self._ttls = list(DEFAULT_TTLS if ttls is None else ttls)
+        self._invalidations = list(DEFAULT_INVALIDATIONS if invalidations is None else invalidations)
+        self._idempotent = list(DEFAULT_IDEMPOTENT if idempotent is None else idempotent)
+        self._max_entries = max_entries
+        self._entries: dict[tuple, tuple[float, int, object]] = {}  # key -> (expires_at, code, output)
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self._sole_serial: str | None = None
+
+    @property
+    def default_serial(self) -> str | None:
+        # the device adb talks to when no -s is given, None while that is unknown or ambiguous
+        return os.environ.get("ANDROID_SERIAL") or self._sole_serial
+
+    def observe_devices(self, text: str) -> None:
+        _, _, listing = text.partition("List of devices attached")
+        online = [fields[0] for fields in map(str.split, listing.splitlines()) if fields[1:2] == ["device"]]
+        self._sole_serial = online[0] if len(online) == 1 else None
+
+    def _key_serial(self, serial: str | None) -> str | None:
+        return self.default_serial if serial is None else serial
+
+    def make_key(self, serial: str | None, program: str, program_args: list) -> tuple:
+        if program == "adb":
+            serial = self._key_serial(serial)
+        return serial, program, strip_serial(program_args)
+
+    def set_ttl(self, program: str, prefix: tuple, ttl: float) -> None:
+        self._ttls = [rule for rule in self._ttls if rule[:2] != (program, tuple(prefix))]
+        self._ttls.append((program, tuple(prefix), ttl))
+
+    def add_invalidation(self, program: str, prefix: tuple, stale: list, all_serials: bool = False) -> None:
+        self._invalidations.append((program, tuple(prefix), list(stale), all_serials))
+
+    def add_idempotent(self, program: str, prefix: tuple) -> None:
+        self._idempotent.append((program, tuple(prefix)))
+
+    def is_idempotent(self, program: str, program_args: list) -> bool:
+        args = strip_serial(program_args)
+        return any(
+            rule_program == program and args[:len(prefix)] == prefix for rule_program, prefix in self._idempotent
+        )
+
+    def ttl_for(self, program: str, program_args: list) -> float:
+        args = strip_serial(program_args)
+        best_len, best_ttl = -1, 0.0
+        for rule_program, prefix, ttl in self._ttls:
+            if rule_program == program and args[:len(prefix)] == prefix and len(prefix) > best_len:
+                best_len, best_ttl = len(prefix), ttl
+        return best_ttl
+
+    def get(self, key: tuple):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1], entry[2]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: tuple, code: int, output, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        if len(self._entries) >= self._max_entries:
+            now = time.monotonic()
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            while len(self._entries) >= self._max_entries:
+                del self._entries[next(iter(self._entries))]
+        self._entries[key] = (time.monotonic() + ttl, code, output)
+
+    def invalidate(self, program: str | None = None, prefix: tuple = (), serial=ANY_SERIAL) -> int:
+        prefix = tuple(prefix)
+        if serial is not ANY_SERIAL:
+            serial = self._key_serial(serial)
+        # entries cached before the default device was known may belong to any device
+        stale = [
+            key for key in self._entries
+            if (serial is ANY_SERIAL or key[0] == serial or key[0] is None)
+            and (program is None or key[1] == program)
+            and key[2][:len(prefix)] == prefix
+        ]
+        for key in stale:
+            del self._entries[key]
+        self.invalidated += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        self.invalidated += len(self._entries)
+        self._entries.clear()
+
+    def on_command(self, serial: str | None, program: str, program_args: list) -> None:
+        args = strip_serial(program_args)
+        for rule_program, prefix, stale, all_serials in self._invalidations:
+            if rule_program != program or args[:len(prefix)] != prefix:
+                continue
+            for stale_program, stale_prefix in stale:
+                self.invalidate(stale_program, stale_prefix, ANY_SERIAL if all_serials else serial)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "invalidated": self.invalidated,
+        }
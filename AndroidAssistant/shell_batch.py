@@ -0,0 +1,83 @@
+import uuid
+
+from cmd_output import CmdOutput, STDERR
+from shell_session import capture_stderr, split_stderr, strip_newline
+
+
+class ShellBatch:
+    def __init__(self, items: list[tuple[object, str]], item_callback=None):
+        self.items = list(items)
+        self.item_callback = item_callback
+        self.results: dict[int, tuple[int, CmdOutput]] = {}
+
+        token = uuid.uuid4().hex
+        self._begin = f"__AA_BEGIN_{token}_".encode()
+        self._end = f"__AA_END_{token}_".encode()
+        self._err = f"__AA_ERR_{token}_".encode()
+        self._buffer = bytearray()
+        self._current: int | None = None
+        self._body_start = 0
+
+    def script(self) -> bytes:
+        lines = []
+        for i, (_, command) in enumerate(self.items):
+            begin = self._begin.decode() + str(i)
+            end = self._end.decode() + str(i)
+            lines.append(
+                f"printf '%s\\n' {begin}; "
+                f"{capture_stderr(command, self._err.decode())}; "
+                f"printf '\\n%s %s\\n' {end} \"$__aa_status\""
+            )
+        lines.append("exit 0")
+        return ("\n".join(lines) + "\n").encode()
+
+    def feed(self, data: bytes) -> None:
+        self._buffer += data
+        while True:
+            if self._current is None:
+                index = self._buffer.find(self._begin)
+                if index < 0:
+                    return
+                line_end = self._buffer.find(b"\n", index)
+                if line_end < 0:
+                    return
+                self._current = int(self._buffer[index + len(self._begin):line_end].strip())
+                del self._buffer[:line_end + 1]
+                continue
+
+            index = self._buffer.find(self._end)
+            if index < 0:
+                return
+            line_end = self._buffer.find(b"\n", index)
+            if line_end < 0:
+                return
+            fields = self._buffer[index + len(self._end):line_end].split()
+            stdout, stderr = split_stderr(strip_newline(bytes(self._buffer[:index])), self._err)
+            del self._buffer[:line_end + 1]
+
+            try:
+                code = int(fields[1])
+            except (IndexError, ValueError):
+                code = -1
+            self._complete(self._current, code, stdout, stderr)
+            self._current = None
+
+    def finish(self, code: int, error: str = "") -> dict:
+        # error is what the adb shell itself printed to stderr, it goes to every item it cut short
+        if self._current is not None:
+            stdout, stderr = split_stderr(bytes(self._buffer), self._err)
+            self._complete(self._current, code if code else -1, stdout, stderr + error.encode())
+            self._current = None
+        for i in range(len(self.items)):
+            if i not in self.results:
+                self._complete(i, -1, b"", (error or "not executed").encode())
+        return {self.items[i][0]: result for i, result in self.results.items()}
+
+    def _complete(self, index: int, code: int, stdout: bytes, stderr: bytes) -> None:
+        if index in self.results or not 0 <= index < len(self.items):
+            return
+        output = CmdOutput.from_bytes(stdout)
+        output.append(STDERR, stderr)
+        self.results[index] = (code, output)
+        if self.item_callback:
+            self.item_callback(self.items[index][0], code, output)
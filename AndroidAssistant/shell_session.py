@@ -0,0 +1,193 @@
+import uuid
+from collections import deque
+
+from PySide6.QtCore import QObject, QProcess
+
+
+def shell_quote(text: str) -> str:
+    return "'" + text.replace("'", "'\\''") + "'"
+
+
+def capture_stderr(command: str, err_marker: str) -> str:
+    # stdout streams straight through, stderr is held in a variable and printed after err_marker,
+    # so both come back over stdout in order even on devices whose adb merges the two streams
+    return (
+        f"{{ __aa_err=$( {{ ( eval {shell_quote(command)} ) </dev/null 2>&1 1>&3 3>&-; }} ); }} 3>&1; "
+        f"__aa_status=$?; printf '\\n%s\\n%s' {err_marker} \"$__aa_err\""
+    )
+
+
+def strip_newline(data: bytes, end: bool = True) -> bytes:
+    for newline in (b"\r\n", b"\n"):
+        if end and data.endswith(newline):
+            return data[:-len(newline)]
+        if not end and data.startswith(newline):
+            return data[len(newline):]
+    return data
+
+
+def split_stderr(body: bytes, err_marker: bytes) -> tuple[bytes, bytes]:
+    index = body.rfind(err_marker)
+    if index < 0:
+        return body, b""
+    return strip_newline(body[:index]), strip_newline(body[index + len(err_marker):], end=False)
+
+
+def err_marker_for(marker: bytes) -> bytes:
+    # must not contain marker itself, the end of a command is found by searching for marker
+    return marker.replace(b"__AA_", b"__AA_ERR_", 1)
+
+
+class ShellSession(QObject):
+
+    def __init__(self, cmd, serial: str | None = None, program: str = "adb", max_reconnects: int = 3):
+        super().__init__(cmd)
+        self._cmd = cmd
+        self.serial = serial
+        self._program = program
+        self._max_reconnects = max_reconnects
+
+        self._process: QProcess | None = None
+        self._pending: deque[list] = deque()  # [marker, on_done, command] in execution order, on_done None if cancelled
+        self._buffer = bytearray()
+        self._scan_from = 0
+        self._reconnects = 0
+
+    @property
+    def program_args(self) -> list:
+        args = ["-s", self.serial] if self.serial else []
+        return args + ["shell"]
+
+    def is_open(self) -> bool:
+        return self._process is not None and self._process.state() != QProcess.ProcessState.NotRunning
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def execute(self, command: str, on_done) -> bytes:
+        marker = f"__AA_{uuid.uuid4().hex}__".encode()
+        self._pending.append([marker, on_done, command])
+        if self.is_open():
+            self._write(marker, command)
+        else:
+            self._open()
+        return marker
+
+    def cancel(self, marker: bytes) -> None:
+        for i, entry in enumerate(self._pending):
+            if entry[0] != marker:
+                continue
+            entry[1] = None
+            if i == 0 and self._process is not None:
+                # the command is executing; only restarting the shell stops it
+                self._process.kill()
+            return
+
+    def close(self) -> None:
+        process = self._process
+        self._process = None
+        if process is not None:
+            process.finished.disconnect()
+            process.errorOccurred.disconnect()
+            process.kill()
+            process.waitForFinished(1000)
+            process.setParent(None)
+            process.deleteLater()
+        self._fail_all("session closed")
+
+    def _open(self) -> None:
+        process = QProcess(self)
+        process.setProcessChannelMode(QProcess.ProcessChannelMode.SeparateChannels)
+        process.readyReadStandardOutput.connect(self._on_stdout)
+        process.readyReadStandardError.connect(self._on_stderr)
+        process.finished.connect(self._on_dropped)
+        process.errorOccurred.connect(self._on_error)
+        self._process = process
+        self._buffer.clear()
+        self._scan_from = 0
+
+        logger = self._cmd.logger
+        if logger:
+            logger.debug(f"{self._program} {' '.join(self.program_args)} (session open)", tag="[session]")
+
+        process.start(self._program, self.program_args)
+        self._pending = deque(entry for entry in self._pending if entry[1] is not None)
+        for marker, _, command in self._pending:
+            self._write(marker, command)
+
+    def _write(self, marker: bytes, command: str) -> None:
+        script = (
+            f"{capture_stderr(command, err_marker_for(marker).decode())}; "
+            f"printf '\\n%s %s\\n' {marker.decode()} \"$__aa_status\"\n"
+        )
+        self._process.write(script.encode())
+
+    def _on_stdout(self) -> None:
+        self._buffer += self._process.readAllStandardOutput().data()
+        while self._pending:
+            marker, on_done, _ = self._pending[0]
+            index = self._buffer.find(marker, max(0, self._scan_from - len(marker)))
+            if index < 0:
+                self._scan_from = len(self._buffer)
+                return
+            line_end = self._buffer.find(b"\n", index)
+            if line_end < 0:
+                self._scan_from = index
+                return
+
+            status = self._buffer[index + len(marker):line_end].strip()
+            stdout, stderr = split_stderr(strip_newline(bytes(self._buffer[:index])), err_marker_for(marker))
+            del self._buffer[:line_end + 1]
+            self._scan_from = 0
+            self._pending.popleft()
+            self._reconnects = 0
+
+            if on_done is None:
+                continue
+            try:
+                code = int(status)
+            except ValueError:
+                code = -1
+            on_done(code, stdout, stderr)
+
+    def _on_stderr(self) -> None:
+        data = self._process.readAllStandardError().data().decode(errors="replace")
+        logger = self._cmd.logger
+        if logger and data.strip():
+            logger.warning(data, tag="[session]")
+
+    def _on_error(self, error) -> None:
+        if error == QProcess.ProcessError.FailedToStart:
+            self._on_dropped()
+
+    def _on_dropped(self, *_) -> None:
+        process = self._process
+        if process is None:
+            return
+        self._process = None
+        process.setParent(None)
+        process.deleteLater()
+
+        if self._pending:
+            marker, on_done, _ = self._pending.popleft()
+            if on_done is not None:
+                stdout, stderr = split_stderr(bytes(self._buffer), err_marker_for(marker))
+                on_done(-1, stdout, stderr + process.errorString().encode())
+
+        self._reconnects += 1
+        if not self._pending:
+            return
+        if self._reconnects > self._max_reconnects:
+            self._fail_all("session dropped")
+            return
+
+        logger = self._cmd.logger
+        if logger:
+            logger.warning(f"shell session dropped, reconnecting ({self._reconnects})", tag="[session]")
+        self._open()
+
+    def _fail_all(self, reason: str) -> None:
+        pending, self._pending = self._pending, deque()
+        for _, on_done, _ in pending:
+            if on_done is not None:
+                on_done(-1, b"", reason.encode())
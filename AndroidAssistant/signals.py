@@ -1,5 +1,19 @@
-from PySide6.QtCore import QObject, Signal
+from PySide6.QtCore import QObject, QTimer, Signal
 
 
 class Signals(QObject):
     adb_shell_pm_list_packages = Signal()
+
+    def __init__(self, debounce_msec: int = 500):
+        super().__init__()
+        self._debounce_msec = debounce_msec
+        self._debounce_timers: dict[str, QTimer] = {}
+
+    def debounce(self, name: str, msec: int | None = None) -> None:
+        timer = self._debounce_timers.get(name)
+        if timer is None:
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(getattr(self, name).emit)
+            self._debounce_timers[name] = timer
+        timer.start(self._debounce_msec if msec is None else msec)
@@ -0,0 +1,231 @@
+import os
+import stat
+import tarfile
+import tempfile
+import threading
+import zlib
+from collections import deque
+from typing import Iterator
+
+from PySide6.QtCore import QObject, Signal
+
+TAR_BLOCK_SIZE = 512
+READ_SIZE = 1024 * 1024
+GZIP_WBITS = 31  # zlib window bits for a gzip wrapper
+SPOOL_MEMORY = 16 * 1024 * 1024
+
+
+def tar_size(sizes: list[int]) -> int:
+    # one header block per member, data padded to whole blocks, two zero blocks at the end
+    return sum(TAR_BLOCK_SIZE + -(-size // TAR_BLOCK_SIZE) * TAR_BLOCK_SIZE for size in sizes) + 2 * TAR_BLOCK_SIZE
+
+
+def tar_chunks(members: list[tuple[str, str]], compress: bool = False, on_progress=None) -> Iterator[bytes]:
+    # members are (local path, name in the archive); produces the archive piece by piece instead of building it
+    compressor = zlib.compressobj(1, zlib.DEFLATED, GZIP_WBITS) if compress else None
+    produced = 0
+
+    def out(data: bytes) -> bytes:
+        nonlocal produced
+        produced += len(data)
+        if on_progress:
+            on_progress(produced)
+        return compressor.compress(data) if compressor else data
+
+    for local_path, name in members:
+        try:
+            f = open(local_path, "rb")
+        except OSError:
+            continue
+        with f:
+            st = os.fstat(f.fileno())
+            info = tarfile.TarInfo(name)
+            info.size = st.st_size
+            info.mtime = int(st.st_mtime)
+            info.mode = stat.S_IMODE(st.st_mode)
+            yield out(info.tobuf(tarfile.GNU_FORMAT, "utf-8", "surrogateescape"))
+
+            remaining = info.size
+            while remaining:
+                try:
+                    data = f.read(min(READ_SIZE, remaining))
+                except OSError:
+                    data = b""
+                if not data:
+                    # the file shrank while being read, the header already promised its old size
+                    data = b"\0" * min(READ_SIZE, remaining)
+                remaining -= len(data)
+                yield out(data)
+            padding = -info.size % TAR_BLOCK_SIZE
+            if padding:
+                yield out(b"\0" * padding)
+
+    yield out(b"\0" * 2 * TAR_BLOCK_SIZE)
+    if compressor:
+        yield compressor.flush()
+
+
+class _Spool:
+    # hands data from the GUI thread to the extraction thread without ever blocking the writer:
+    # past max_memory bytes it goes to a temporary file until the reader has caught up
+    def __init__(self, max_memory: int = SPOOL_MEMORY):
+        self._max_memory = max_memory
+        self._memory: deque[bytes] = deque()
+        self._memory_size = 0
+        self._file = None
+        self._written = 0  # file offsets, the file is rewound whenever the reader drains it
+        self._read = 0
+        self._eof = False
+        self._cond = threading.Condition()
+        self.spilled = 0  # bytes that went through the file
+
+    @property
+    def buffered(self) -> int:
+        return self._memory_size + self._written - self._read
+
+    def put(self, data: bytes) -> None:
+        with self._cond:
+            if self._eof:
+                return
+            if self._written > self._read or self._memory_size + len(data) > self._max_memory:
+                if self._file is None:
+                    self._file = tempfile.TemporaryFile(prefix="aa-tar-")
+                self._file.seek(self._written)
+                self._file.write(data)
+                self._written += len(data)
+                self.spilled += len(data)
+            else:
+                self._memory.append(data)
+                self._memory_size += len(data)
+            self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            self._eof = True
+            self._cond.notify()
+
+    def release(self) -> None:
+        with self._cond:
+            self._eof = True
+            self._memory.clear()
+            self._memory_size = 0
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._written = self._read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        parts = []
+        with self._cond:
+            while size:
+                if self._memory:
+                    chunk = self._memory.popleft()
+                    if 0 < size < len(chunk):
+                        chunk, rest = chunk[:size], chunk[size:]
+                        self._memory.appendleft(rest)
+                    self._memory_size -= len(chunk)
+                elif self._written > self._read:
+                    # the memory part is older than anything in the file, it is only read once that is empty
+                    available = self._written - self._read
+                    self._file.seek(self._read)
+                    chunk = self._file.read(available if size < 0 else min(size, available))
+                    self._read += len(chunk)
+                    if self._read == self._written:
+                        self._file.seek(0)
+                        self._file.truncate()
+                        self._written = self._read = 0
+                elif self._eof:
+                    break
+                else:
+                    self._cond.wait()
+                    continue
+                parts.append(chunk)
+                if size > 0:
+                    size -= len(chunk)
+        return b"".join(parts)
+
+
+def _checked_members(archive: tarfile.TarFile, dest: str) -> Iterator[tarfile.TarInfo]:
+    # what the "data" extraction filter enforces, for Pythons that do not ship it
+    dest = os.path.realpath(dest)
+
+    def inside(path: str) -> bool:
+        return os.path.commonpath([dest, os.path.realpath(path)]) == dest
+
+    for member in archive:
+        name = member.name
+        if not (member.isfile() or member.isdir() or member.issym() or member.islnk()):
+            raise tarfile.TarError(f"{name}: special files are not extracted")
+        if os.path.isabs(name) or ".." in name.replace("\\", "/").split("/") or not inside(os.path.join(dest, name)):
+            raise tarfile.TarError(f"{name}: outside the destination")
+        if member.issym():
+            link = os.path.join(dest, os.path.dirname(name), member.linkname)
+            if os.path.isabs(member.linkname) or not inside(link):
+                raise tarfile.TarError(f"{name}: links outside the destination")
+        elif member.islnk() and (os.path.isabs(member.linkname) or not inside(os.path.join(dest, member.linkname))):
+            raise tarfile.TarError(f"{name}: links outside the destination")
+        # no set-id bits and nothing writable by others
+        member.mode &= 0o755
+        yield member
+
+
+class TarExtractor(QObject):
+    finished = Signal(str)  # error message, empty on success
+
+    def __init__(self, dest: str, compressed: bool = False, spool_memory: int = SPOOL_MEMORY, parent=None):
+        super().__init__(parent)
+        self.dest = dest
+        self.received = 0  # archive bytes after decompression
+        self._decompressor = zlib.decompressobj(GZIP_WBITS) if compressed else None
+        self._spool = _Spool(spool_memory)
+        self._failed = threading.Event()
+        threading.Thread(target=self._run, name="TarExtractor", daemon=True).start()
+
+    def feed(self, data: bytes) -> None:
+        if self._failed.is_set():
+            return
+        if self._decompressor is not None:
+            try:
+                data = self._decompress(data)
+            except zlib.error:
+                self._failed.set()
+                self._spool.close()
+                return
+        self.received += len(data)
+        self._spool.put(data)
+
+    def _decompress(self, data: bytes) -> bytes:
+        # several tar commands may each write their own gzip member
+        parts = []
+        while data:
+            parts.append(self._decompressor.decompress(data))
+            if not self._decompressor.eof:
+                break
+            data = self._decompressor.unused_data
+            self._decompressor = zlib.decompressobj(GZIP_WBITS)
+        return b"".join(parts)
+
+    @property
+    def spilled(self) -> int:
+        return self._spool.spilled
+
+    def close(self) -> None:
+        self._spool.close()
+
+    def _run(self) -> None:
+        error = ""
+        try:
+            # ignore_zeros reads across the end markers of concatenated archives
+            with tarfile.open(fileobj=self._spool, mode="r|", ignore_zeros=True) as archive:
+                if hasattr(tarfile, "data_filter"):
+                    archive.extractall(self.dest, filter="data")
+                else:
+                    archive.extractall(self.dest, members=_checked_members(archive, self.dest))
+        except (tarfile.TarError, OSError) as e:
+            error = str(e)
+        if self._failed.is_set():
+            error = error or "corrupt gzip stream"
+        # nothing reads the spool any more, later output is dropped instead of piling up
+        self._failed.set()
+        self._spool.release()
+        self.finished.emit(error)
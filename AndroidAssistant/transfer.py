@@ -0,0 +1,652 @@
+import os
+import posixpath
+import stat
+import time
+from collections import deque
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+import operations
+from checksum import LocalHasher
+from cmd import Cmd
+from file_model import FileEntry, format_size
+from shell_session import shell_quote
+from tar_stream import TarExtractor, tar_chunks, tar_size
+
+PUSH = "push"
+PULL = "pull"
+
+ITEM_PENDING = "pending"
+ITEM_RUNNING = "running"
+ITEM_DONE = "done"
+ITEM_FAILED = "failed"
+ITEM_CANCELLED = "cancelled"
+ITEM_UNCHANGED = "unchanged"
+
+NOTE_NEW = "new"
+NOTE_CHANGED = "changed"
+
+BULK_AUTO = "auto"
+BULK_NEVER = "never"
+BULK_ALWAYS = "always"
+# per file adb sync costs a round trip or two per file, worth bundling once there are many small ones
+BULK_MIN_FILES = 64
+BULK_MAX_AVERAGE_SIZE = 1024 * 1024
+TAR_BATCH_SIZE = 500
+
+
+class TransferItem:
+    __slots__ = (
+        "serial", "source", "target", "size", "state", "attempts", "transferred",
+        "started_at", "finished_at", "error", "job", "note", "root", "members", "bulk"
+    )
+
+    def __init__(self, serial: str | None, source: str, target: str, size: int | None = None):
+        self.serial = serial
+        self.source = source
+        self.target = target
+        self.size = size
+        self.state = ITEM_PENDING
+        self.attempts = 0
+        self.transferred = 0
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.error = ""
+        self.job = None
+        self.note = ""  # why a sync transfers the file
+        self.root: tuple[str, str] | None = None  # (source, target) directory the file was planned from
+        self.members: list[TransferItem] | None = None  # files a tar item carries
+        self.bulk: TransferItem | None = None  # the tar item carrying this file
+
+    @property
+    def progress(self) -> float | None:
+        if self.state in (ITEM_DONE, ITEM_UNCHANGED):
+            return 1.0
+        if not self.size:
+            return None
+        return min(self.transferred / self.size, 1.0)
+
+    @property
+    def rate(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return self.transferred / elapsed if elapsed > 0 else 0.0
+
+
+def _walk_local(source: str, remote_root: str) -> tuple[list[str], list[tuple[str, str, int]]]:
+    dirs, files = [remote_root], []
+    for root, dir_names, file_names in os.walk(source):
+        rel = os.path.relpath(root, source)
+        remote_dir = remote_root if rel == "." else posixpath.join(remote_root, *rel.split(os.sep))
+        dirs += [posixpath.join(remote_dir, name) for name in dir_names]
+        for name in file_names:
+            local_path = os.path.join(root, name)
+            try:
+                size = os.path.getsize(local_path)
+            except OSError:
+                size = None
+            files.append((local_path, posixpath.join(remote_dir, name), size))
+    return dirs, files
+
+
+class TransferQueue(QObject):
+    itemsPlanned = Signal(list)  # TransferItem
+    itemChanged = Signal(object)  # TransferItem
+    progressChanged = Signal()
+    finished = Signal(dict)  # summary
+    message = Signal(str)
+
+    RATE_WINDOW = 5.0
+
+    def __init__(
+            self,
+            cmd: Cmd,
+            direction: str,
+            serials: list,
+            parallel: int = 2,
+            retries: int = 2,
+            poll_msec: int = 1000,
+            sync: bool = False,
+            dry_run: bool = False,
+            bulk: str = BULK_AUTO,
+            compress: bool = False,
+            parent=None
+    ):
+        super().__init__(parent)
+        self._cmd = cmd
+        self.direction = direction
+        self.serials = list(dict.fromkeys(serials)) or [None]
+        self.parallel = max(1, parallel)
+        self.retries = max(0, retries)
+        self.sync = sync or dry_run
+        self.dry_run = dry_run
+        self.bulk = bulk
+        self.compress = compress
+        self._bulk_items: list[TransferItem] = []
+
+        self.items: list[TransferItem] = []
+        self._queues: dict[str | None, deque[TransferItem]] = {serial: deque() for serial in self.serials}
+        self._running: dict[str | None, int] = {serial: 0 for serial in self.serials}
+        self._planning = 0
+        self._started_at: float | None = None
+        self._finished_at: float | None = None
+        self._samples: deque[tuple[float, int]] = deque()
+        self._polling: set = set()
+        self.cancelled = False
+        self.skipped = 0
+        self._hash_roots: dict[str | None, list[tuple[str, bool]]] = {serial: [] for serial in self.serials}
+        self._manifests: dict[str | None, dict[str, str]] = {}
+        self._hasher: LocalHasher | None = None
+        self._hash_jobs: list = []  # device side md5sum runs
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(poll_msec)
+        self._timer.timeout.connect(self._poll)
+
+    @property
+    def active(self) -> bool:
+        return self._started_at is not None and self._finished_at is None
+
+    def start(self, sources: list[str], target: str, entries: dict[str, FileEntry] | None = None) -> None:
+        entries = entries or {}
+        self._started_at = time.monotonic()
+        self._planning = 1
+        for serial in self.serials:
+            if self.direction == PUSH:
+                self._plan_push(serial, sources, target)
+            else:
+                # one sub directory per device so pulls of the same path do not overwrite each other
+                local_dir = os.path.join(target, serial) if len(self.serials) > 1 and serial else target
+                self._plan_pull(serial, sources, local_dir, entries)
+        self._planned()
+
+    def _add(self, items: list[TransferItem]) -> None:
+        self.items += items
+        for item in items:
+            self._queues[item.serial].append(item)
+        self.itemsPlanned.emit(items)
+
+    def _plan_push(self, serial, sources: list[str], target: str) -> None:
+        items, dirs = [], []
+        for source in sources:
+            if os.path.isdir(source):
+                # like adb push, a directory lands inside the target directory
+                remote_root = posixpath.join(target, os.path.basename(source.rstrip(os.sep)))
+                source_dirs, files = _walk_local(source, remote_root)
+                dirs += source_dirs
+                for local_path, remote_path, size in files:
+                    item = TransferItem(serial, local_path, remote_path, size)
+                    item.root = (source, remote_root)
+                    items.append(item)
+                self._hash_roots[serial].append((remote_root, True))
+            else:
+                size = os.path.getsize(source) if os.path.exists(source) else None
+                remote_path = posixpath.join(target, os.path.basename(source))
+                items.append(TransferItem(serial, source, remote_path, size))
+                self._hash_roots[serial].append((remote_path, False))
+        if not dirs:
+            self._add(items)
+            return
+
+        # every directory up front in one shell, files can then go in any order and in parallel
+        script = "".join(f"mkdir -p {shell_quote(path)}\n" for path in dirs)
+        self._planning += 1
+
+        def on_created(code, output):
+            if code != 0:
+                self.message.emit(f"创建目录失败 [{serial}]：{output.text.strip()}")
+            self._add(items)
+            self._planned()
+
+        self._cmd.run(
+            "adb", (["-s", serial] if serial else []) + ["shell", "sh"], on_created,
+            serial=serial, stdin=script.encode()
+        )
+
+    def _plan_pull(self, serial, sources: list[str], local_dir: str, entries: dict[str, FileEntry]) -> None:
+        os.makedirs(local_dir, exist_ok=True)
+        items = []
+        for source in sources:
+            entry = entries.get(source)
+            name = posixpath.basename(source.rstrip("/"))
+            if entry is None:
+                # nothing known about it, adb pull copes with files and directories alike
+                items.append(TransferItem(serial, source, local_dir))
+            elif not entry.is_dir:
+                items.append(TransferItem(serial, source, os.path.join(local_dir, name), entry.size))
+                self._hash_roots[serial].append((source, False))
+            else:
+                self._hash_roots[serial].append((source, True))
+                self._plan_pull_dir(serial, source, os.path.join(local_dir, name))
+        self._add(items)
+
+    def _plan_pull_dir(self, serial, source: str, local_root: str) -> None:
+        self._planning += 1
+
+        def on_snapshot(code, snapshot):
+            # no children can also mean the directory could not be walked, let adb pull work it out
+            if code != 0 or not snapshot.listing(snapshot.root):
+                self.message.emit(f"无法读取设备目录 [{serial}]：{source}，改为整体拉取")
+                self._add([TransferItem(serial, source, os.path.dirname(local_root))])
+                self._planned()
+                return
+
+            items = []
+            root = snapshot.root.rstrip("/")
+            for entry_id in snapshot.entry_ids():
+                mode = snapshot.modes[entry_id]
+                path = snapshot.path(entry_id)
+                rel = path[len(root):].lstrip("/")
+                local_path = os.path.join(local_root, *rel.split("/")) if rel else local_root
+                if stat.S_ISDIR(mode):
+                    os.makedirs(local_path, exist_ok=True)
+                elif stat.S_ISREG(mode):
+                    item = TransferItem(serial, path, local_path, snapshot.sizes[entry_id])
+                    item.root = (root, local_root)
+                    items.append(item)
+                else:
+                    self.skipped += 1
+            self._add(items)
+            self._planned()
+
+        operations.snapshot_dir(self._cmd, serial, source, on_snapshot)
+
+    def _planned(self) -> None:
+        self._planning -= 1
+        if self._planning:
+            return
+        if self.cancelled:
+            self._finish()
+            return
+        if self.sync and self.items:
+            self._hash_remote()
+        else:
+            self._begin()
+
+    def _begin(self) -> None:
+        if self.dry_run:
+            self._finish()
+            return
+        if self.bulk != BULK_NEVER:
+            self._bundle()
+        self._samples.append((time.monotonic(), self.transferred))
+        self._timer.start()
+        self._fill()
+
+    def _hash_remote(self) -> None:
+        self.message.emit("正在计算设备端校验和…")
+        waiting = set(self.serials)
+
+        def on_hashed(code, manifest, serial):
+            if code != 0:
+                self.message.emit(f"设备端校验和计算失败 [{serial}]，该设备的文件将全部传输")
+            self._manifests[serial] = manifest
+            waiting.discard(serial)
+            if not waiting and not self.cancelled:
+                self._hash_local()
+            elif not waiting:
+                self._finish()
+
+        for serial in self.serials:
+            self._hash_jobs.append(operations.hash_remote(
+                self._cmd, serial, self._hash_roots[serial],
+                lambda code, manifest, serial=serial: on_hashed(code, manifest, serial)
+            ))
+
+    def _remote_path(self, item: TransferItem) -> str:
+        return item.target if self.direction == PUSH else item.source
+
+    def _local_path(self, item: TransferItem) -> str:
+        return item.source if self.direction == PUSH else item.target
+
+    def _hash_local(self) -> None:
+        # only files the device has a counterpart for need a local hash, everything else is new anyway
+        paths = set()
+        for item in self.items:
+            if self._remote_path(item) not in self._manifests.get(item.serial, {}):
+                continue
+            local_path = self._local_path(item)
+            if self.direction == PULL and item.size is not None and os.path.isfile(local_path) \
+                    and os.path.getsize(local_path) != item.size:
+                continue
+            if os.path.isfile(local_path):
+                paths.add(local_path)
+        self.message.emit(f"正在计算本地校验和：{len(paths)} 个文件")
+        self._hasher = LocalHasher(parent=self)
+        self._hasher.finished.connect(self._compare)
+        self._hasher.start(sorted(paths))
+
+    def _compare(self, local_hashes: dict[str, str | None]) -> None:
+        self._hasher = None
+        if self.cancelled:
+            self._finish()
+            return
+        for serial, queue in self._queues.items():
+            manifest = self._manifests.get(serial, {})
+            kept = deque()
+            for item in queue:
+                remote = manifest.get(self._remote_path(item))
+                local = local_hashes.get(self._local_path(item))
+                if remote is not None and remote == local:
+                    item.state = ITEM_UNCHANGED
+                    item.transferred = item.size or 0
+                    self.itemChanged.emit(item)
+                    continue
+                local_exists = os.path.exists(self._local_path(item))
+                item.note = NOTE_CHANGED if (remote is not None and local_exists) else NOTE_NEW
+                self.itemChanged.emit(item)
+                kept.append(item)
+            self._queues[serial] = kept
+        self.message.emit(self.sync_report())
+        self._begin()
+
+    def sync_report(self, limit: int = 200) -> str:
+        moving = sorted((item for queue in self._queues.values() for item in queue), key=lambda item: item.source)
+        unchanged = [item for item in self.items if item.state == ITEM_UNCHANGED]
+        new = sum(1 for item in moving if item.note == NOTE_NEW)
+        lines = [
+            f"需传输 {len(moving)} 个文件（新增 {new}，变化 {len(moving) - new}），"
+            f"合计 {format_size(sum(item.size or 0 for item in moving))}；"
+            f"未变化 {len(unchanged)} 个，合计 {format_size(sum(item.size or 0 for item in unchanged))}"
+        ]
+        if self.dry_run:
+            multi = len(self.serials) > 1
+            for item in moving[:limit]:
+                prefix = f"[{item.serial}] " if multi else ""
+                lines.append(f"  {'新增' if item.note == NOTE_NEW else '变化'}  {prefix}{item.source} -> {item.target}")
+            if len(moving) > limit:
+                lines.append(f"  … 另有 {len(moving) - limit} 个文件")
+        return "\n".join(lines)
+
+    def _bundle(self) -> None:
+        for serial, queue in self._queues.items():
+            groups: dict[tuple[str, str], list[TransferItem]] = {}
+            for item in queue:
+                if item.root is not None and item.size is not None:
+                    groups.setdefault(item.root, []).append(item)
+
+            bulk_items = []
+            for root, members in groups.items():
+                size = sum(item.size for item in members)
+                if self.bulk == BULK_AUTO and (
+                        len(members) < BULK_MIN_FILES or size / len(members) > BULK_MAX_AVERAGE_SIZE):
+                    continue
+                bulk_item = TransferItem(serial, root[0], root[1], size)
+                bulk_item.members = members
+                for item in members:
+                    item.bulk = bulk_item
+                bulk_items.append(bulk_item)
+            if bulk_items:
+                self._bulk_items += bulk_items
+                self._queues[serial] = deque(bulk_items + [item for item in queue if item.bulk is None])
+                for bulk_item in bulk_items:
+                    self.message.emit(
+                        f"{bulk_item.source}：{len(bulk_item.members)} 个文件以 tar 流整体传输"
+                        + ("（gzip 压缩）" if self.compress else "")
+                    )
+
+    def _fill(self) -> None:
+        for serial, queue in self._queues.items():
+            while queue and self._running[serial] < self.parallel and not self.cancelled:
+                self._start_item(queue.popleft())
+        if not self._planning and not any(self._running.values()) and not any(self._queues.values()):
+            self._finish()
+
+    def _start_item(self, item: TransferItem) -> None:
+        item.state = ITEM_RUNNING
+        item.attempts += 1
+        item.transferred = 0
+        item.started_at = time.monotonic()
+        item.finished_at = None
+        self._running[item.serial] += 1
+        self.itemChanged.emit(item)
+        if item.members is not None:
+            self._start_bulk(item)
+            return
+        item.job = self._cmd.run(
+            "adb", (["-s", item.serial] if item.serial else []) + [self.direction, item.source, item.target],
+            lambda code, output: self._on_item_done(item, code, output.text),
+            use_logger=False, serial=item.serial
+        )
+
+    def _start_bulk(self, item: TransferItem) -> None:
+        serial_args = ["-s", item.serial] if item.serial else []
+        archive_size = tar_size([member.size for member in item.members])
+        z = "z" if self.compress else ""
+
+        def on_progress(archive_bytes):
+            item.transferred = min(archive_bytes * item.size // archive_size, item.size)
+
+        for member in item.members:
+            member.state = ITEM_RUNNING
+            self.itemChanged.emit(member)
+
+        if self.direction == PUSH:
+            members = [(member.source, member.target[len(item.target):].lstrip("/")) for member in item.members]
+            # the archive is generated while adb reads it, nothing is staged on either side
+            item.job = self._cmd.run(
+                "adb", serial_args + ["shell", "tar", f"-x{z}f", "-", "-C", shell_quote(item.target)],
+                lambda code, output: self._on_item_done(item, code, output.text),
+                use_logger=False, serial=item.serial,
+                stdin=tar_chunks(members, self.compress, on_progress)
+            )
+            return
+
+        extractor = TarExtractor(item.target, self.compress, parent=self)
+        results = {}
+
+        def settle():
+            if "code" in results and "extract_error" in results:
+                self._on_bulk_pulled(item, results["code"], results["error"], results["extract_error"])
+
+        def on_finished(code, output):
+            results["code"], results["error"] = code, output.text
+            extractor.close()
+            settle()
+
+        def on_extracted(error):
+            # the process exit and the end of extraction can come in either order
+            results["extract_error"] = error
+            settle()
+
+        def on_stdout(data):
+            extractor.feed(data)
+            on_progress(extractor.received)
+
+        extractor.finished.connect(on_extracted)
+        names = [member.source[len(item.source):].lstrip("/") for member in item.members]
+        # the member list goes through stdin, one tar per batch of names keeps each command line short
+        lines = [f"cd {shell_quote(item.source)} || exit 1"]
+        for i in range(0, len(names), TAR_BATCH_SIZE):
+            lines.append(f"tar -c{z}f - -- " + " ".join(shell_quote(name) for name in names[i:i + TAR_BATCH_SIZE]))
+        item.job = self._cmd.run(
+            "adb", serial_args + ["shell", "su", "-c", "sh"], on_finished,
+            use_logger=False, serial=item.serial, keep_stdout=False, stdout_callback=on_stdout,
+            stdin=("\n".join(lines) + "\n").encode()
+        )
+
+    def _on_bulk_pulled(self, item: TransferItem, code: int, error: str, extract_error: str) -> None:
+        if code == 0 and extract_error:
+            code, error = 1, extract_error
+        self._on_item_done(item, code, error)
+
+    def _on_item_done(self, item: TransferItem, code: int, error: str) -> None:
+        self._running[item.serial] -= 1
+        item.job = None
+        item.finished_at = time.monotonic()
+        if code == 0:
+            item.state = ITEM_DONE
+            if item.size is None and self.direction == PULL and os.path.isfile(item.target):
+                item.size = os.path.getsize(item.target)
+            item.transferred = item.size or 0
+            item.error = ""
+        else:
+            item.error = error.strip().splitlines()[-1] if error.strip() else f"exit code {code}"
+            if self.cancelled:
+                item.state = ITEM_CANCELLED
+            elif item.attempts <= self.retries:
+                item.state = ITEM_PENDING
+                self._queues[item.serial].append(item)
+            else:
+                item.state = ITEM_FAILED
+                if self._cmd.logger:
+                    self._cmd.logger.error(f"adb {self.direction} {item.source} failed: {item.error}")
+        if item.members is not None:
+            self._settle_members(item)
+        else:
+            self.itemChanged.emit(item)
+        self._fill()
+
+    def _settle_members(self, item: TransferItem) -> None:
+        if item.state == ITEM_PENDING:
+            self.message.emit(f"重试 tar 传输：{item.source}（{item.error}）")
+        elif item.state == ITEM_FAILED:
+            self.message.emit(f"tar 传输失败：{item.source}\n{item.error}")
+        for member in item.members:
+            member.state, member.error = item.state, item.error
+            member.attempts = item.attempts
+            member.transferred = member.size if item.state == ITEM_DONE else 0
+            self.itemChanged.emit(member)
+
+    def _poll(self) -> None:
+        running = [item for item in self.items if item.state == ITEM_RUNNING and item.size and item.bulk is None]
+        if self.direction == PULL:
+            for item in running:
+                # adb writes the target in place, the native client through a .part file
+                for path in (item.target, item.target + ".part"):
+                    try:
+                        item.transferred = os.path.getsize(path)
+                        break
+                    except OSError:
+                        continue
+        else:
+            by_serial: dict[str | None, list[TransferItem]] = {}
+            for item in running:
+                by_serial.setdefault(item.serial, []).append(item)
+            for serial, items in by_serial.items():
+                self._poll_remote(serial, items)
+        self._sample()
+        self.progressChanged.emit()
+
+    def _poll_remote(self, serial, items: list[TransferItem]) -> None:
+        # one stat for every running push of a device per tick, and no new one while the last is out
+        if serial in self._polling:
+            return
+        self._polling.add(serial)
+        by_path = {item.target: item for item in items}
+
+        def on_stat(code, output):
+            self._polling.discard(serial)
+            for line in output.stdout.splitlines():
+                size, _, path = line.partition(" ")
+                item = by_path.get(path)
+                if item is not None and size.isdigit() and item.state == ITEM_RUNNING:
+                    item.transferred = int(size)
+
+        script = "stat -c '%s %n' " + " ".join(shell_quote(path) for path in by_path) + " 2>/dev/null"
+        self._cmd.run(
+            "adb", (["-s", serial] if serial else []) + ["shell", script], on_stat,
+            use_logger=False, serial=serial, use_session=True, cache_ttl=0, coalesce=False
+        )
+
+    def _sample(self) -> None:
+        now = time.monotonic()
+        self._samples.append((now, self.transferred))
+        while len(self._samples) > 2 and now - self._samples[0][0] > self.RATE_WINDOW:
+            self._samples.popleft()
+
+    @property
+    def total_size(self) -> int:
+        return sum(item.size or 0 for item in self.items)
+
+    @property
+    def transferred(self) -> int:
+        # files inside a running tar only count once it is done, until then the tar item carries their progress
+        return sum(item.transferred for item in self.items) + sum(
+            item.transferred for item in self._bulk_items if item.state == ITEM_RUNNING
+        )
+
+    @property
+    def rate(self) -> float:
+        if len(self._samples) < 2:
+            return 0.0
+        (start, start_bytes), (end, end_bytes) = self._samples[0], self._samples[-1]
+        return (end_bytes - start_bytes) / (end - start) if end > start else 0.0
+
+    @property
+    def eta(self) -> float | None:
+        rate = self.rate
+        if rate <= 0:
+            return None
+        return max(self.total_size - self.transferred, 0) / rate
+
+    def counts(self) -> dict[str, int]:
+        counts = {ITEM_PENDING: 0, ITEM_RUNNING: 0, ITEM_DONE: 0, ITEM_FAILED: 0, ITEM_CANCELLED: 0, ITEM_UNCHANGED: 0}
+        for item in self.items:
+            counts[item.state] += 1
+        return counts
+
+    def cancel(self) -> None:
+        if self.cancelled or not self.active:
+            return
+        self.cancelled = True
+        hash_jobs = [job for job in self._hash_jobs if not job.done]
+        if hash_jobs:
+            # the last one to report finishes the queue
+            for job in hash_jobs:
+                job.cancel()
+            return
+        if self._hasher is not None:
+            self._hasher.cancel()
+            self._hasher = None
+            # nothing was queued or started yet
+            self._finish()
+            return
+        for queue in self._queues.values():
+            while queue:
+                item = queue.popleft()
+                item.state = ITEM_CANCELLED
+                if item.members is not None:
+                    self._settle_members(item)
+                else:
+                    self.itemChanged.emit(item)
+        for item in self.items + self._bulk_items:
+            if item.job is not None:
+                item.job.cancel()
+        self._fill()
+
+    def _finish(self) -> None:
+        if self._finished_at is not None:
+            return
+        self._finished_at = time.monotonic()
+        self._timer.stop()
+        self.progressChanged.emit()
+        self.finished.emit(self.summary())
+
+    def summary(self) -> dict:
+        elapsed = ((self._finished_at or time.monotonic()) - self._started_at) if self._started_at else 0.0
+        transferred = sum(item.transferred for item in self.items if item.state == ITEM_DONE)
+        counts = self.counts()
+        return {
+            "total": len(self.items),
+            "done": counts[ITEM_DONE],
+            "unchanged": counts[ITEM_UNCHANGED],
+            "dry_run": self.dry_run,
+            "failed": counts[ITEM_FAILED],
+            "cancelled": counts[ITEM_CANCELLED] + (0 if self.dry_run else counts[ITEM_PENDING] + counts[ITEM_RUNNING]),
+            "skipped": self.skipped,
+            "retried": sum(item.attempts - 1 for item in self.items if item.attempts > 1),
+            "bytes": transferred,
+            "elapsed": elapsed,
+            "rate": transferred / elapsed if elapsed > 0 else 0.0,
+            "failures": [(item.serial, item.source, item.error) for item in self.items if item.state == ITEM_FAILED],
+        }
+
+
+def format_duration(seconds: float | None) -> str:
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    hours, seconds = divmod(seconds, 3600)
+    return (f"{hours}:" if hours else "") + f"{seconds // 60:02d}:{seconds % 60:02d}"
@@ -0,0 +1,54 @@
+import os
+import stat
+import sys
+import time
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "AndroidAssistant"))
+
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+# an adb stand-in that runs shell commands on the host, enough for Cmd, sessions and batches
+FAKE_ADB = """#!/bin/sh
+if [ "$1" = "-s" ]; then shift 2; fi
+if [ "$1" = "devices" ]; then printf 'List of devices attached\\nAAA\\tdevice\\n\\n'; exit 0; fi
+if [ "$1" = "push" ] || [ "$1" = "pull" ]; then cp -R "$2" "$3"; exit $?; fi
+if [ "$1" = "shell" ]; then shift; if [ $# -eq 0 ]; then exec sh; else exec sh -c "$*"; fi; fi
+echo "fake adb $*"
+"""
+# the host user stands in for root on the device
+FAKE_SU = """#!/bin/sh
+if [ "$1" = "-c" ]; then shift; exec sh -c "$*"; fi
+exec sh
+"""
+
+
+@pytest.fixture(scope="session", autouse=True)
+def qapp():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def fake_adb(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    adb = bin_dir / "adb"
+    adb.write_text(FAKE_ADB)
+    adb.chmod(adb.stat().st_mode | stat.S_IEXEC)
+    su = bin_dir / "su"
+    su.write_text(FAKE_SU)
+    su.chmod(su.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return adb
+
+
+def wait_until(predicate, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        QApplication.processEvents()
+        time.sleep(0.005)
+    return True
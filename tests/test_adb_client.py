@@ -0,0 +1,270 @@
+import os
+import socket
+import stat
+import struct
+import subprocess
+import threading
+
+import pytest
+
+from adb_client import AdbBackend, AdbClient, AdbError
+from cmd import Cmd, JOB_FINISHED, JOB_TIMEOUT
+from conftest import wait_until
+
+
+class FakeAdbServer:
+    # speaks enough of the adb server protocol for the client: host services, shell v1/v2 and sync
+    def __init__(self, root: str, serials=("AAA",), shell_v2: bool = True):
+        self.root = root
+        self.serials = serials
+        self.shell_v2 = shell_v2
+        self.services: list[str] = []
+        self.open_connections = 0
+        self._lock = threading.Lock()
+        self._listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self._listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def close(self) -> None:
+        self._listener.close()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _path(self, remote: str) -> str:
+        return os.path.join(self.root, remote.lstrip("/"))
+
+    def _serve(self, sock: socket.socket) -> None:
+        with self._lock:
+            self.open_connections += 1
+        try:
+            self._handle(sock)
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                self.open_connections -= 1
+            sock.close()
+
+    @staticmethod
+    def _recv(sock, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise OSError("closed")
+            data += chunk
+        return data
+
+    def _handle(self, sock: socket.socket) -> None:
+        while True:
+            service = self._recv(sock, int(self._recv(sock, 4), 16)).decode()
+            self.services.append(service)
+            if service == "host:version":
+                sock.sendall(b"OKAY0004" + b"0029")
+                return
+            if service == "host:devices":
+                text = "".join(f"{serial}\tdevice\n" for serial in self.serials).encode()
+                sock.sendall(b"OKAY" + b"%04x" % len(text) + text)
+                return
+            if service.startswith("host:transport:"):
+                if service.split(":", 2)[2] not in self.serials:
+                    sock.sendall(b"FAIL" + b"%04x" % 16 + b"device not found")
+                    return
+                sock.sendall(b"OKAY")
+                continue
+            if service == "host:transport-any":
+                sock.sendall(b"OKAY")
+                continue
+            if service.startswith("shell,v2,raw:"):
+                if not self.shell_v2:
+                    sock.sendall(b"FAIL" + b"%04x" % 6 + b"closed")
+                    return
+                sock.sendall(b"OKAY")
+                self._shell_v2(sock, service.split(":", 1)[1])
+                return
+            if service.startswith("shell:"):
+                sock.sendall(b"OKAY")
+                result = self._run(service.split(":", 1)[1])
+                sock.sendall(result.stdout + result.stderr)
+                return
+            if service == "sync:":
+                sock.sendall(b"OKAY")
+                self._sync(sock)
+                return
+            sock.sendall(b"FAIL" + b"%04x" % 7 + b"unknown")
+            return
+
+    @staticmethod
+    def _run(command: str) -> subprocess.CompletedProcess:
+        return subprocess.run(["sh", "-c", command], capture_output=True)
+
+    def _shell_v2(self, sock: socket.socket, command: str) -> None:
+        if command == "hang":
+            # never answers, only the client closing the socket ends this
+            while sock.recv(1024):
+                pass
+            return
+        result = self._run(command)
+        for packet_id, data in ((1, result.stdout), (2, result.stderr), (3, bytes([result.returncode]))):
+            if data:
+                sock.sendall(bytes([packet_id]) + struct.pack("<I", len(data)) + data)
+
+    def _sync(self, sock: socket.socket) -> None:
+        while True:
+            request_id = self._recv(sock, 4)
+            size = struct.unpack("<I", self._recv(sock, 4))[0]
+            arg = self._recv(sock, size)
+            if request_id == b"QUIT":
+                return
+            if request_id == b"STAT":
+                try:
+                    st = os.stat(self._path(arg.decode()))
+                    values = (st.st_mode, st.st_size, int(st.st_mtime))
+                except OSError:
+                    values = (0, 0, 0)
+                sock.sendall(b"STAT" + struct.pack("<III", *values))
+            elif request_id == b"LIST":
+                path = self._path(arg.decode())
+                for name in [".", ".."] + sorted(os.listdir(path)):
+                    st = os.stat(os.path.join(path, name))
+                    encoded = name.encode()
+                    sock.sendall(
+                        b"DENT" + struct.pack("<IIII", st.st_mode, st.st_size, int(st.st_mtime), len(encoded)) + encoded
+                    )
+                sock.sendall(b"DONE" + b"\0" * 16)
+            elif request_id == b"SEND":
+                remote, _, mode = arg.decode().rpartition(",")
+                data = b""
+                while True:
+                    chunk_id = self._recv(sock, 4)
+                    chunk_size = struct.unpack("<I", self._recv(sock, 4))[0]
+                    if chunk_id == b"DONE":
+                        break
+                    data += self._recv(sock, chunk_size)
+                with open(self._path(remote), "wb") as f:
+                    f.write(data)
+                os.chmod(self._path(remote), stat.S_IMODE(int(mode)))
+                sock.sendall(b"OKAY" + b"\0" * 4)
+            elif request_id == b"RECV":
+                try:
+                    with open(self._path(arg.decode()), "rb") as f:
+                        data = f.read()
+                except OSError as e:
+                    message = str(e).encode()
+                    sock.sendall(b"FAIL" + struct.pack("<I", len(message)) + message)
+                    continue
+                for start in range(0, len(data), 65536):
+                    chunk = data[start:start + 65536]
+                    sock.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                sock.sendall(b"DONE" + b"\0" * 4)
+
+
+@pytest.fixture
+def server(tmp_path):
+    device_root = tmp_path / "device"
+    device_root.mkdir()
+    server = FakeAdbServer(str(device_root))
+    yield server
+    server.close()
+
+
+def test_host_services(server):
+    client = AdbClient(port=server.port)
+    assert client.version() == 0x29
+    assert client.devices() == [["AAA", "device"]]
+
+
+def test_transport_to_unknown_device_fails(server):
+    client = AdbClient(port=server.port)
+    with pytest.raises(AdbError, match="device not found"):
+        client.shell("nope", "true")
+    assert client.shell("AAA", "true") == 0
+    assert "host:transport:AAA" in server.services
+
+
+def test_shell_v2(server):
+    client = AdbClient(port=server.port)
+    stdout, stderr = [], []
+    code = client.shell("AAA", "echo out; echo err >&2; exit 7", stdout.append, stderr.append)
+    assert code == 7 and b"".join(stdout) == b"out\n" and b"".join(stderr) == b"err\n"
+
+
+def test_shell_v1_fallback(server):
+    server.shell_v2 = False
+    client = AdbClient(port=server.port)
+    stdout = []
+    assert client.shell(None, "echo legacy; false", stdout.append) == 1
+    assert b"".join(stdout).strip() == b"legacy"
+    assert any(service.startswith("shell:") for service in server.services)
+
+
+def test_sync_stat_list_send_recv(server, tmp_path):
+    client = AdbClient(port=server.port)
+    local = tmp_path / "local.bin"
+    local.write_bytes(os.urandom(200000))
+    assert client.push("AAA", str(local), "/") == 200000
+    assert (tmp_path / "device" / "local.bin").read_bytes() == local.read_bytes()
+
+    with client.sync("AAA") as sync_conn:
+        mode, size, _ = sync_conn.stat("/local.bin")
+        assert stat.S_ISREG(mode) and size == 200000
+        assert sync_conn.stat("/missing")[0] == 0
+        assert [entry[0] for entry in sync_conn.list("/")] == ["local.bin"]
+
+    back = tmp_path / "back.bin"
+    assert client.pull("AAA", "/local.bin", str(back)) == 200000
+    assert back.read_bytes() == local.read_bytes()
+    with pytest.raises(AdbError, match="does not exist"):
+        client.pull("AAA", "/missing", str(back))
+    client.close()
+
+
+def test_sync_directories(server, tmp_path):
+    client = AdbClient(port=server.port)
+    (tmp_path / "device" / "tree" / "sub").mkdir(parents=True)
+    (tmp_path / "device" / "tree" / "a").write_bytes(b"a")
+    (tmp_path / "device" / "tree" / "sub" / "b").write_bytes(b"bb")
+    (tmp_path / "out").mkdir()
+    assert client.pull("AAA", "/tree", str(tmp_path / "out")) == 3
+    assert (tmp_path / "out" / "tree" / "sub" / "b").read_bytes() == b"bb"
+    client.close()
+
+
+def test_backend_job_and_cancel(server):
+    backend = AdbBackend(AdbClient(port=server.port), max_workers=1)
+    cmd = Cmd(backend=backend)
+    results = []
+    hung = cmd.run("adb", ["-s", "AAA", "shell", "hang"], lambda code, output: results.append(code), timeout=0.2)
+    assert wait_until(lambda: results)
+    assert hung.state == JOB_TIMEOUT and results == [-1]
+    assert wait_until(lambda: server.open_connections == 0)
+
+    # the only worker is free again
+    job = cmd.run(
+        "adb", ["-s", "AAA", "shell", "echo native"], lambda code, output: results.append(output.stdout)
+    )
+    assert wait_until(lambda: len(results) == 2)
+    assert job.state == JOB_FINISHED and results[1] == "native\n"
+    backend.shutdown()
+
+
+def test_backend_keeps_stderr_apart(server):
+    backend = AdbBackend(AdbClient(port=server.port), max_workers=1)
+    cmd = Cmd(backend=backend)
+    results = []
+
+    def on_done(code, output):
+        results.append((code, output.stdout, output.stderr))
+
+    cmd.run("adb", ["-s", "AAA", "shell", "echo out; echo err >&2; exit 2"], on_done, use_logger=False)
+    cmd.run("adb", ["-s", "nope", "shell", "true"], on_done, use_logger=False)
+    assert wait_until(lambda: len(results) == 2)
+    assert results[0] == (2, "out\n", "err\n")
+    assert results[1][0] == 1 and results[1][1] == "" and "device not found" in results[1][2]
+    backend.shutdown()
@@ -0,0 +1,42 @@
+import hashlib
+import os
+import threading
+
+from checksum import LocalHasher
+from conftest import wait_until
+
+
+def test_hashes_files_and_marks_unreadable_ones(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"f{i}"
+        path.write_bytes(bytes([i]) * (i * 1000))
+        paths.append(str(path))
+    missing = str(tmp_path / "missing")
+
+    hasher = LocalHasher(max_workers=2)
+    results, progress = [], []
+    hasher.finished.connect(results.append)
+    hasher.progress.connect(lambda done, total: progress.append((done, total)))
+    hasher.start(paths + [missing])
+    assert wait_until(lambda: results)
+    assert results[0] == {
+        **{path: hashlib.md5(open(path, "rb").read()).hexdigest() for path in paths},
+        missing: None,
+    }
+    assert progress[-1] == (6, 6)
+
+
+def test_cancel_drops_the_results(tmp_path):
+    # reading a fifo blocks until something is written, so the hash is still running when it is cancelled
+    fifo = str(tmp_path / "fifo")
+    os.mkfifo(fifo)
+    hasher = LocalHasher()
+    results = []
+    hasher.finished.connect(results.append)
+    hasher.start([fifo])
+    hasher.cancel()
+    writer = threading.Thread(target=lambda: open(fifo, "wb").write(b"x" * 10))
+    writer.start()
+    writer.join(5)
+    assert not wait_until(lambda: results, timeout=0.5)
@@ -0,0 +1,91 @@
+import io
+import json
+import stat
+
+import pytest
+
+import cli
+from cli import EXIT_FAILED, EXIT_NO_DEVICE, EXIT_OK, EXIT_USAGE, Reporter, main, read_items
+from cmd import Cmd
+
+
+def records(text: str) -> list[dict]:
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def add_program(fake_adb, name: str, script: str) -> None:
+    program = fake_adb.parent / name
+    program.write_text("#!/bin/sh\n" + script)
+    program.chmod(program.stat().st_mode | stat.S_IEXEC)
+
+
+def test_read_items_from_files_stdin_and_directories(tmp_path, monkeypatch):
+    listing = tmp_path / "packages.txt"
+    listing.write_text("# comment\ncom.a\n\n  com.b  \ncom.a\n", encoding="utf-8")
+    monkeypatch.setattr("sys.stdin", io.StringIO("com.c\ncom.b\n"))
+    assert read_items([f"@{listing}", "-", "com.d"]) == ["com.a", "com.b", "com.c", "com.d"]
+
+    apks = tmp_path / "apks"
+    (apks / "sub").mkdir(parents=True)
+    for name in ("b.apk", "a.APK", "notes.txt", "sub/c.apk"):
+        (apks / name).write_bytes(b"")
+    assert read_items([str(apks)], apk_only=True) == [str(apks / "a.APK"), str(apks / "b.apk"), str(apks / "sub/c.apk")]
+    # without apk_only a directory is just another item
+    assert read_items([str(apks)]) == [str(apks)]
+
+
+def test_reporter_writes_one_json_object_per_result():
+    stream = io.StringIO()
+    reporter = Reporter("uninstall", jsonl=True, stream=stream)
+    reporter.item("AAA", "com.a", 0, "Success\n")
+    reporter.item("AAA", "com.b", 1, "Failure [DELETE_FAILED_INTERNAL_ERROR]")
+    assert reporter.summary() == EXIT_FAILED
+    assert records(stream.getvalue()) == [
+        {"op": "uninstall", "serial": "AAA", "item": "com.a", "ok": True, "code": 0, "output": "Success"},
+        {
+            "op": "uninstall", "serial": "AAA", "item": "com.b", "ok": False, "code": 1,
+            "output": "Failure [DELETE_FAILED_INTERNAL_ERROR]"
+        },
+        {"op": "uninstall", "summary": True, "total": 2, "succeeded": 1, "failed": 1, "exit_code": EXIT_FAILED},
+    ]
+
+
+def test_usage_error_exits_2(capsys):
+    with pytest.raises(SystemExit) as info:
+        main(["uninstall"])
+    assert info.value.code == EXIT_USAGE
+
+
+def test_devices_exit_0(fake_adb, capsys):
+    assert main(["--jsonl", "devices"]) == EXIT_OK
+    assert records(capsys.readouterr().out) == [{"op": "devices", "serial": "AAA", "state": "device", "attrs": {}}]
+
+
+def test_no_online_device_exits_3(fake_adb, capsys):
+    add_program(fake_adb, "adb", "printf 'List of devices attached\\nAAA\\toffline\\n\\n'\n")
+    assert main(["--all-devices", "uninstall", "com.a"]) == EXIT_NO_DEVICE
+    assert "no online device" in capsys.readouterr().err
+
+
+def test_force_stop_fails_without_am(fake_adb, capsys):
+    # the fake adb runs shell commands on the host, which has no am
+    assert main(["--jsonl", "force-stop", "com.a", "com.b"]) == EXIT_FAILED
+    results = records(capsys.readouterr().out)
+    assert [(result.get("item"), result.get("ok")) for result in results[:-1]] == [("com.a", False), ("com.b", False)]
+    assert results[-1]["failed"] == 2 and results[-1]["exit_code"] == EXIT_FAILED
+
+
+def test_exits_when_the_batch_shell_is_done(fake_adb, capsys, monkeypatch):
+    add_program(fake_adb, "am", "echo stopped \"$2\"\n")
+    left = []
+
+    class RecordingCmd(Cmd):
+        def cancel_all(self, include_streams: bool = True):
+            left.append((self.running_count(), self.pending_count()))
+            super().cancel_all(include_streams)
+
+    monkeypatch.setattr(cli, "Cmd", RecordingCmd)
+    assert main(["-s", "AAA", "force-stop", "com.a", "com.b"]) == EXIT_OK
+    assert capsys.readouterr().out == "OK [AAA] com.a\nOK [AAA] com.b\n"
+    # results arrive before the shell exits, nothing is left to cancel when main returns
+    assert left[0] == (0, 0)
@@ -0,0 +1,206 @@
+from cmd import Cmd, JOB_CANCELLED, JOB_FINISHED, JOB_TIMEOUT
+from conftest import wait_until
+
+
+def sh(cmd: Cmd, script: str, results: list, name=None, **kwargs):
+    return cmd.run(
+        "sh", ["-c", script], lambda code, output: results.append((name, code, output.stdout)),
+        use_logger=False, **kwargs
+    )
+
+
+def test_limits_and_priorities():
+    cmd = Cmd(max_running=1, max_running_per_serial=1)
+    results = []
+    first = sh(cmd, "sleep 0.2", results, "first")
+    for name, priority in (("low", -10), ("normal", 0), ("high", 10)):
+        sh(cmd, "true", results, name, priority=priority)
+    assert cmd.running_count() == 1 and cmd.pending_count() == 3
+    assert first.state == "running"
+    assert wait_until(lambda: len(results) == 4)
+    assert [name for name, _, _ in results] == ["first", "high", "normal", "low"]
+    assert cmd.stats()["max_wait"] > 0
+
+
+def test_per_serial_limit():
+    cmd = Cmd(max_running=4, max_running_per_serial=1)
+    results = []
+    for serial in ("A", "A", "B"):
+        sh(cmd, "sleep 0.2", results, serial, serial=serial)
+    assert cmd.running_count() == 2
+    assert cmd.stats()["pending_per_device"] == {("sh", "A"): 1}
+    cmd.set_limits(max_running_per_serial=2)
+    assert cmd.running_count() == 3
+    assert wait_until(lambda: len(results) == 3)
+
+
+def test_output_and_exit_code():
+    cmd = Cmd()
+    results = []
+    job = sh(cmd, "echo out; echo err >&2; exit 3", results)
+    assert wait_until(lambda: results)
+    assert results[0][1:] == (3, "out\n")
+    assert job.state == JOB_FINISHED and job.code == 3
+
+
+def test_cancel_pending_and_running():
+    cmd = Cmd(max_running=1)
+    results = []
+    running = sh(cmd, "sleep 5", results, "running")
+    pending = sh(cmd, "true", results, "pending")
+    assert pending.cancel()
+    assert pending.state == JOB_CANCELLED and results[0][:2] == ("pending", -1)
+    assert running.cancel()
+    assert wait_until(lambda: len(results) == 2)
+    assert running.state == JOB_CANCELLED and results[1][:2] == ("running", -1)
+    assert not running.cancel()
+
+
+def test_timeout():
+    cmd = Cmd()
+    results = []
+    job = sh(cmd, "sleep 5", results, timeout=0.1)
+    assert wait_until(lambda: results)
+    assert job.state == JOB_TIMEOUT and results[0][1] == -1
+
+
+def test_coalescing_shares_one_process():
+    cmd = Cmd()
+    results = []
+    leader = sh(cmd, "sleep 0.1; echo once", results, "a", coalesce=True)
+    follower = sh(cmd, "sleep 0.1; echo once", results, "b", coalesce=True)
+    assert cmd.running_count() == 1 and follower.leader is leader
+    assert wait_until(lambda: len(results) == 2)
+    assert [output for _, _, output in results] == ["once\n", "once\n"]
+    assert cmd.stats()["coalesced"] == 1
+
+
+def test_cancelling_a_follower_keeps_the_leader():
+    cmd = Cmd()
+    results = []
+    leader = sh(cmd, "sleep 0.1", results, "a", coalesce=True)
+    follower = sh(cmd, "sleep 0.1", results, "b", coalesce=True)
+    follower.cancel()
+    assert wait_until(lambda: len(results) == 2)
+    assert leader.state == JOB_FINISHED and follower.state == JOB_CANCELLED
+
+
+def test_cached_result():
+    cmd = Cmd()
+    results = []
+    sh(cmd, "echo $$", results, cache_ttl=60)
+    assert wait_until(lambda: results)
+    job = sh(cmd, "echo $$", results, cache_ttl=60)
+    assert wait_until(lambda: len(results) == 2)
+    assert job.cached and results[0][2] == results[1][2]
+
+
+def test_cancelled_pending_leader_hands_over_to_follower():
+    cmd = Cmd(max_running=1)
+    results = []
+    sh(cmd, "sleep 0.1", results, "blocker")
+    leader = sh(cmd, "echo shared", results, "leader", coalesce=True)
+    followers = [sh(cmd, "echo shared", results, name, coalesce=True) for name in ("f1", "f2")]
+    assert leader.cancel()
+    assert followers[0].leader is None and followers[1].leader is followers[0]
+    assert wait_until(lambda: len(results) == 4)
+    outcome = {name: (code, output) for name, code, output in results}
+    assert outcome["leader"][0] == -1 and leader.state == JOB_CANCELLED
+    assert outcome["f1"] == outcome["f2"] == (0, "shared\n")
+    assert all(follower.state == JOB_FINISHED for follower in followers)
+
+
+def test_timed_out_running_leader_hands_over_to_follower():
+    cmd = Cmd()
+    results = []
+    leader = sh(cmd, "sleep 0.3; echo late", results, "leader", coalesce=True, timeout=0.1)
+    follower = sh(cmd, "sleep 0.3; echo late", results, "follower", coalesce=True)
+    assert wait_until(lambda: len(results) == 2)
+    assert leader.state == JOB_TIMEOUT and results[0][:2] == ("leader", -1)
+    assert follower.state == JOB_FINISHED and results[1] == ("follower", 0, "late\n")
+
+
+def test_generated_stdin_is_fed_and_released():
+    cmd = Cmd()
+    results = []
+    closed = []
+
+    def chunks(count):
+        try:
+            for _ in range(count):
+                yield b"x" * 65536
+        finally:
+            closed.append(count)
+
+    cmd.run(
+        "sh", ["-c", "wc -c"], lambda code, output: results.append((code, output)),
+        use_logger=False, stdin=chunks(4)
+    )
+    cmd.run(
+        "sh", ["-c", "exit 3"], lambda code, output: results.append((code, output)),
+        use_logger=False, stdin=chunks(10 ** 6)
+    )
+    assert wait_until(lambda: len(results) == 2)
+    outcome = {output.stdout.strip() or "early": (code, output.stderr) for code, output in results}
+    assert outcome["262144"] == (0, "")
+    assert outcome["early"][0] == 3 and "stdin was abandoned" in outcome["early"][1]
+    assert sorted(closed) == [4, 10 ** 6]
+
+
+def test_cancelled_job_releases_its_stdin():
+    cmd = Cmd(max_running=1)
+    results = []
+    closed = []
+
+    def endless():
+        try:
+            while True:
+                yield b"x" * 65536
+        finally:
+            closed.append(True)
+
+    running = cmd.run(
+        "sh", ["-c", "sleep 5"], lambda code, output: results.append(code), use_logger=False, stdin=endless()
+    )
+    pending = cmd.run(
+        "sh", ["-c", "cat"], lambda code, output: results.append(code), use_logger=False, stdin=endless()
+    )
+    pending.cancel()
+    running.cancel()
+    assert wait_until(lambda: len(results) == 2)
+    # the pending generator never started, it holds nothing but is dropped all the same
+    assert results == [-1, -1] and closed == [True]
+    assert running.stdin is None and pending.stdin is None
+
+
+def test_unkept_stdout_is_forwarded_and_scheduled():
+    cmd = Cmd(max_running=1)
+    results = []
+    chunks = []
+    first = cmd.run(
+        "sh", ["-c", "head -c 300000 /dev/zero"], lambda code, output: results.append((code, output.stdout)),
+        use_logger=False, keep_stdout=False, stdout_callback=chunks.append
+    )
+    second = sh(cmd, "echo kept", results)
+    assert first.state == "running" and second.state == "pending" and cmd.running_count() == 1
+    assert wait_until(lambda: len(results) == 2)
+    assert results[0] == (0, "") and sum(len(chunk) for chunk in chunks) == 300000
+    assert results[1] == (None, 0, "kept\n")
+
+
+def test_identical_reads_share_a_process_without_a_cache(fake_adb):
+    cmd = Cmd()
+    results = []
+
+    def run(*args):
+        cmd.run("adb", list(args), lambda code, output: results.append((args[1], output.stdout)), use_logger=False)
+
+    for _ in range(3):
+        run("shell", "ls", "/")
+    # may have side effects, each one runs
+    for _ in range(2):
+        run("shell", "echo $$")
+    assert wait_until(lambda: len(results) == 5)
+    assert cmd.stats()["coalesced"] == 2
+    assert len({output for command, output in results if command == "ls"}) == 1
+    assert len({output for command, output in results if command != "ls"}) == 2
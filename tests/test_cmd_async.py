@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from cmd import Cmd, JOB_CANCELLED
+from cmd_async import AsyncCmd, CmdError, gather_with_limit, run_until_complete
+from conftest import wait_until
+
+
+def test_run_and_shell(fake_adb):
+    a = AsyncCmd(Cmd(use_logger=False))
+
+    async def main():
+        return await a.run("sh", ["-c", "echo out; echo err >&2; exit 3"]), await a.shell("echo hi", serial="AAA")
+
+    result, shell_result = run_until_complete(main())
+    assert (result.code, result.stdout, result.stderr, result.ok) == (3, "out\n", "err\n", False)
+    assert shell_result.ok and shell_result.stdout == "hi\n" and shell_result.serial == "AAA"
+
+
+def test_check_raises_on_a_non_zero_exit(fake_adb):
+    a = AsyncCmd(Cmd(use_logger=False))
+
+    async def main():
+        await a.shell("echo broken; exit 4", check=True, use_session=False)
+
+    with pytest.raises(CmdError) as info:
+        run_until_complete(main())
+    assert info.value.result.code == 4 and "exited with code 4: broken" in str(info.value)
+
+
+def test_cancelling_the_task_cancels_the_job(fake_adb):
+    cmd = Cmd(use_logger=False)
+    a = AsyncCmd(cmd)
+
+    async def main():
+        task = asyncio.ensure_future(a.run("sh", ["-c", "sleep 5"]))
+        while not cmd.running_count():
+            await asyncio.sleep(0.01)
+        job = cmd.jobs()[0]
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return job
+
+    job = run_until_complete(main())
+    assert job.state == JOB_CANCELLED
+    assert wait_until(lambda: cmd.running_count() == 0)
+
+
+def test_run_batch_keys_results(fake_adb):
+    a = AsyncCmd(Cmd(use_logger=False))
+
+    async def main(check):
+        return await a.run_batch([("a", "echo a"), ("b", "echo b >&2; exit 2")], check=check)
+
+    results = run_until_complete(main(False))
+    assert (results["a"].code, results["a"].stdout) == (0, "a\n")
+    assert results["b"].code == 2 and results["b"].cmd_str.endswith("[b]")
+    with pytest.raises(CmdError):
+        run_until_complete(main(True))
+
+
+def test_fan_out_runs_once_per_device(fake_adb):
+    a = AsyncCmd(Cmd(use_logger=False))
+
+    async def main():
+        return await a.fan_out(["AAA", "BBB", "AAA"], ["shell", "echo hi"], limit=1)
+
+    results = run_until_complete(main())
+    assert list(results) == ["AAA", "BBB"]
+    assert all(result.ok and result.stdout == "hi\n" for result in results.values())
+    assert results["BBB"].job.program_args[:2] == ["-s", "BBB"]
+
+
+def test_gather_with_limit_caps_concurrency():
+    running, most = 0, 0
+
+    async def work(i):
+        nonlocal running, most
+        running += 1
+        most = max(most, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return i
+
+    async def main():
+        return await gather_with_limit(2, *(work(i) for i in range(6)))
+
+    assert run_until_complete(main()) == list(range(6))
+    assert most == 2
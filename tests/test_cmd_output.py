@@ -0,0 +1,37 @@
+import os
+
+import cmd_output
+from cmd_output import CmdOutput, STDERR, STDOUT
+
+
+def test_text_keeps_arrival_order():
+    output = CmdOutput()
+    for channel, data in ((STDOUT, b"a"), (STDOUT, b"b"), (STDERR, b"!"), (STDOUT, "é".encode()[:1]),
+                          (STDOUT, "é".encode()[1:])):
+        output.append(channel, data)
+    assert output.stdout == "abé" and output.stderr == "!"
+    assert output.text == "ab!é"
+    assert len(output) == 5 and output.ordered
+
+
+def test_interleaving_is_capped(monkeypatch):
+    monkeypatch.setattr(cmd_output, "MAX_RUNS", 4)
+    output = CmdOutput()
+    for i in range(10):
+        output.append(STDOUT if i % 2 == 0 else STDERR, str(i).encode())
+    assert not output.ordered
+    assert output.text == "02468" + "13579"
+
+
+def test_spill_to_file():
+    output = CmdOutput(spill_threshold=100, keep_bytes=10)
+    data = bytes(range(256)) * 4
+    output.append(STDOUT, data[:50])
+    assert not output.spilled
+    output.append(STDOUT, data[50:])
+    path = output.path(STDOUT)
+    assert output.spilled and os.path.exists(path)
+    assert output.stdout_bytes == data and output.size(STDOUT) == len(data)
+    assert output.tail_text(STDOUT) == data[-10:].decode(errors="replace")
+    output.close()
+    assert not os.path.exists(path)
@@ -0,0 +1,65 @@
+from device_snapshot import DeviceSnapshot, parse_dir_stat_lines
+
+TREE = (
+    "41f9 4096 100 /sdcard\n"
+    "41f9 4096 101 /sdcard/DCIM\n"
+    "81a4 10 102 /sdcard/DCIM/a.jpg\n"
+    "81a4 20 103 /sdcard/DCIM/b.jpg\n"
+    "41f9 4096 104 /sdcard/Music\n"
+    "81a4 30 105 /sdcard/Music/Song.mp3\n"
+    "81a4 40 106 /other/outside\n"
+)
+
+
+def load() -> DeviceSnapshot:
+    snapshot = DeviceSnapshot("/sdcard/")
+    assert snapshot.load(TREE) == 6
+    return snapshot
+
+
+def test_load_and_listing():
+    snapshot = load()
+    assert len(snapshot) == 6
+    assert snapshot.covers("/sdcard/DCIM") and not snapshot.covers("/sdcardx")
+    assert sorted(entry.name for entry in snapshot.listing("/sdcard")) == ["DCIM", "Music"]
+    files = {entry.name: entry for entry in snapshot.listing("/sdcard/DCIM/")}
+    assert files["b.jpg"].size == 20 and files["b.jpg"].mtime == 103
+    assert snapshot.listing("/sdcard/missing") == []
+
+
+def test_search():
+    snapshot = load()
+    found = [snapshot.path(entry_id) for entry_id in snapshot.search("JPG")]
+    assert found == ["/sdcard/DCIM/a.jpg", "/sdcard/DCIM/b.jpg"]
+    assert [snapshot.path(entry_id) for entry_id in snapshot.search("song")] == ["/sdcard/Music/Song.mp3"]
+    assert snapshot.search("") == []
+
+
+def test_refresh_applies_changed_directories():
+    snapshot = load()
+    dir_mtimes = parse_dir_stat_lines("100 /sdcard\n201 /sdcard/DCIM\n104 /sdcard/Music\n300 /sdcard/New\n")
+    changed, new_roots = snapshot.changed_dirs(dir_mtimes)
+    assert changed == ["/sdcard/DCIM"] and new_roots == ["/sdcard/New"]
+
+    snapshot.apply_changes(changed, dir_mtimes, (
+        "81a4 11 202 /sdcard/DCIM/a.jpg\n"
+        "81a4 50 203 /sdcard/DCIM/c.jpg\n"
+        "41f9 4096 300 /sdcard/New\n"
+        "81a4 60 301 /sdcard/New/x\n"
+    ))
+    dcim = {entry.name: entry.size for entry in snapshot.listing("/sdcard/DCIM")}
+    assert dcim == {"a.jpg": 11, "c.jpg": 50}
+    assert [entry.name for entry in snapshot.listing("/sdcard/New")] == ["x"]
+    assert snapshot.search("b.jpg") == []
+    assert not snapshot.changed_dirs(dir_mtimes)[0]
+
+
+def test_file_replacing_a_directory_drops_its_children():
+    snapshot = load()
+    snapshot.apply_changes(["/sdcard"], {"/sdcard": 999}, (
+        "81a4 1 999 /sdcard/DCIM\n"
+        "41f9 4096 104 /sdcard/Music\n"
+    ))
+    assert snapshot.listing("/sdcard/DCIM") == []
+    assert len(snapshot) == 4
+    assert not snapshot.search("a.jpg")
@@ -0,0 +1,77 @@
+import os
+import random
+
+from PySide6.QtCore import Qt
+
+from conftest import wait_until
+from file_model import DirScanner, FileEntry, FileListModel
+
+
+def make_entries(count: int) -> list[FileEntry]:
+    rng = random.Random(count)
+    return [
+        FileEntry(f"{rng.randrange(1000):03d}-{i}", i % 5 == 0, size=rng.randrange(100), mtime=i)
+        for i in range(count)
+    ]
+
+
+def names(model: FileListModel) -> list[str]:
+    return [entry.name for entry in model.entries()]
+
+
+def test_chunks_merge_into_sorted_order():
+    entries = make_entries(3000)
+    for column, order in (
+            (FileListModel.NAME, Qt.SortOrder.AscendingOrder),
+            (FileListModel.SIZE, Qt.SortOrder.DescendingOrder),
+    ):
+        expected = FileListModel()
+        expected.sort(column, order)
+        expected.set_entries(entries)
+
+        model = FileListModel()
+        model.sort(column, order)
+        model.set_entries([])
+        # a big first chunk, then chunks small enough to be placed one by one
+        model.add_entries(entries[:1000])
+        for start in range(1000, len(entries), 37):
+            model.add_entries(entries[start:start + 37])
+        assert names(model) == names(expected)
+
+
+def test_dirs_only_skips_files():
+    model = FileListModel()
+    model.set_entries([], dirs_only=True)
+    model.add_entries(make_entries(50))
+    assert model.total == 10 and all(entry.is_dir for entry in model.entries())
+    assert names(model)[0] < names(model)[-1]
+
+
+def test_scan_lists_names_before_sizes(qapp, tmp_path):
+    os.mkdir(tmp_path / "dir")
+    for i in range(3):
+        (tmp_path / f"file{i}").write_bytes(b"x" * i)
+    os.symlink("file2", tmp_path / "link")
+    scanner = DirScanner()
+    events = []
+    scanner.chunkReady.connect(lambda scan_id, entries, done, error: events.append(("names", entries, done)))
+    scanner.detailsReady.connect(lambda scan_id, entries: events.append(("details", entries, True)))
+    scanner.scan(str(tmp_path))
+    assert wait_until(lambda: [kind for kind, _, _ in events] == ["names", "details"])
+
+    (_, listed, done), (_, details, _) = events
+    assert done and {entry.name: entry.is_dir for entry in listed} == {
+        "dir": True, "file0": False, "file1": False, "file2": False, "link": False
+    }
+    assert all(entry.size is None and entry.mtime is None for entry in listed)
+
+    model = FileListModel()
+    model.sort(FileListModel.SIZE, Qt.SortOrder.DescendingOrder)
+    model.set_entries([])
+    model.add_entries(listed)
+    tracked = model.entry(model.rowCount() - 1)
+    model.update_entries(details)
+    by_name = {entry.name: entry for entry in model.entries()}
+    assert by_name["file1"].size == 1 and by_name["dir"].size is None and by_name["link"].link == "file2"
+    assert names(model)[0] == "dir" and names(model)[-2:] == ["file1", "file0"]
+    assert by_name[tracked.name] is tracked
@@ -0,0 +1,51 @@
+from cmd import Cmd, JOB_CANCELLED, JOB_RUNNING
+from conftest import wait_until
+from jobs_widget import JobsWidget
+
+
+def table_ids(widget: JobsWidget) -> list[int]:
+    return [int(widget.table.item(row, 0).text()) for row in range(widget.table.rowCount())]
+
+
+def test_rows_follow_the_queue_and_keep_the_selection():
+    cmd = Cmd(max_running=1)
+    widget = JobsWidget(cmd)
+    widget.show()
+    refreshes = []
+    original = widget.refresh
+    widget.refresh = lambda: (refreshes.append(1), original())
+    widget._pending_refresh.timeout.disconnect()
+    widget._pending_refresh.timeout.connect(widget.refresh)
+
+    blocker = cmd.run("sh", ["-c", "sleep 5"], use_logger=False)
+    jobs = [cmd.run("sh", ["-c", "true"], use_logger=False) for _ in range(200)]
+    assert wait_until(lambda: refreshes)
+    # two hundred queue changes, one refresh
+    assert len(refreshes) == 1
+    assert table_ids(widget) == [blocker.id] + [job.id for job in jobs]
+
+    widget.table.selectRow(3)
+    selected = jobs[2]
+    for job in jobs[:2]:
+        job.cancel()
+    widget.refresh()
+    assert table_ids(widget)[:2] == [blocker.id, selected.id]
+    assert [index.row() for index in widget.table.selectionModel().selectedRows()] == [1]
+    assert widget.table.item(0, 1).text() == JobsWidget.STATE_TEXTS[JOB_RUNNING]
+
+    widget.cancel_all()
+    assert wait_until(lambda: not cmd.jobs())
+    widget.refresh()
+    assert widget.table.rowCount() == 0
+    widget.close()
+
+
+def test_cancel_all_leaves_streams_running():
+    cmd = Cmd()
+    widget = JobsWidget(cmd)
+    stream = cmd.run("sh", ["-c", "sleep 5"], use_logger=False, stream=True)
+    job = cmd.run("sh", ["-c", "sleep 5"], use_logger=False)
+    widget.cancel_all()
+    assert job.state == JOB_CANCELLED and stream.state == JOB_RUNNING
+    stream.cancel()
+    assert wait_until(lambda: not cmd.jobs())
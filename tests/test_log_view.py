@@ -0,0 +1,49 @@
+from log_record import LogRecord
+from log_view import LogModel
+
+
+def fill(model: LogModel, count: int, start: int = 0) -> None:
+    model.append_records([
+        LogRecord("ERROR" if i % 7 == 0 else "INFO", f"line {i}", tag=f"[t{i % 3}]")
+        for i in range(start, start + count)
+    ])
+
+
+def test_filters_by_level_tag_and_query():
+    model = LogModel(capacity=100)
+    fill(model, 50)
+    model.set_filter(level="ERROR", tag="t0")
+    assert [record.text for record in model.records()] == ["line 0", "line 21", "line 42"]
+    model.set_filter(query="LINE 4")
+    assert model.rowCount() == 0
+    model.set_filter(query="line 4")
+    assert model.rowCount() == 11
+    model.set_filter()
+    assert not model.filtered and model.rowCount() == 50
+
+
+def test_chunked_search_matches_plain_filter():
+    model = LogModel(capacity=1000)
+    model.SEARCH_CHUNK_SIZE = 64
+    fill(model, 1000)
+    fill(model, 500, start=1000)
+    model.set_filter(query="line 12")
+    expected = [f"line {i}" for i in range(500, 1500) if f"line {i}".startswith("line 12")]
+    assert [record.text for record in model.records()] == expected
+    assert all(chunk.first_seq >= 500 for chunk in model._search_chunks.values())
+
+
+def test_shrinking_capacity_prunes_search_chunks():
+    model = LogModel(capacity=1000)
+    model.SEARCH_CHUNK_SIZE = 64
+    fill(model, 1000)
+    model.set_filter(query="line")
+    full = model.search_cache_size
+    assert full > 0
+
+    model.set_capacity(100)
+    assert model.total == 100 and model.rowCount() == 100
+    assert all(chunk.first_seq >= 900 for chunk in model._search_chunks.values())
+    assert model.search_cache_size < full / 5
+    model.set_filter(query="line 95")
+    assert [record.text for record in model.records()] == [f"line {i}" for i in range(950, 960)]
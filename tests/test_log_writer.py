@@ -0,0 +1,56 @@
+import os
+import time
+
+from conftest import wait_until
+from log_writer import LogFileWriter
+
+
+def test_lines_are_written_and_rotated_by_size(tmp_path):
+    path = str(tmp_path / "app.log")
+    writer = LogFileWriter(path, max_bytes=100, backup_count=2, flush_interval=0.01, flush_bytes=1)
+    for i in range(30):
+        writer.write(f"line {i:02d} " + "x" * 20)
+        time.sleep(0.002)
+    writer.close()
+    assert writer.written == 30 and writer.rotations >= 2
+    assert os.path.exists(path + ".1") and os.path.exists(path + ".2") and not os.path.exists(path + ".3")
+    with open(path) as f:
+        assert f.read().splitlines()[-1].startswith("line 29")
+
+
+def test_age_counts_from_the_first_record_across_restarts(tmp_path):
+    path = tmp_path / "app.log"
+    old = time.time() - 7200
+    path.write_text(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(old)) + " INFO old\n")
+    writer = LogFileWriter(str(path), max_age=3600, flush_interval=0.01)
+    writer.write("new")
+    writer.write("newer")
+    writer.close()
+    assert writer.rotations == 1
+    assert path.read_text() == "new\nnewer\n"
+    assert "old" in (tmp_path / "app.log.1").read_text()
+
+
+def test_age_falls_back_to_mtime(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text("no timestamp here\n")
+    os.utime(path, (time.time() - 7200, time.time() - 7200))
+    writer = LogFileWriter(str(path), max_age=3600, flush_interval=0.01)
+    writer.write("new")
+    writer.close()
+    assert writer.rotations == 1
+
+
+def test_write_failures_are_reported_once(tmp_path):
+    errors = []
+    writer = LogFileWriter(str(tmp_path / "missing" / "app.log"), flush_interval=0.01, on_error=errors.append)
+    for i in range(3):
+        writer.write(f"line {i}")
+        time.sleep(0.05)
+    assert wait_until(lambda: writer.failed >= 3)
+    (tmp_path / "missing").mkdir()
+    writer.write("recovered")
+    writer.close()
+    assert len(errors) == 1 and writer.last_error
+    lines = (tmp_path / "missing" / "app.log").read_text().splitlines()
+    assert lines[0].endswith("lines lost to write errors") and lines[-1] == "recovered"
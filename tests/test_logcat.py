@@ -0,0 +1,67 @@
+import struct
+
+from logcat import LogcatBinaryParser, LogcatBuffer, LogcatColumns, LogcatLongParser
+
+
+def binary_entry(pid, tid, sec, nsec, level, tag, message, hdr_size=24):
+    payload = bytes([level]) + tag.encode() + b"\0" + message.encode() + b"\0"
+    header = struct.pack("<HHiIII", len(payload), hdr_size, pid, tid, sec, nsec)
+    return header + b"\0" * (hdr_size - len(header)) + payload
+
+
+def test_binary_parser_handles_split_entries_and_header_sizes():
+    data = (
+        binary_entry(10, 11, 1700000000, 500000000, 4, "ActivityManager", "Start proc")
+        + binary_entry(20, 21, 1700000001, 0, 6, "crash", "boom\n", hdr_size=28)
+        + binary_entry(30, 31, 1700000002, 0, 3, "old", "v1 header", hdr_size=0)
+    )
+    parser, columns = LogcatBinaryParser(), LogcatColumns()
+    for i in range(0, len(data), 7):
+        parser.feed(data[i:i + 7], columns)
+    assert len(columns) == 3
+    assert columns.tags == ["ActivityManager", "crash", "old"]
+    assert columns.messages == ["Start proc", "boom", "v1 header"]
+    assert columns.levels == [4, 6, 3] and columns.pids == [10, 20, 30]
+    assert columns.times[0] == 1700000000.5
+    assert parser.errors == 0
+
+
+def test_binary_parser_stops_on_lost_framing():
+    parser, columns = LogcatBinaryParser(), LogcatColumns()
+    parser.feed(struct.pack("<HHiIII", 10, 999, 1, 1, 1, 1) + b"x" * 40, columns)
+    assert len(columns) == 0 and parser.errors == 1
+
+
+def test_long_parser():
+    text = (
+        "--------- beginning of main\n"
+        "[ 01-02 03:04:05.678  123:  456 W/Tag Name ]\n"
+        "first line\n"
+        "second line\n"
+        "\n"
+        "[ 01-02 03:04:06.000 u0_a1:  123:  457 E/Other ]\n"
+        "oops\n"
+        "\n"
+    )
+    parser, columns = LogcatLongParser(), LogcatColumns()
+    data = text.encode()
+    for i in range(0, len(data), 5):
+        parser.feed(data[i:i + 5], columns)
+    assert columns.tags == ["Tag Name", "Other"]
+    assert columns.messages == ["first line\nsecond line", "oops"]
+    assert columns.levels == [5, 6] and columns.tids == [456, 457]
+    assert round(columns.times[1] - columns.times[0], 3) == 0.322
+
+
+def test_buffer_wraps_around():
+    buffer = LogcatBuffer(4)
+    for batch in (range(3), range(3, 6)):
+        columns = LogcatColumns()
+        for i in batch:
+            columns.append(float(i), i, i, 4, f"t{i % 2}", str(i))
+        buffer.extend(columns)
+    assert len(buffer) == 4 and buffer.dropped == 2
+    assert [buffer.messages[buffer.index(row)] for row in range(4)] == ["2", "3", "4", "5"]
+    assert buffer.tags == ["t0", "t1"]
+    buffer.clear()
+    assert len(buffer) == 0
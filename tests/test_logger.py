@@ -0,0 +1,34 @@
+from log_view import LogView
+from logger import Logger
+
+
+def make_logger(**kwargs) -> Logger:
+    return Logger(LogView(), rate_limit=None, collapse_repeats=False, **kwargs)
+
+
+def test_backlog_is_bounded_and_drops_are_counted():
+    logger = make_logger(capacity=5, max_lines_per_flush=3)
+    for i in range(12):
+        logger.info(f"line {i}")
+    assert len(logger._pending) == 5
+    assert logger.stats()["pending_dropped"] == 7
+
+    logger.flush()
+    texts = [logger.model.record(row).text for row in range(logger.model.rowCount())]
+    assert texts[:3] == ["line 7", "line 8", "line 9"]
+    assert texts[3] == "7 lines dropped from the view while it fell behind"
+    logger.flush()
+    assert [logger.model.record(row).text for row in range(logger.model.rowCount())][-2:] == ["line 10", "line 11"]
+    logger.close()
+
+
+def test_rate_limit_and_repeats():
+    logger = Logger(LogView(), rate_limit=1.0, rate_burst=2)
+    for i in range(5):
+        logger.debug(f"burst {i}", tag="[t]")
+    for _ in range(3):
+        logger.info("same", tag="[r]")
+    logger.flush_summaries()
+    assert logger.stats()["suppressed"] == 3
+    assert logger.stats()["collapsed"] == 2
+    logger.close()
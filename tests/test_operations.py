@@ -0,0 +1,96 @@
+import os
+import stat
+
+import operations
+from cmd import Cmd
+from conftest import wait_until
+
+
+def test_parse_adb_devices():
+    text = "List of devices attached\r\nAAA\tdevice product:x\r\nBBB\toffline\r\n\r\n"
+    devices = operations.parse_adb_devices(text)
+    assert devices == [["AAA", "device", "product:x"], ["BBB", "offline"]]
+    assert operations.online_serials(devices) == ["AAA"]
+    assert operations.parse_adb_devices("error: no server") == []
+
+
+def test_parse_packages():
+    assert operations.parse_packages("package:com.a\npackage:com.b\n\n") == ["com.a", "com.b"]
+
+
+def test_parse_listing_files_dirs_and_names_with_newlines():
+    text = (
+        "81a4 12 1700000000 /sdcard/a file.txt\n"
+        "41f9 4096 1700000001 /sdcard/DCIM\n"
+        "81a4 3 1700000002 /sdcard/two\nlines\n"
+        "\0"
+    )
+    entries = {entry.name: entry for entry in operations.parse_listing(text)}
+    assert set(entries) == {"a file.txt", "DCIM", "two\nlines"}
+    assert entries["a file.txt"].size == 12 and not entries["a file.txt"].is_dir
+    assert entries["DCIM"].is_dir and entries["DCIM"].size is None
+    assert entries["DCIM"].mtime == 1700000001
+    assert entries["two\nlines"].size == 3
+
+
+def test_parse_listing_resolves_links():
+    text = (
+        "a1ff 21 1700000000 /sdcard/photos\n"
+        "a1ff 7 1700000000 /sdcard/dangling\n"
+        "a1ff 9 1700000000 /sdcard/song\n"
+        "\0"
+        "41f9 4096\0/sdcard/photos\0/storage/emulated/0/DCIM\0"
+        "\0/sdcard/dangling\0/nowhere\0"
+        "81a4 5000\0/sdcard/song\0music/song.mp3\0"
+    )
+    entries = {entry.name: entry for entry in operations.parse_listing(text)}
+    assert entries["photos"].is_dir and entries["photos"].link == "/storage/emulated/0/DCIM"
+    assert stat.S_ISLNK(entries["photos"].mode)
+    assert not entries["dangling"].is_dir and entries["dangling"].link == "/nowhere"
+    assert entries["dangling"].size == 7
+    assert not entries["song"].is_dir and entries["song"].size == 5000
+
+
+def test_parse_md5sum():
+    text = (
+        "d41d8cd98f00b204e9800998ecf8427e  /sdcard/empty\n"
+        "\\0cc175b9c0f1b6a831c399e269772661  /sdcard/new\\nline\n"
+        "\\92eb5ffee6ae2fec3ad71c777531578f  /sdcard/back\\\\slash\n"
+        "md5sum: /sdcard/locked: Permission denied\n"
+    )
+    assert operations.parse_md5sum(text) == {
+        "/sdcard/empty": "d41d8cd98f00b204e9800998ecf8427e",
+        "/sdcard/new\nline": "0cc175b9c0f1b6a831c399e269772661",
+        "/sdcard/back\\slash": "92eb5ffee6ae2fec3ad71c777531578f",
+    }
+
+
+def test_snapshot_follows_a_linked_root(fake_adb, tmp_path):
+    storage = tmp_path / "storage"
+    (storage / "DCIM").mkdir(parents=True)
+    (storage / "DCIM" / "a.jpg").write_bytes(b"a")
+    (storage / "inner").symlink_to(storage / "DCIM")
+    sdcard = tmp_path / "sdcard"
+    sdcard.symlink_to(storage)
+
+    cmd = Cmd()
+    results = []
+    operations.snapshot_dir(cmd, None, str(sdcard), lambda code, snapshot: results.append((code, snapshot)))
+    assert wait_until(lambda: results)
+    code, snapshot = results[0]
+    assert code == 0
+    entries = {entry.name: entry for entry in snapshot.listing(str(sdcard))}
+    assert sorted(entries) == ["DCIM", "inner"]
+    # only the root is followed, links below it stay links
+    assert entries["DCIM"].is_dir and stat.S_ISLNK(entries["inner"].mode)
+    assert [entry.name for entry in snapshot.listing(f"{sdcard}/DCIM")] == ["a.jpg"]
+
+    (storage / "new").mkdir()
+    (storage / "new" / "b.txt").write_bytes(b"bb")
+    os.utime(storage, (0, 0))
+    refreshed = []
+    operations.refresh_snapshot(cmd, None, snapshot, lambda code, changed: refreshed.append((code, changed)))
+    assert wait_until(lambda: refreshed)
+    assert refreshed[0][0] == 0 and refreshed[0][1] >= 1
+    assert sorted(entry.name for entry in snapshot.listing(str(sdcard))) == ["DCIM", "inner", "new"]
+    assert [entry.name for entry in snapshot.listing(f"{sdcard}/new")] == ["b.txt"]
@@ -0,0 +1,91 @@
+import time
+
+from cmd import Cmd
+from conftest import wait_until
+from result_cache import ResultCache
+
+PACKAGES = ["shell", "pm", "list", "packages"]
+
+
+def test_ttl_longest_prefix_wins():
+    cache = ResultCache()
+    assert cache.ttl_for("adb", ["-s", "A", "shell", "pm", "list", "packages", "-3"]) == 10.0
+    assert cache.ttl_for("adb", ["devices", "-l"]) == 2.0
+    assert cache.ttl_for("adb", ["shell", "ls"]) == 0.0
+    cache.set_ttl("adb", ("shell", "pm"), 99.0)
+    assert cache.ttl_for("adb", PACKAGES) == 10.0
+    assert cache.ttl_for("adb", ["shell", "pm", "path", "x"]) == 99.0
+
+
+def test_put_get_and_expiry():
+    cache = ResultCache()
+    key = cache.make_key("A", "adb", ["-s", "A"] + PACKAGES)
+    assert key == cache.make_key("A", "adb", PACKAGES)
+    assert cache.get(key) is None
+    cache.put(key, 0, "out", 0.05)
+    assert cache.get(key) == (0, "out")
+    time.sleep(0.06)
+    assert cache.get(key) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_max_entries():
+    cache = ResultCache(max_entries=3)
+    for i in range(5):
+        cache.put(("A", "adb", (str(i),)), 0, i, 60)
+    assert cache.stats()["entries"] == 3
+    assert cache.get(("A", "adb", ("4",))) == (0, 4)
+    assert cache.get(("A", "adb", ("0",))) is None
+
+
+def test_mutating_command_invalidates_same_device_only():
+    cache = ResultCache()
+    for serial in ("A", "B"):
+        cache.put(cache.make_key(serial, "adb", PACKAGES), 0, serial, 60)
+    cache.on_command("A", "adb", ["-s", "A", "uninstall", "com.x"])
+    assert cache.get(cache.make_key("A", "adb", PACKAGES)) is None
+    assert cache.get(cache.make_key("B", "adb", PACKAGES)) == (0, "B")
+
+
+def test_all_serials_invalidation():
+    cache = ResultCache()
+    for serial in ("A", "B"):
+        cache.put(cache.make_key(serial, "adb", ["devices"]), 0, serial, 60)
+    cache.on_command(None, "adb", ["kill-server"])
+    assert cache.stats()["entries"] == 0
+
+
+def test_implicit_serial_resolves_to_the_only_device(monkeypatch):
+    monkeypatch.delenv("ANDROID_SERIAL", raising=False)
+    cache = ResultCache()
+    cache.put(cache.make_key(None, "adb", PACKAGES), 0, "unknown default", 60)
+    cache.observe_devices("List of devices attached\nAAA\tdevice\nBBB\toffline\n\n")
+    assert cache.default_serial == "AAA"
+    assert cache.make_key(None, "adb", PACKAGES) == cache.make_key("AAA", "adb", ["-s", "AAA"] + PACKAGES)
+
+    cache.put(cache.make_key(None, "adb", PACKAGES), 0, "implicit", 60)
+    cache.on_command("AAA", "adb", ["-s", "AAA", "uninstall", "com.x"])
+    assert cache.stats()["entries"] == 0
+
+    cache.put(cache.make_key("AAA", "adb", PACKAGES), 0, "explicit", 60)
+    cache.on_command(None, "adb", ["uninstall", "com.x"])
+    assert cache.stats()["entries"] == 0
+
+
+def test_default_serial_is_unknown_with_several_devices(monkeypatch):
+    monkeypatch.delenv("ANDROID_SERIAL", raising=False)
+    cache = ResultCache()
+    cache.observe_devices("List of devices attached\nAAA\tdevice\nBBB\tdevice\n\n")
+    assert cache.default_serial is None
+    monkeypatch.setenv("ANDROID_SERIAL", "BBB")
+    assert cache.make_key(None, "adb", PACKAGES)[0] == "BBB"
+    assert cache.make_key(None, "sh", ["-c", "true"])[0] is None
+
+
+def test_cmd_learns_default_serial(fake_adb, monkeypatch):
+    monkeypatch.delenv("ANDROID_SERIAL", raising=False)
+    cmd = Cmd()
+    results = []
+    cmd.run("adb", ["devices"], lambda code, output: results.append(code), use_logger=False)
+    assert wait_until(lambda: results)
+    assert cmd.cache.default_serial == "AAA"
@@ -0,0 +1,30 @@
+from cmd import Cmd
+from conftest import wait_until
+from shell_batch import ShellBatch
+
+
+def test_batch_results_keep_stderr_apart(fake_adb):
+    cmd = Cmd()
+    items, results = [], []
+    cmd.run_batch(
+        [("a", "echo one; echo warning >&2"), ("b", "echo gone >&2; exit 2"), ("c", "printf 'x'")],
+        callback=lambda code, batch_results: results.append(batch_results),
+        item_callback=lambda key, code, output: items.append(key), use_logger=False
+    )
+    assert wait_until(lambda: results)
+    outputs = results[0]
+    assert items == ["a", "b", "c"]
+    assert outputs["a"][0] == 0 and outputs["a"][1].stdout == "one\n" and outputs["a"][1].stderr == "warning"
+    assert outputs["b"][0] == 2 and outputs["b"][1].stdout == "" and outputs["b"][1].stderr == "gone"
+    assert outputs["c"][0] == 0 and outputs["c"][1].stdout == "x"
+
+
+def test_unfinished_items_fail_with_the_shell_error():
+    batch = ShellBatch([("a", "true"), ("b", "true")])
+    script = batch.script().decode()
+    begin = script.split("printf '%s\\n' ", 1)[1].split(";", 1)[0]
+    batch.feed(f"{begin}\npartial".encode())
+    results = batch.finish(1, "device offline")
+    assert results["a"][0] == 1 and results["a"][1].stdout == "partial"
+    assert results["a"][1].stderr == "device offline"
+    assert results["b"][0] == -1 and results["b"][1].text == "device offline"
@@ -0,0 +1,31 @@
+from cmd import Cmd
+from conftest import wait_until
+from shell_session import split_stderr
+
+
+def run_session(cmd: Cmd, command: str, results: list):
+    return cmd.run(
+        "adb", ["shell", command], lambda code, output: results.append((code, output)),
+        use_logger=False, use_session=True
+    )
+
+
+def test_session_keeps_stderr_apart(fake_adb):
+    cmd = Cmd()
+    results = []
+    run_session(cmd, "echo out; echo warning >&2; exit 3", results)
+    run_session(cmd, "printf 'no newline'", results)
+    run_session(cmd, "cat; echo done", results)
+    assert wait_until(lambda: len(results) == 3)
+    (code, output), (code2, output2), (code3, output3) = results
+    assert code == 3 and output.stdout == "out\n" and output.stderr == "warning"
+    assert code2 == 0 and output2.stdout == "no newline" and output2.stderr == ""
+    assert code3 == 0 and output3.stdout == "done\n"
+    assert cmd.shell_session(None).is_open()
+    cmd.close_sessions()
+
+
+def test_split_stderr():
+    assert split_stderr(b"out\n\n__AA_ERR_x__\nerr", b"__AA_ERR_x__") == (b"out\n", b"err")
+    assert split_stderr(b"out\r\n__AA_ERR_x__\r\n", b"__AA_ERR_x__") == (b"out", b"")
+    assert split_stderr(b"partial", b"__AA_ERR_x__") == (b"partial", b"")
@@ -0,0 +1,16 @@
+from conftest import wait_until
+from signals import Signals
+
+
+def test_debounce_emits_once_after_a_burst():
+    signals = Signals(debounce_msec=50)
+    emitted = []
+    signals.adb_shell_pm_list_packages.connect(lambda: emitted.append(1))
+    for _ in range(20):
+        signals.debounce("adb_shell_pm_list_packages")
+    assert not emitted
+    assert wait_until(lambda: emitted)
+    assert not wait_until(lambda: len(emitted) > 1, timeout=0.2)
+
+    signals.debounce("adb_shell_pm_list_packages", msec=10)
+    assert wait_until(lambda: len(emitted) == 2)
@@ -0,0 +1,155 @@
+import filecmp
+import io
+import os
+import tarfile
+
+import pytest
+
+from conftest import wait_until
+from tar_stream import TarExtractor, _Spool, tar_chunks, tar_size
+
+
+def make_tree(root):
+    files = {"a.txt": b"hello", "sub/b.bin": os.urandom(70000), "sub/empty": b"", "sub/deep/c": b"x" * 512}
+    for name, data in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return [(str(root / name), name) for name in files]
+
+
+def extract(members, dest, compress=False, pieces=1, **kwargs):
+    data = b"".join(tar_chunks(members, compress=compress))
+    extractor = TarExtractor(str(dest), compressed=compress, **kwargs)
+    errors = []
+    extractor.finished.connect(errors.append)
+    step = max(1, len(data) // pieces)
+    for start in range(0, len(data), step):
+        extractor.feed(data[start:start + step])
+    extractor.close()
+    assert wait_until(lambda: errors)
+    return data, errors[0]
+
+
+def test_tar_size_matches_archive():
+    assert tar_size([]) == 1024
+    assert tar_size([0, 1, 511, 512, 513]) == 5 * 512 + (0 + 1 + 1 + 1 + 2) * 512 + 1024
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(tmp_path, compress):
+    members = make_tree(tmp_path / "src")
+    data, error = extract(members, tmp_path / "dest", compress=compress, pieces=7)
+    assert error == ""
+    if not compress:
+        assert len(data) == tar_size([os.path.getsize(path) for path, _ in members])
+    for path, name in members:
+        assert filecmp.cmp(path, tmp_path / "dest" / name, shallow=False)
+
+
+def test_concatenated_archives(tmp_path):
+    members = make_tree(tmp_path / "src")
+    first = b"".join(tar_chunks(members[:2], compress=True))
+    second = b"".join(tar_chunks(members[2:], compress=True))
+    extractor = TarExtractor(str(tmp_path / "dest"), compressed=True)
+    errors = []
+    extractor.finished.connect(errors.append)
+    extractor.feed(first + second)
+    extractor.close()
+    assert wait_until(lambda: errors) and errors[0] == ""
+    assert all((tmp_path / "dest" / name).exists() for _, name in members)
+
+
+def test_missing_member_is_skipped(tmp_path):
+    members = make_tree(tmp_path / "src") + [(str(tmp_path / "gone"), "gone")]
+    names = tarfile.open(fileobj=io.BytesIO(b"".join(tar_chunks(members)))).getnames()
+    assert "gone" not in names and len(names) == 4
+
+
+def test_corrupt_gzip_reports_error(tmp_path):
+    extractor = TarExtractor(str(tmp_path), compressed=True)
+    errors = []
+    extractor.finished.connect(errors.append)
+    extractor.feed(b"definitely not gzip")
+    extractor.close()
+    assert wait_until(lambda: errors) and errors[0]
+
+
+def feed_archive(dest, data: bytes) -> str:
+    extractor = TarExtractor(str(dest))
+    errors = []
+    extractor.finished.connect(errors.append)
+    extractor.feed(data)
+    extractor.close()
+    assert wait_until(lambda: errors)
+    return errors[0]
+
+
+def archive_of(*members) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        for name, kind, extra in members:
+            info = tarfile.TarInfo(name)
+            info.type = kind
+            if kind == tarfile.REGTYPE:
+                info.size = len(extra)
+                info.mode = 0o4777
+                archive.addfile(info, io.BytesIO(extra))
+            else:
+                info.linkname = extra
+                archive.addfile(info)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("builtin_filter", [True, False])
+def test_unsafe_members_are_refused(tmp_path, monkeypatch, builtin_filter):
+    if not builtin_filter:
+        monkeypatch.delattr(tarfile, "data_filter", raising=False)
+    elif not hasattr(tarfile, "data_filter"):
+        pytest.skip("no data filter in this Python")
+    dest = tmp_path / "dest"
+    dest.mkdir()
+
+    assert feed_archive(dest, archive_of(("ok/a", tarfile.REGTYPE, b"a"), ("ok/link", tarfile.SYMTYPE, "a"))) == ""
+    assert (dest / "ok" / "a").read_bytes() == b"a" and os.readlink(dest / "ok" / "link") == "a"
+    assert os.stat(dest / "ok" / "a").st_mode & 0o7777 == 0o755
+
+    for member in (
+            ("../escape", tarfile.REGTYPE, b"x"),
+            ("out", tarfile.SYMTYPE, "/etc"),
+            ("up", tarfile.SYMTYPE, "../.."),
+            ("hard", tarfile.LNKTYPE, "../escape"),
+            ("fifo", tarfile.FIFOTYPE, ""),
+    ):
+        assert feed_archive(dest, archive_of(member)), member
+    assert not (tmp_path / "escape").exists()
+    assert sorted(os.listdir(dest)) == ["ok"]
+    # the built-in filter extracts an absolute name below the destination instead
+    if not builtin_filter:
+        assert feed_archive(dest, archive_of(("/abs", tarfile.REGTYPE, b"x")))
+    assert not os.path.exists("/abs")
+
+
+def test_spool_keeps_order_across_memory_and_file():
+    spool = _Spool(max_memory=10)
+    pieces = [bytes([i]) * size for i, size in enumerate((4, 4, 5, 3, 20))]
+    for piece in pieces:
+        spool.put(piece)
+    # once something went to the file, later data follows it there even if memory has room
+    assert spool.spilled == 28 and spool.buffered == 36
+    assert spool.read(6) == pieces[0] + pieces[1][:2]
+    assert spool.read(10) == pieces[1][2:] + pieces[2] + pieces[3]
+    assert spool.read(20) == pieces[4]
+    assert spool.buffered == 0
+    spool.put(b"again")
+    spool.close()
+    assert spool.spilled == 28 and spool.read() == b"again" and spool.read(5) == b""
+    spool.release()
+
+
+def test_extraction_through_a_small_spool(tmp_path):
+    members = make_tree(tmp_path / "src")
+    _, error = extract(members, tmp_path / "dest", pieces=40, spool_memory=1024)
+    assert error == ""
+    for local_path, name in members:
+        assert filecmp.cmp(local_path, tmp_path / "dest" / name, shallow=False)
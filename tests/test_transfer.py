@@ -0,0 +1,169 @@
+from cmd import Cmd, JOB_CANCELLED, JOB_PENDING
+from conftest import wait_until
+from file_model import FileEntry
+from transfer import (
+    BULK_ALWAYS, BULK_NEVER, ITEM_DONE, ITEM_PENDING, ITEM_UNCHANGED, NOTE_CHANGED, NOTE_NEW, PULL, PUSH, TransferItem,
+    TransferQueue,
+)
+
+
+def pull(source: str, target: str, is_dir: bool = True) -> tuple[TransferQueue, list, list]:
+    queue = TransferQueue(Cmd(), PULL, [None], bulk=BULK_NEVER)
+    summaries, messages = [], []
+    queue.finished.connect(summaries.append)
+    queue.message.connect(messages.append)
+    queue.start([source], target, {source: FileEntry(source.rsplit("/", 1)[-1], is_dir)})
+    assert wait_until(lambda: summaries)
+    return queue, summaries, messages
+
+
+def test_pull_of_a_linked_directory_goes_file_by_file(fake_adb, tmp_path):
+    storage = tmp_path / "device" / "storage"
+    (storage / "DCIM").mkdir(parents=True)
+    (storage / "DCIM" / "a.jpg").write_bytes(b"a" * 10)
+    (storage / "b.txt").write_bytes(b"b")
+    sdcard = tmp_path / "device" / "sdcard"
+    sdcard.symlink_to(storage)
+    (tmp_path / "local").mkdir()
+
+    queue, summaries, messages = pull(str(sdcard), str(tmp_path / "local"))
+    assert sorted(item.source[len(str(sdcard)):] for item in queue.items) == ["/DCIM/a.jpg", "/b.txt"]
+    assert all(item.state == ITEM_DONE for item in queue.items)
+    assert summaries[0]["done"] == 2 and not messages
+    assert (tmp_path / "local" / "sdcard" / "DCIM" / "a.jpg").read_bytes() == b"a" * 10
+
+
+def test_pull_falls_back_to_the_whole_directory_without_children(fake_adb, tmp_path):
+    empty = tmp_path / "device" / "empty"
+    empty.mkdir(parents=True)
+    (tmp_path / "local").mkdir()
+
+    queue, summaries, messages = pull(str(empty), str(tmp_path / "local"))
+    assert [(item.source, item.target) for item in queue.items] == [(str(empty), str(tmp_path / "local"))]
+    assert "改为整体拉取" in messages[0]
+    assert summaries[0]["done"] == 1 and (tmp_path / "local" / "empty").is_dir()
+
+
+def test_bulk_pull_runs_as_a_scheduled_job(fake_adb, tmp_path):
+    storage = tmp_path / "device" / "storage"
+    storage.mkdir(parents=True)
+    for i in range(5):
+        (storage / f"f{i}").write_bytes(bytes([i]) * 1000)
+    (tmp_path / "local").mkdir()
+
+    cmd = Cmd()
+    queue = TransferQueue(cmd, PULL, [None], bulk=BULK_ALWAYS)
+    summaries = []
+    queue.finished.connect(summaries.append)
+    queue.start([str(storage)], str(tmp_path / "local"), {str(storage): FileEntry("storage", True)})
+    assert wait_until(lambda: queue._bulk_items and queue._bulk_items[0].job is not None or summaries)
+    assert cmd.running_count() == 1
+    assert wait_until(lambda: summaries)
+    assert summaries[0]["done"] == 5
+    assert (tmp_path / "local" / "storage" / "f3").read_bytes() == b"\3" * 1000
+
+
+def test_queue_limits_its_own_jobs_without_touching_cmd(fake_adb, tmp_path):
+    storage = tmp_path / "device" / "storage"
+    storage.mkdir(parents=True)
+    for i in range(6):
+        (storage / f"f{i}").write_bytes(b"x")
+    (tmp_path / "local").mkdir()
+
+    cmd = Cmd(max_running=8, max_running_per_serial=4)
+    queue = TransferQueue(cmd, PULL, [None], parallel=2, bulk=BULK_NEVER)
+    summaries, most = [], []
+    queue.finished.connect(summaries.append)
+    queue.itemChanged.connect(lambda item: most.append(sum(queue._running.values())))
+    queue.start([str(storage)], str(tmp_path / "local"), {str(storage): FileEntry("storage", True)})
+    assert cmd.limits == (8, 4)
+    assert wait_until(lambda: summaries)
+    assert summaries[0]["done"] == 6 and max(most) == 2 and cmd.limits == (8, 4)
+
+
+def test_cancel_while_hashing_cancels_the_device_side_job(fake_adb, tmp_path):
+    source = tmp_path / "a.txt"
+    source.write_bytes(b"a")
+    cmd = Cmd(max_running=1)
+    blocker = cmd.run("sh", ["-c", "sleep 5"], use_logger=False)
+    queue = TransferQueue(cmd, PUSH, [None], sync=True)
+    summaries = []
+    queue.finished.connect(summaries.append)
+    queue.start([str(source)], str(tmp_path / "device"))
+    assert len(queue._hash_jobs) == 1 and queue._hash_jobs[0].state == JOB_PENDING
+    queue.cancel()
+    assert queue._hash_jobs[0].state == JOB_CANCELLED
+    assert wait_until(lambda: summaries)
+    assert summaries[0]["done"] == 0 and not queue.active
+    blocker.cancel()
+    assert wait_until(lambda: cmd.running_count() == 0)
+
+
+def device_copy(tmp_path, count: int):
+    local = tmp_path / "local" / "photos"
+    local.mkdir(parents=True)
+    for i in range(count):
+        (local / f"{i:03d}.jpg").write_bytes(str(i).encode() * 10)
+    device = tmp_path / "device"
+    device.mkdir()
+    # the device has everything but the last file, and one of them differs
+    (device / "photos").mkdir()
+    for i in range(count - 1):
+        (device / "photos" / f"{i:03d}.jpg").write_bytes(str(i).encode() * 10)
+    (device / "photos" / "007.jpg").write_bytes(b"old")
+    return local, device
+
+
+def push(local, device, **kwargs) -> tuple[TransferQueue, list, list]:
+    queue = TransferQueue(Cmd(), PUSH, [None], bulk=BULK_NEVER, **kwargs)
+    summaries, messages = [], []
+    queue.finished.connect(summaries.append)
+    queue.message.connect(messages.append)
+    queue.start([str(local)], str(device))
+    assert wait_until(lambda: summaries)
+    return queue, summaries, messages
+
+
+def test_sync_dry_run_reports_without_pushing(fake_adb, tmp_path):
+    local, device = device_copy(tmp_path, 101)
+    queue, summaries, messages = push(local, device, dry_run=True)
+
+    notes = {item.source.rsplit("/", 1)[-1]: item.note for item in queue.items if item.state != ITEM_UNCHANGED}
+    assert notes == {"007.jpg": NOTE_CHANGED, "100.jpg": NOTE_NEW}
+    assert summaries[0]["dry_run"] and summaries[0]["unchanged"] == 99
+    assert summaries[0]["done"] == 0 and summaries[0]["cancelled"] == 0
+    report = queue.sync_report()
+    assert report in messages and report.startswith("需传输 2 个文件（新增 1，变化 1）")
+    assert "未变化 99 个" in report
+    assert f"  变化  {local}/007.jpg -> {device}/photos/007.jpg" in report.split("\n")
+    assert (device / "photos" / "007.jpg").read_bytes() == b"old"
+    assert not (device / "photos" / "100.jpg").exists()
+
+
+def test_sync_pushes_only_new_and_changed_files(fake_adb, tmp_path):
+    local, device = device_copy(tmp_path, 101)
+    queue, summaries, _ = push(local, device, sync=True)
+
+    assert summaries[0]["done"] == 2 and summaries[0]["unchanged"] == 99
+    assert (device / "photos" / "007.jpg").read_bytes() == b"7" * 10
+    assert (device / "photos" / "100.jpg").read_bytes() == b"100" * 10
+
+
+def test_compare_classifies_pulled_files(tmp_path):
+    queue = TransferQueue(Cmd(), PULL, [None], dry_run=True)
+    summaries = []
+    queue.finished.connect(summaries.append)
+    names = ["same", "changed", "unreadable", "missing"]
+    same, changed, unreadable, missing = paths = [str(tmp_path / name) for name in names]
+    for path in (same, changed, unreadable):
+        open(path, "wb").close()
+    queue._add([TransferItem(None, f"/sdcard/{name}", path, 1) for name, path in zip(names, paths)])
+    queue._manifests[None] = {f"/sdcard/{name}": str(i) for i, name in enumerate(names)}
+    queue._compare({same: "0", changed: "x", unreadable: None})
+
+    assert [(item.state, item.note) for item in queue.items] == [
+        (ITEM_UNCHANGED, ""), (ITEM_PENDING, NOTE_CHANGED), (ITEM_PENDING, NOTE_CHANGED), (ITEM_PENDING, NOTE_NEW)
+    ]
+    assert queue.items[0].transferred == 1
+    assert [item.target for item in queue._queues[None]] == [changed, unreadable, missing]
+    assert summaries and summaries[0]["unchanged"] == 1